@@ -0,0 +1,505 @@
+import os
+import re
+import sys
+import json
+import heapq
+import hashlib
+import argparse
+import logging
+from collections import Counter
+from functools import partial
+from itertools import groupby
+from analysis.lexical_analysis import iter_encoded_episodes, map_episode_groups, summarize_episode
+from analysis.episode_cache import EpisodeCache, pipeline_fingerprint
+from analysis.sketches import HeavyHitters, EPSILON, DELTA, HEAVY_K
+from processing import instrumentation
+from processing.vocabulary import word_count_from_ids
+from processing.text_utils import MODES, DEFAULT_MODE, configure_lemma_store, ensure_nltk_resources, nltk_resources_for
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+MANIFEST_VERSION = 1
+SHARD_VERSION = 1
+DEFAULT_SHARD_SIZE = 200  # Episodios por shard: acota la memoria de la fase map
+TOP_WORDS = 100
+EVOLUTION_TOP = 50  # Palabras clave de la evolución por temporada
+
+# Temporada y episodio a partir del nombre del archivo o de la carpeta
+EPISODE_PATTERNS = (
+    re.compile(r'[Ss](\d{1,3})[ ._-]?[Ee](\d{1,4})'),
+    re.compile(r'(?<!\d)(\d{1,2})x(\d{1,3})(?!\d)')
+)
+EPISODE_NUMBER = re.compile(r'(?:episode|episodio|ep|e)[ ._-]?(\d{1,4})', re.IGNORECASE)
+SEASON_FOLDER = re.compile(r'^(?:season|temporada|series|s)[ ._-]?(\d{1,3})$', re.IGNORECASE)
+TRAILING_NUMBER = re.compile(r'(\d{1,4})(?!.*\d)')
+
+
+def _clean_name(name):
+    """Nombre de serie apto para los archivos TSV (sin tabuladores ni saltos de línea)"""
+    return ' '.join(str(name).split())
+
+
+def parse_episode_key(relative_path):
+    """
+    (serie, temporada, episodio) de un SRT dentro de un archivo con la
+    estructura SERIE/[TEMPORADA/]archivo.srt. Temporada y episodio se toman de
+    patrones S03E05 o 3x05 en el nombre; si no, la temporada de la carpeta
+    (Season 3, Temporada 3, S03) y el episodio del nombre (episode_05, E05 o
+    el último número). Sin temporada reconocible se usa la 1.
+    """
+    parts = relative_path.replace('\\', '/').split('/')
+    show = _clean_name(parts[0]) if len(parts) > 1 else ''
+    filename = parts[-1]
+    for pattern in EPISODE_PATTERNS:
+        match = pattern.search(filename)
+        if match:
+            return show, int(match.group(1)), int(match.group(2))
+
+    season = 1
+    for folder in parts[1:-1]:
+        match = SEASON_FOLDER.match(folder.strip())
+        if match:
+            season = int(match.group(1))
+    stem = filename.split('.')[0]
+    match = EPISODE_NUMBER.search(stem) or TRAILING_NUMBER.search(stem)
+    if match is None:
+        raise ValueError(f"Cannot find an episode number in {relative_path!r}")
+    return show, season, int(match.group(1))
+
+
+def scan_archive(root):
+    """
+    Manifiesto de todos los .srt bajo root: {'version', 'root', 'entries'},
+    con una entrada {'show', 'season', 'episode', 'path'} (ruta relativa a
+    root) por archivo, ordenadas por (serie, temporada, episodio).
+    """
+    root = os.path.abspath(root)
+    entries = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.lower().endswith('.srt'):
+                continue
+            relative_path = os.path.relpath(os.path.join(directory, filename), root)
+            try:
+                show, season, episode = parse_episode_key(relative_path)
+            except ValueError as e:
+                logger.warning(f"Skipping {relative_path}: {str(e)}")
+                continue
+            entries.append({'show': show, 'season': season, 'episode': episode, 'path': relative_path})
+    entries.sort(key=entry_key)
+    _warn_duplicates(entries)
+    return {'version': MANIFEST_VERSION, 'root': root, 'entries': entries}
+
+
+def entry_key(entry):
+    return entry['show'], entry['season'], entry['episode'], entry['path']
+
+
+def _warn_duplicates(entries):
+    for key, group in groupby(entries, key=lambda entry: entry_key(entry)[:3]):
+        paths = [entry['path'] for entry in group]
+        if len(paths) > 1:
+            logger.warning(f"Duplicate episode {key}: {', '.join(paths)}")
+
+
+def save_manifest(manifest, path):
+    """Guarda el manifiesto JSON de forma atómica"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(path):
+    """
+    Carga un manifiesto (ver scan_archive). Las rutas relativas se resuelven
+    desde 'root' o, si no se indica, desde la carpeta del manifiesto. Las
+    entradas se normalizan y ordenan por (serie, temporada, episodio).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version: {manifest.get('version')!r}")
+    root = manifest.get('root') or os.path.dirname(os.path.abspath(path))
+    entries = []
+    for entry in manifest['entries']:
+        entries.append({
+            'show': _clean_name(entry.get('show', '')),
+            'season': int(entry.get('season', 1)),
+            'episode': int(entry['episode']),
+            'path': entry['path']
+        })
+    entries.sort(key=entry_key)
+    _warn_duplicates(entries)
+    return {'version': MANIFEST_VERSION, 'root': root, 'entries': entries}
+
+
+def make_shards(entries, shard_size=DEFAULT_SHARD_SIZE):
+    """Reparte las entradas (ya ordenadas) en shards consecutivos de shard_size episodios"""
+    if shard_size < 1:
+        raise ValueError("Shard size must be at least 1")
+    return [entries[i:i + shard_size] for i in range(0, len(entries), shard_size)]
+
+
+def shard_fingerprint(shard, root, fingerprint):
+    """Huella de un shard: claves, tamaño y fecha de sus archivos, y huella del pipeline"""
+    digest = hashlib.sha256()
+    digest.update(f"{SHARD_VERSION}\n{fingerprint}\n".encode('utf-8'))
+    for entry in shard:
+        stat = os.stat(os.path.join(root, entry['path']))
+        digest.update(
+            f"{entry['show']}\t{entry['season']}\t{entry['episode']}\t{entry['path']}\t{stat.st_size}\t{stat.st_mtime_ns}\n"
+            .encode('utf-8')
+        )
+    return digest.hexdigest()
+
+
+# Fase map: conteos parciales de cada shard, ordenados y volcados a disco
+
+def _write_lines(path, lines):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+
+
+def _count_group(episode_files, cache=None, mode=DEFAULT_MODE, sketch=None):
+    """
+    Conteos de un tramo de [(entrada del manifiesto, ruta)] (ver
+    map_episode_groups): (lemas, lemas por temporada, filas de
+    episodes.jsonl, sketch). Si se pasa un HeavyHitters, se llena uno vacío
+    con sus mismos parámetros en el propio worker.
+    """
+    words = Counter()
+    seasons = Counter()
+    rows = []
+    for (entry, _), episode in zip(episode_files, iter_encoded_episodes(episode_files, cache, mode)):
+        word_count = word_count_from_ids(episode['words'], episode['ids'])
+        words.update(word_count)
+        show, season = entry['show'], entry['season']
+        for word, count in word_count.items():
+            seasons[(show, season, word)] += count
+        row = summarize_episode(entry['episode'], word_count)
+        rows.append(json.dumps(dict(row, show=show, season=season, path=entry['path']), ensure_ascii=False) + '\n')
+    part = None
+    if sketch is not None:
+        part = sketch.empty()
+        part.add_counts(words)
+    return words, seasons, rows, part
+
+
+def map_shard(shard, root, shard_dir, jobs=1, cache=None, mode=DEFAULT_MODE, sketch=None):
+    """
+    Procesa un shard y guarda en shard_dir, ordenados por clave:
+    words.tsv (lema, frecuencia), seasons.tsv (serie, temporada, lema,
+    frecuencia) y episodes.jsonl (métricas de cada episodio). Los episodios
+    se cuentan en los workers (un tramo del shard cada uno) y aquí sólo se
+    combinan sus conteos. Si se pasa un HeavyHitters vacío (sketch), cada
+    worker llena el suyo, se combinan en sketch y se guarda en sketch.npz.
+    """
+    episode_files = [(entry, os.path.join(root, entry['path'])) for entry in shard]
+    with instrumentation.stage('archive.encode'):
+        outputs = map_episode_groups(partial(_count_group, sketch=sketch), episode_files, jobs, cache, mode)
+
+    with instrumentation.stage('archive.count'):
+        words = Counter()
+        seasons = Counter()
+        rows = []
+        for group_words, group_seasons, group_rows, part in outputs:
+            words.update(group_words)
+            seasons.update(group_seasons)
+            rows.extend(group_rows)
+            if sketch is not None:
+                sketch.merge(part)
+        del outputs
+
+    with instrumentation.stage('archive.spill'):
+        _write_lines(os.path.join(shard_dir, 'words.tsv'), (
+            f"{word}\t{count}\n" for word, count in sorted(words.items())
+        ))
+        _write_lines(os.path.join(shard_dir, 'seasons.tsv'), (
+            f"{show}\t{season}\t{word}\t{count}\n" for (show, season, word), count in sorted(seasons.items())
+        ))
+        _write_lines(os.path.join(shard_dir, 'episodes.jsonl'), rows)
+        if sketch is not None:
+            sketch.save(os.path.join(shard_dir, 'sketch.npz'))
+    instrumentation.count('archive.episodes', len(shard))
+    return len(words)
+
+
+# Fase reduce: mezcla k-way en streaming de los conteos ordenados de cada shard
+
+def _read_words(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            word, count = line.rstrip('\n').split('\t')
+            yield word, int(count)
+
+
+def _read_seasons(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            show, season, word, count = line.rstrip('\n').split('\t')
+            yield (show, int(season), word), int(count)
+
+
+def merge_sorted_counts(runs):
+    """
+    Mezcla k-way de iteradores (clave, frecuencia) ordenados por clave:
+    genera (clave, frecuencia total) en orden, con memoria proporcional al
+    número de iteradores.
+    """
+    merged = heapq.merge(*runs, key=lambda item: item[0])
+    for key, group in groupby(merged, key=lambda item: item[0]):
+        yield key, sum(count for _, count in group)
+
+
+class _Summary:
+    """Totales, vocabulario y top-k de un flujo de (lema, frecuencia) sin guardarlo entero"""
+
+    def __init__(self, k):
+        self.k = k
+        self.total = 0
+        self.unique = 0
+        self.heap = []  # (frecuencia, -orden, lema): se queda el primero en orden alfabético en empates
+
+    def add(self, word, count):
+        self.total += count
+        self.unique += 1
+        item = (count, -self.unique, word)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def result(self, top_n=None):
+        """Métricas del flujo (las de summarize_episode) con las top_n palabras (o las k)"""
+        top = [(word, count) for count, _, word in sorted(self.heap, reverse=True)]
+        return {
+            'total_words': self.total,
+            'unique_words': self.unique,
+            'lexical_density': self.unique / self.total if self.total else 0,
+            'top_words': top[:top_n] if top_n else top
+        }
+
+
+def merge_sketches(shard_dirs):
+    """Combina los HeavyHitters de los shards (se cargan de uno en uno)"""
+    merged = None
+    for shard_dir in shard_dirs:
+        sketch = HeavyHitters.load(os.path.join(shard_dir, 'sketch.npz'))
+        merged = sketch if merged is None else merged.merge(sketch)
+    return merged
+
+
+def reduce_shards(shard_dirs, output_dir, top_n=TOP_WORDS, approximate=False):
+    """
+    Mezcla los conteos de los shards en output_dir/words.tsv y
+    output_dir/seasons.tsv (ordenados) y devuelve el resumen global y por
+    temporada ({'global': {...}, 'seasons': [{'show', 'season', ...}],
+    'evolution': {lema: [(serie, temporada, frecuencia)]}}) de las
+    EVOLUTION_TOP palabras globales más frecuentes.
+
+    Con approximate=True el top global sale de combinar los sketches de los
+    shards (ver HeavyHitters) en lugar de la mezcla exacta de todo el
+    vocabulario: no se escribe words.tsv, unique_words queda en None y el
+    resumen incluye las cotas de error.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    k = max(top_n, EVOLUTION_TOP)
+    if approximate:
+        with instrumentation.stage('archive.merge_sketches'):
+            sketch = merge_sketches(shard_dirs)
+            top = sketch.top(k)
+            overall = {
+                'total_words': sketch.total,
+                'unique_words': None,
+                'lexical_density': None,
+                'top_words': top[:top_n],
+                'approximate': True,
+                'error_bounds': sketch.bounds()
+            }
+    else:
+        with instrumentation.stage('archive.merge_words'):
+            summary = _Summary(k)
+            path = os.path.join(output_dir, 'words.tsv')
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                runs = [_read_words(os.path.join(shard_dir, 'words.tsv')) for shard_dir in shard_dirs]
+                for word, count in merge_sorted_counts(runs):
+                    summary.add(word, count)
+                    f.write(f"{word}\t{count}\n")
+            os.replace(tmp_path, path)
+            top = summary.result()['top_words']
+            overall = summary.result(top_n)
+    keywords = [word for word, _ in top[:EVOLUTION_TOP]]
+    evolution = {word: [] for word in keywords}
+
+    with instrumentation.stage('archive.merge_seasons'):
+        seasons = []
+        path = os.path.join(output_dir, 'seasons.tsv')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            runs = [_read_seasons(os.path.join(shard_dir, 'seasons.tsv')) for shard_dir in shard_dirs]
+            merged = merge_sorted_counts(runs)
+            # Las claves llegan agrupadas por (serie, temporada): un resumen a la vez
+            for (show, season), group in groupby(merged, key=lambda item: item[0][:2]):
+                summary = _Summary(15)
+                for (_, _, word), count in group:
+                    summary.add(word, count)
+                    if word in evolution:
+                        evolution[word].append((show, season, count))
+                    f.write(f"{show}\t{season}\t{word}\t{count}\n")
+                seasons.append(dict(summary.result(), show=show, season=season))
+        os.replace(tmp_path, path)
+
+    return {'global': overall, 'seasons': seasons, 'evolution': evolution}
+
+
+def iter_episode_rows(shard_dirs):
+    """Métricas de cada episodio (ver summarize_episode, con serie, temporada y ruta) en orden del manifiesto"""
+    for shard_dir in shard_dirs:
+        with open(os.path.join(shard_dir, 'episodes.jsonl'), 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def process_archive(manifest, workdir, shard_size=DEFAULT_SHARD_SIZE, jobs=1, cache_dir=None,
+                    mode=DEFAULT_MODE, top_n=TOP_WORDS, approximate=False,
+                    heavy_k=HEAVY_K, epsilon=EPSILON, delta=DELTA):
+    """
+    Análisis léxico de un archivo de varias series y temporadas (ver
+    scan_archive/load_manifest) en dos fases:
+
+    - map: los episodios se procesan por shards de shard_size; los conteos
+      parciales de cada shard se ordenan y se vuelcan a workdir/shards. Un
+      shard cuyos archivos y pipeline no han cambiado no se vuelve a procesar.
+    - reduce: mezcla k-way en streaming de los shards en los conteos globales
+      y por temporada (workdir/words.tsv, workdir/seasons.tsv).
+
+    La memoria depende del tamaño del shard y del vocabulario de una
+    temporada, no del número de episodios. Con approximate=True cada shard
+    guarda además un sketch (HeavyHitters con heavy_k candidatos y error
+    epsilon/delta) y el top global y las palabras de la evolución salen de
+    combinarlos (ver reduce_shards). Devuelve el resumen, que también se
+    guarda en workdir/summary.json; las métricas por episodio se leen con
+    iter_episode_rows.
+    """
+    entries = manifest['entries']
+    if not entries:
+        raise ValueError("Manifest has no episodes")
+    root = manifest['root']
+    cache = EpisodeCache(cache_dir, mode=mode) if cache_dir else None
+    fingerprint = cache.fingerprint if cache else pipeline_fingerprint(mode)
+    sketch_params = HeavyHitters(heavy_k, epsilon, delta).params() if approximate else None
+
+    shards = make_shards(entries, shard_size)
+    shard_dirs = []
+    reused = 0
+    for n, shard in enumerate(shards):
+        shard_dir = os.path.join(workdir, 'shards', f"shard_{n:05d}")
+        shard_dirs.append(shard_dir)
+        meta_path = os.path.join(shard_dir, 'meta.json')
+        shard_hash = shard_fingerprint(shard, root, fingerprint)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            # Un shard sin sketch (o con otros parámetros) se rehace en modo aproximado
+            if meta.get('fingerprint') == shard_hash and (not approximate or meta.get('sketch') == sketch_params):
+                reused += 1
+                continue
+        except (OSError, ValueError):
+            pass
+
+        logger.info(f"Processing shard {n + 1}/{len(shards)} ({len(shard)} episodes)")
+        os.makedirs(shard_dir, exist_ok=True)
+        with instrumentation.stage('archive.map'):
+            sketch = HeavyHitters(heavy_k, epsilon, delta) if approximate else None
+            vocabulary_size = map_shard(shard, root, shard_dir, jobs, cache, mode, sketch)
+        # meta.json se escribe al final: un shard a medias se rehace
+        _write_lines(meta_path, [json.dumps({
+            'fingerprint': shard_hash, 'episodes': len(shard), 'vocabulary': vocabulary_size, 'sketch': sketch_params
+        })])
+    instrumentation.count('archive.shards_reused', reused)
+    logger.info(f"Shards: {len(shards) - reused} processed, {reused} reused")
+
+    with instrumentation.stage('archive.reduce'):
+        summary = reduce_shards(shard_dirs, workdir, top_n, approximate)
+    episodes_per_season = Counter((entry['show'], entry['season']) for entry in entries)
+    for season in summary['seasons']:
+        season['episodes'] = episodes_per_season[(season['show'], season['season'])]
+    summary.update({
+        'episodes': len(entries),
+        'shows': sorted({entry['show'] for entry in entries}),
+        'shards': len(shards),
+        'shard_size': shard_size,
+        'mode': cache.mode if cache else mode
+    })
+    _write_lines(os.path.join(workdir, 'summary.json'), [json.dumps(summary, indent=2, ensure_ascii=False)])
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m analysis.archive',
+        description="Análisis léxico por shards de archivos con varias series y temporadas"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    scan = commands.add_parser('scan', help="Genera el manifiesto de un directorio SERIE/TEMPORADA/*.srt")
+    scan.add_argument('root', help="Directorio raíz del archivo")
+    scan.add_argument('--output', '-o', required=True, help="Ruta del manifiesto JSON")
+
+    run = commands.add_parser('run', help="Procesa un manifiesto")
+    run.add_argument('manifest', help="Manifiesto JSON (ver scan)")
+    run.add_argument('--workdir', required=True, help="Carpeta de shards y resultados")
+    run.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help="Episodios por shard")
+    run.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Procesos en paralelo")
+    run.add_argument('--cache-dir', default=os.environ.get('FROM_CACHE_DIR'),
+                     help="Caché en disco de episodios y lemas (por defecto $FROM_CACHE_DIR)")
+    run.add_argument('--mode', choices=MODES, default=DEFAULT_MODE, help="Modo de lematización")
+    run.add_argument('--top', type=int, default=TOP_WORDS, help="Palabras del top global")
+    run.add_argument('--approximate', action='store_true',
+                     help="Top global con sketches de memoria fija (Misra-Gries + count-min) en lugar del conteo exacto")
+    run.add_argument('--heavy-k', type=int, default=HEAVY_K, help="Candidatos de Misra-Gries (--approximate)")
+    run.add_argument('--epsilon', type=float, default=EPSILON, help="Error relativo de count-min (--approximate)")
+    run.add_argument('--delta', type=float, default=DELTA, help="Probabilidad de superar el error (--approximate)")
+    return parser
+
+
+def main(argv=None):
+    """Uso: python -m analysis.archive scan RAIZ -o manifiesto.json | run manifiesto.json --workdir DIR [--shard-size N] [--jobs N] [--approximate]"""
+    args = build_parser().parse_args(argv)
+    if args.command == 'scan':
+        manifest = scan_archive(args.root)
+        save_manifest(manifest, args.output)
+        logger.info(f"Manifest with {len(manifest['entries'])} episodes written to {args.output}")
+        return 0
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Cannot read manifest: {str(e)}")
+        return 1
+    if args.cache_dir:
+        configure_lemma_store(os.path.join(args.cache_dir, 'lemmas'))
+    ensure_nltk_resources(nltk_resources_for(args.mode))
+    cache_dir = os.path.join(args.cache_dir, 'episodes') if args.cache_dir else None
+    summary = process_archive(
+        manifest, args.workdir, args.shard_size, args.jobs, cache_dir, args.mode, args.top,
+        args.approximate, args.heavy_k, args.epsilon, args.delta
+    )
+    logger.info(
+        f"{summary['episodes']} episodes, {len(summary['seasons'])} seasons, "
+        f"{summary['global']['total_words']} lemmas -> {args.workdir}"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import logging
+from analysis.lexical_analysis import episode_number, list_episode_files, process_episode_files
+from processing import instrumentation
+from processing.text_utils import (
+    MODES, DEFAULT_MODE, configure_lemma_store, ensure_nltk_resources, nltk_resources_for, process_srt_files
+)
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+FORMATS = ('json', 'parquet')
+
+# Campos de process_srt_file que se exportan (sin el texto codificado)
+FILE_FIELDS = ('file', 'total_words', 'unique_words', 'lexical_density')
+
+
+def resolve_inputs(pattern, episodes_only=True):
+    """
+    Archivos a procesar: los episodios (episode_NN*.srt) de un directorio, o
+    los que coincidan con un patrón glob. Devuelve [(episodio, ruta)]
+    ordenado por nombre.
+    """
+    if os.path.isdir(pattern):
+        if episodes_only:
+            return list_episode_files(pattern)
+        paths = glob.glob(os.path.join(pattern, '*.srt')) + glob.glob(os.path.join(pattern, '*.SRT'))
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    paths = sorted(set(path for path in paths if os.path.isfile(path)), key=os.path.basename)
+    return [(episode_number(path), path) for path in paths]
+
+
+def run_episodes(episode_files, jobs=1, cache_dir=None, mode=DEFAULT_MODE, index_path=None, approximate=False):
+    """Análisis completo (process_episodes) con tiempos por etapa"""
+    timings = {}
+    results, global_top, semantic_evolution, main_themes = process_episode_files(
+        episode_files, jobs, cache_dir, mode, index_path, timings, approximate
+    )
+    return {
+        'episodes': results,
+        'global_top': global_top,
+        'semantic_evolution': semantic_evolution,
+        'main_themes': main_themes
+    }, timings
+
+
+def run_files(episode_files, jobs=1, mode=DEFAULT_MODE):
+    """Estadísticas por archivo (process_srt_files) con su tiempo"""
+    start = time.perf_counter()
+    stats = process_srt_files([path for _, path in episode_files], mode, jobs)
+    timings = {'process': time.perf_counter() - start}
+    return {'files': [{field: row[field] for field in FILE_FIELDS} for row in stats]}, timings
+
+
+def write_json(report, output):
+    """Escribe el informe como JSON (en la salida estándar si output es None o '-')"""
+    if output in (None, '-'):
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output)
+
+
+def report_tables(report):
+    """Tablas planas del informe: {nombre: lista de filas}"""
+    data = report['results']
+    if 'files' in data:
+        return {'files': data['files']}
+    return {
+        'episodes': [
+            dict(row, top_words=json.dumps(row['top_words'], ensure_ascii=False))
+            for row in data['episodes']
+        ],
+        'global_top': [{'word': word, 'count': count} for word, count in data['global_top']],
+        'evolution': [
+            {'word': word, 'episode': episode, 'frequency': frequency}
+            for word, series in data['semantic_evolution'].items()
+            for episode, frequency in series
+        ],
+        'themes': [
+            {
+                'theme': theme,
+                'frequency': info['frequency'],
+                'top_words': json.dumps(info['top_words'], ensure_ascii=False)
+            }
+            for theme, info in data['main_themes']
+        ]
+    }
+
+
+def write_parquet(report, output):
+    """
+    Escribe una tabla Parquet por cada sección del informe en el directorio
+    output, junto con run.json (parámetros y tiempos). Necesita pandas con
+    pyarrow o fastparquet.
+    """
+    import pandas as pd
+
+    os.makedirs(output, exist_ok=True)
+    for name, rows in report_tables(report).items():
+        pd.DataFrame(rows).to_parquet(os.path.join(output, f"{name}.parquet"), index=False)
+    write_json({key: value for key, value in report.items() if key != 'results'}, os.path.join(output, 'run.json'))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m analysis.batch',
+        description="Análisis léxico de subtítulos sin interfaz (para tareas programadas)"
+    )
+    parser.add_argument('command', choices=('episodes', 'files'),
+                        help="episodes: análisis completo de la temporada; files: estadísticas por archivo")
+    parser.add_argument('input', help="Directorio o patrón glob de archivos .srt (entre comillas)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Procesos en paralelo")
+    parser.add_argument('--cache-dir', default=os.environ.get('FROM_CACHE_DIR'),
+                        help="Caché en disco de episodios y lemas (por defecto $FROM_CACHE_DIR)")
+    parser.add_argument('--mode', choices=MODES, default=DEFAULT_MODE, help="Modo de lematización")
+    parser.add_argument('--index', help="Guarda además el índice invertido en esta ruta (sólo episodes)")
+    parser.add_argument('--approximate', action='store_true',
+                        help="Top global y palabras clave con un sketch de memoria fija (sólo episodes)")
+    parser.add_argument('--format', choices=FORMATS, default='json', help="Formato de salida")
+    parser.add_argument('--output', '-o',
+                        help="Archivo JSON ('-' o nada: salida estándar) o directorio para Parquet")
+    parser.add_argument('--profile', action='store_true',
+                        help="Añade al informe tiempos por subetapa y contadores ('diagnostics')")
+    parser.add_argument('--cprofile', action='store_true', help="Perfil cProfile por etapa (implica --profile)")
+    parser.add_argument('--tracemalloc', action='store_true', help="Pico de memoria por etapa (implica --profile)")
+    return parser
+
+
+def main(argv=None):
+    """Uso: python -m analysis.batch {episodes,files} ENTRADA [--jobs N] [--cache-dir DIR] [--format json|parquet] [-o SALIDA] [--profile] [--approximate]"""
+    args = build_parser().parse_args(argv)
+    profile = args.profile or args.cprofile or args.tracemalloc
+    if profile:
+        instrumentation.enable(cprofile=args.cprofile, tracemalloc=args.tracemalloc)
+    else:
+        instrumentation.enable_from_env()
+    if args.format == 'parquet' and not args.output:
+        logger.error("Parquet output needs --output DIR")
+        return 2
+
+    timings = {}
+    start = time.perf_counter()
+    episode_files = resolve_inputs(args.input, episodes_only=args.command == 'episodes')
+    if not episode_files:
+        logger.error(f"No subtitle files found for {args.input!r}")
+        return 1
+
+    if args.cache_dir:
+        configure_lemma_store(os.path.join(args.cache_dir, 'lemmas'))
+    ensure_nltk_resources(nltk_resources_for(args.mode))
+    timings['setup'] = time.perf_counter() - start
+
+    if args.command == 'episodes':
+        cache_dir = os.path.join(args.cache_dir, 'episodes') if args.cache_dir else None
+        results, stage_timings = run_episodes(
+            episode_files, args.jobs, cache_dir, args.mode, args.index, args.approximate
+        )
+    else:
+        results, stage_timings = run_files(episode_files, args.jobs, args.mode)
+    timings.update(stage_timings)
+    diagnostics = instrumentation.disable()
+    # El informe incluye el total hasta aquí; la escritura sólo se registra en el log
+    timings['total'] = time.perf_counter() - start
+
+    report = {
+        'command': args.command,
+        'input': args.input,
+        'files': [path for _, path in episode_files],
+        'mode': args.mode,
+        'jobs': args.jobs,
+        'approximate': args.approximate,
+        'timings': timings,
+        'results': results
+    }
+    if diagnostics is not None:
+        report['diagnostics'] = diagnostics
+        logger.info("Diagnostics:\n" + instrumentation.format_report(diagnostics))
+
+    write_start = time.perf_counter()
+    try:
+        if args.format == 'parquet':
+            write_parquet(report, args.output)
+        else:
+            write_json(report, args.output)
+    except ImportError as e:
+        logger.error(f"Parquet output needs pandas with pyarrow or fastparquet: {str(e)}")
+        return 2
+    except OSError as e:
+        logger.error(f"Error writing results: {str(e)}")
+        return 2
+    logger.info(
+        "Timings: " + ", ".join(f"{stage} {secs:.3f}s" for stage, secs in timings.items())
+        + f", write {time.perf_counter() - write_start:.3f}s"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import logging
+import numpy as np
+from datetime import datetime, timezone
+from analysis.lexical_analysis import list_episode_files, encode_cues, aggregate_encoded
+from analysis.theme_analysis import identify_main_themes, get_theme_index
+from processing.srt_parser import parse_srt
+from processing.text_utils import MODES, DEFAULT_MODE, tokenize_and_lemmatize_batch
+from processing.synthetic_srt import build_profile, SyntheticCorpus
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+STAGES = ('parse_srt', 'tokenize_and_lemmatize', 'aggregate', 'identify_main_themes', 'generate_wordcloud')
+DEFAULT_SIZES = (10, 100)
+MAX_EPISODES = 10000
+
+# Una etapa falla si tarda más de (1 + THRESHOLD) veces la referencia y al
+# menos MIN_DELTA segundos más (para no fallar por ruido en etapas rápidas)
+THRESHOLD = 0.25
+MIN_DELTA = 0.05
+
+# Tokenizador de respaldo cuando los recursos NLTK no están disponibles: la
+# agregación y las etapas posteriores se miden igualmente
+FALLBACK_PATTERN = re.compile(r"\b[a-zA-Z']{3,}\b")
+
+
+def _fallback_tokenize(cues):
+    return [[word.lower() for word in FALLBACK_PATTERN.findall(sub['text'])] for sub in cues]
+
+
+def _probe(stage, check):
+    """None si la etapa puede ejecutarse; si no, el motivo"""
+    try:
+        check()
+        return None
+    except (LookupError, OSError) as e:
+        reason = next((line.strip() for line in str(e).splitlines() if any(c.isalpha() for c in line)), type(e).__name__)
+        logger.warning(f"Skipping {stage}: {reason}")
+        return reason
+
+
+def benchmark_corpus(episode_files, mode=DEFAULT_MODE):
+    """
+    Mide por separado cada etapa (STAGES) sobre un corpus [(episodio, ruta)].
+    Devuelve {'episodes', 'cues', 'tokens', 'stages': {etapa: segundos},
+    'skipped': {etapa: motivo}, 'throughput': {...}}.
+    """
+    from visualization.wordcloud_generator import render_wordcloud
+
+    skipped = {}
+    reason = _probe('tokenize_and_lemmatize', lambda: tokenize_and_lemmatize_batch([{'text': 'probe'}], mode=mode))
+    if reason:
+        skipped['tokenize_and_lemmatize'] = reason
+    # El índice de temas se construye antes: su coste no forma parte de la etapa
+    reason = _probe('identify_main_themes', get_theme_index)
+    if reason:
+        skipped['identify_main_themes'] = reason
+
+    stages = dict.fromkeys(STAGES, 0.0)
+    encoded = []
+    cues_total = tokens_total = 0
+    for _, filepath in episode_files:
+        start = time.perf_counter()
+        cues = parse_srt(filepath)
+        stages['parse_srt'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if 'tokenize_and_lemmatize' in skipped:
+            lemmas = _fallback_tokenize(cues)
+        else:
+            lemmas = tokenize_and_lemmatize_batch(cues, mode=mode)
+        stages['tokenize_and_lemmatize'] += time.perf_counter() - start
+
+        episode = encode_cues([(cues, lemmas)])
+        cues_total += len(cues)
+        tokens_total += len(episode['ids'])
+        encoded.append(episode)
+
+    start = time.perf_counter()
+    _, global_top, _, _ = aggregate_encoded([num for num, _ in episode_files], encoded, themes=False)
+    stages['aggregate'] = time.perf_counter() - start
+    del encoded
+
+    if 'identify_main_themes' not in skipped:
+        start = time.perf_counter()
+        identify_main_themes(global_top)
+        stages['identify_main_themes'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    render_wordcloud(dict(global_top[:100]))
+    stages['generate_wordcloud'] = time.perf_counter() - start
+
+    for stage in skipped:
+        stages[stage] = None
+    run = {
+        'episodes': len(episode_files),
+        'cues': cues_total,
+        'tokens': tokens_total,
+        'stages': stages,
+        'skipped': skipped
+    }
+    run['throughput'] = _throughput(run)
+    return run
+
+
+def _throughput(run):
+    """Subtítulos por segundo al parsear y tokens por segundo al lematizar"""
+    stages = run['stages']
+    return {
+        'parse_srt_cues_per_sec': run['cues'] / stages['parse_srt'] if stages['parse_srt'] else None,
+        'tokenize_tokens_per_sec': (
+            run['tokens'] / stages['tokenize_and_lemmatize'] if stages['tokenize_and_lemmatize'] else None
+        )
+    }
+
+
+def best_of(runs):
+    """Combina varias mediciones del mismo corpus quedándose con el mínimo de cada etapa"""
+    best = dict(runs[0], stages=dict(runs[0]['stages']))
+    for run in runs[1:]:
+        for stage, seconds in run['stages'].items():
+            if seconds is not None:
+                best['stages'][stage] = min(best['stages'][stage], seconds)
+    best['throughput'] = _throughput(best)
+    return best
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, data_folder=None, workdir=None, mode=DEFAULT_MODE,
+                   seed=0, cue_scale=1.0, messy=True, repeat=1):
+    """
+    Genera un corpus sintético con el perfil de data_folder (el del mayor
+    tamaño pedido; los menores son sus primeros episodios) y lo mide para
+    cada tamaño, repeat veces (se guarda el mejor tiempo de cada etapa).
+    Devuelve el informe completo.
+    """
+    sizes = sorted(set(sizes))
+    if not sizes or sizes[0] < 1 or sizes[-1] > MAX_EPISODES:
+        raise ValueError(f"Sizes must be between 1 and {MAX_EPISODES} episodes")
+    data_folder = data_folder or _default_data_folder()
+
+    profile = build_profile(list_episode_files(data_folder))
+    corpus = SyntheticCorpus(profile, seed=seed, messy=messy, cue_scale=cue_scale)
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='from_benchmark_')
+    try:
+        start = time.perf_counter()
+        episode_files = corpus.write_corpus(workdir, sizes[-1])
+        generation = time.perf_counter() - start
+
+        runs = []
+        for size in sizes:
+            logger.info(f"Benchmarking {size} episodes")
+            runs.append(best_of([benchmark_corpus(episode_files[:size], mode) for _ in range(repeat)]))
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'mode': mode,
+        'seed': seed,
+        'cue_scale': cue_scale,
+        'messy': messy,
+        'repeat': repeat,
+        'generation_secs': generation,
+        'runs': runs
+    }
+
+
+def find_regressions(report, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    """Etapas más lentas que en el informe de referencia: [(episodios, etapa, referencia, actual)]"""
+    reference = {run['episodes']: run['stages'] for run in baseline.get('runs', [])}
+    regressions = []
+    for run in report['runs']:
+        previous = reference.get(run['episodes'])
+        if previous is None:
+            continue
+        for stage, seconds in run['stages'].items():
+            before = previous.get(stage)
+            if seconds is None or before is None:
+                continue
+            if seconds > before * (1 + threshold) and seconds - before > min_delta:
+                regressions.append((run['episodes'], stage, before, seconds))
+    return regressions
+
+
+def format_report(report):
+    lines = [f"{'episodes':>8} {'cues':>9} {'tokens':>10} " + ' '.join(f"{stage[:12]:>12}" for stage in STAGES)]
+    for run in report['runs']:
+        cells = [f"{'skipped':>12}" if run['stages'][stage] is None else f"{run['stages'][stage]:>11.3f}s" for stage in STAGES]
+        lines.append(f"{run['episodes']:>8} {run['cues']:>9} {run['tokens']:>10} " + ' '.join(cells))
+    return '\n'.join(lines)
+
+
+def _default_data_folder():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m analysis.benchmark',
+        description="Benchmark por etapas sobre corpus SRT sintéticos"
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help=f"Número de episodios de cada corpus (1 a {MAX_EPISODES})")
+    parser.add_argument('--data', default=None, help="Carpeta con los episodios reales usados como perfil")
+    parser.add_argument('--workdir', default=None, help="Carpeta para el corpus generado (por defecto temporal)")
+    parser.add_argument('--mode', choices=MODES, default=DEFAULT_MODE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cue-scale', type=float, default=1.0, help="Factor sobre los subtítulos por episodio")
+    parser.add_argument('--repeat', type=int, default=1, help="Repeticiones por tamaño (se guarda la mejor)")
+    parser.add_argument('--clean', action='store_true', help="Archivos limpios (UTF-8, sin etiquetas ni CRLF)")
+    parser.add_argument('--output', '-o', help="Guarda el informe JSON en esta ruta")
+    parser.add_argument('--baseline', help="Informe JSON de referencia para detectar regresiones")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="Margen relativo permitido")
+    return parser
+
+
+def main(argv=None):
+    """Uso: python -m analysis.benchmark [--sizes 10 100 1000] [-o informe.json] [--baseline referencia.json]"""
+    args = build_parser().parse_args(argv)
+    report = run_benchmarks(
+        args.sizes, args.data, args.workdir, args.mode, args.seed, args.cue_scale,
+        messy=not args.clean, repeat=args.repeat
+    )
+    print(format_report(report))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.threshold)
+        for episodes, stage, before, seconds in regressions:
+            print(f"REGRESSION {stage} @ {episodes} episodes: {before:.3f}s -> {seconds:.3f}s")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import numpy as np
+from processing.vocabulary import Vocabulary
+from analysis.ngrams import merge_counts, KEY_DTYPE
+
+UNITS = ('tokens', 'seconds')
+
+
+def token_times(cue_offsets, cue_start, cue_end):
+    """
+    Instante (segundos) de cada token: los tokens de un subtítulo se reparten
+    uniformemente entre su inicio y su fin.
+    """
+    cue_offsets = np.asarray(cue_offsets)
+    sizes = np.diff(cue_offsets)
+    cue_of = np.repeat(np.arange(len(sizes)), sizes)
+    position = np.arange(cue_offsets[-1]) - cue_offsets[:-1][cue_of]
+    start = np.asarray(cue_start, dtype=np.float64)[cue_of]
+    duration = np.asarray(cue_end, dtype=np.float64)[cue_of] - start
+    return start + duration * (position + 0.5) / sizes[cue_of]
+
+
+def window_spans(ids, window, unit='tokens', times=None):
+    """
+    Para cada token, cuántos de los siguientes caen dentro de la ventana:
+    window - 1 tokens, o los que caen como mucho window segundos después.
+    """
+    n = len(ids)
+    if unit == 'tokens':
+        return np.minimum(window - 1, n - 1 - np.arange(n))
+    if unit == 'seconds':
+        if times is None:
+            raise ValueError("A window in seconds needs token times (cue_start/cue_end)")
+        return np.searchsorted(times, times + window, side='right') - 1 - np.arange(n)
+    raise ValueError(f"Unknown window unit {unit!r} (options: {', '.join(UNITS)})")
+
+
+class CooccurrenceMatrix:
+    """
+    Matriz dispersa simétrica de co-ocurrencias entre lemas.
+
+    Dos lemas distintos co-ocurren cada vez que aparecen dentro de la misma
+    ventana deslizante, medida en tokens o en segundos. Sólo se guarda el
+    triángulo superior, como claves (ID menor, ID mayor) empaquetadas en
+    uint64 y ordenadas, con su peso. Cada episodio se procesa con una
+    pasada vectorizada por desplazamiento dentro de la ventana, de modo que
+    el coste es lineal en el número de tokens.
+    """
+
+    def __init__(self, window=5, unit='tokens'):
+        if unit not in UNITS:
+            raise ValueError(f"Unknown window unit {unit!r} (options: {', '.join(UNITS)})")
+        self.window = window
+        self.unit = unit
+        self.vocabulary = Vocabulary()
+        self.keys = np.zeros(0, dtype=KEY_DTYPE)
+        self.weights = np.zeros(0, dtype=np.int64)
+        self.frequencies = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def from_encoded(cls, encoded, window=5, unit='tokens'):
+        """Construye la matriz a partir de episodios codificados (ver lexical_analysis.encode_episode)"""
+        matrix = cls(window, unit)
+        for episode in encoded:
+            matrix.add_episode(
+                episode['words'], episode['ids'],
+                episode.get('cue_offsets'), episode.get('cue_start'), episode.get('cue_end')
+            )
+        return matrix
+
+    def add_tokens(self, lemmas):
+        """Añade un flujo de lemas (p. ej. la salida de tokenize_and_lemmatize); sólo ventanas en tokens"""
+        if self.unit != 'tokens':
+            raise ValueError("Plain lemma streams have no timing; use a window in tokens")
+        vocabulary = Vocabulary()
+        ids = vocabulary.encode(lemmas)
+        self.add_episode(vocabulary.words, ids)
+
+    def add_episode(self, words, ids, cue_offsets=None, cue_start=None, cue_end=None):
+        """Acumula las co-ocurrencias de un episodio (IDs locales sobre su vocabulario words)"""
+        mapping = self.vocabulary.merge(words)
+        ids = mapping[np.asarray(ids, dtype=np.intp)].astype(np.int64)
+        self.frequencies = np.concatenate((
+            self.frequencies, np.zeros(len(self.vocabulary) - len(self.frequencies), dtype=np.int64)
+        ))
+        self.frequencies += np.bincount(ids, minlength=len(self.vocabulary))
+        if len(ids) < 2:
+            return
+
+        times = None
+        if self.unit == 'seconds':
+            times = token_times(cue_offsets, cue_start, cue_end)
+            order = np.argsort(times, kind='stable')
+            ids, times = ids[order], times[order]
+
+        spans = window_spans(ids, self.window, self.unit, times)
+        pair_keys = []
+        for distance in range(1, int(spans.max(initial=0)) + 1):
+            first = np.flatnonzero(spans >= distance)
+            a, b = ids[first], ids[first + distance]
+            distinct = a != b
+            a, b = a[distinct], b[distinct]
+            pair_keys.append((np.minimum(a, b).astype(KEY_DTYPE) << KEY_DTYPE(32)) | np.maximum(a, b).astype(KEY_DTYPE))
+        if pair_keys:
+            keys, counts = np.unique(np.concatenate(pair_keys), return_counts=True)
+            self.keys, self.weights = merge_counts(self.keys, self.weights, keys, counts.astype(np.int64))
+
+    def edges(self):
+        """Arrays (origen, destino, peso) del triángulo superior"""
+        mask = KEY_DTYPE(0xFFFFFFFF)
+        return (self.keys >> KEY_DTYPE(32)).astype(np.int64), (self.keys & mask).astype(np.int64), self.weights
+
+    def neighbors(self, word, k=10):
+        """Los k lemas que más co-ocurren con word: [(lema, peso)]"""
+        i = self.vocabulary.get(word)
+        if i is None:
+            raise KeyError(f"Unknown word: {word}")
+        src, dst, weights = self.edges()
+        touching = np.flatnonzero((src == i) | (dst == i))
+        other = np.where(src[touching] == i, dst[touching], src[touching])
+        order = np.argsort(-weights[touching], kind='stable')[:k]
+        words = self.vocabulary.words
+        return [(words[j], int(w)) for j, w in zip(other[order].tolist(), weights[touching][order].tolist())]
+
+    def prune(self, k=5, max_nodes=None, min_weight=1):
+        """
+        Aristas (origen, destino, peso) que están entre las k de mayor peso de
+        alguno de sus dos extremos. Con max_nodes sólo se consideran los lemas
+        más frecuentes.
+        """
+        src, dst, weights = self.edges()
+        keep = weights >= min_weight
+        if max_nodes is not None:
+            allowed = np.zeros(len(self.vocabulary), dtype=bool)
+            allowed[np.argsort(-self.frequencies, kind='stable')[:max_nodes]] = True
+            keep &= allowed[src] & allowed[dst]
+        src, dst, weights = src[keep], dst[keep], weights[keep]
+        if not len(src):
+            return src, dst, weights
+
+        # Cada arista aparece en ambas direcciones; se ordena por nodo y peso descendente
+        node = np.concatenate((src, dst))
+        edge = np.concatenate((np.arange(len(src)), np.arange(len(src))))
+        order = np.lexsort((-np.concatenate((weights, weights)), node))
+        node, edge = node[order], edge[order]
+        group_start = np.flatnonzero(np.concatenate(([True], node[1:] != node[:-1])))
+        rank = np.arange(len(node)) - np.repeat(group_start, np.diff(np.append(group_start, len(node))))
+        selected = np.unique(edge[rank < k])
+        return src[selected], dst[selected], weights[selected]
+
+    def to_graph(self, k=5, max_nodes=100, min_weight=1):
+        """Lista de nodos y aristas lista para dibujar: {'nodes': [...], 'edges': [...]}"""
+        src, dst, weights = self.prune(k, max_nodes, min_weight)
+        words = self.vocabulary.words
+        node_ids = np.unique(np.concatenate((src, dst)))
+        return {
+            'nodes': [
+                {'id': words[i], 'frequency': int(self.frequencies[i])}
+                for i in node_ids.tolist()
+            ],
+            'edges': [
+                {'source': words[a], 'target': words[b], 'weight': int(w)}
+                for a, b, w in zip(src.tolist(), dst.tolist(), weights.tolist())
+            ]
+        }
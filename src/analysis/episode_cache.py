@@ -0,0 +1,161 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+from processing import text_utils
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+
+def pipeline_fingerprint(mode=text_utils.DEFAULT_MODE):
+    """Huella de la configuración de procesamiento (stopwords + tokenizador/lematizador)"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(text_utils.pipeline_config(mode), sort_keys=True).encode('utf-8'))
+    digest.update('\n'.join(sorted(text_utils.get_stop_words())).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """Hash SHA-256 del contenido binario de un archivo"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EpisodeCache:
+    """
+    Caché en disco de episodios procesados.
+
+    Cada entrada se guarda en un archivo .npz cuyo nombre es el hash del
+    contenido del SRT combinado con la huella del pipeline, de modo que cambiar
+    el archivo, las stopwords o la configuración del tokenizador invalida la
+    entrada automáticamente. El tamaño total se limita con expulsión LRU
+    (la fecha de modificación se actualiza en cada acierto). Las escrituras son
+    atómicas, por lo que varias réplicas pueden compartir el mismo directorio.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, mode=text_utils.DEFAULT_MODE, fingerprint=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mode = mode
+        # Otros artefactos por episodio (p. ej. sentimiento) usan su propia huella
+        self.fingerprint = fingerprint or pipeline_fingerprint(mode)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key_for(self, file_path):
+        """Clave de caché de un archivo SRT"""
+        digest = hashlib.sha256()
+        digest.update(self.fingerprint.encode('ascii'))
+        digest.update(file_digest(file_path).encode('ascii'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """Devuelve la entrada almacenada ({nombre: array}) o None si no existe"""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                payload = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {str(e)}")
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        # Marcar como usada recientemente (LRU)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return payload
+
+    def put(self, key, payload):
+        """Guarda una entrada ({nombre: array}) de forma atómica y aplica el límite de tamaño"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing cache entry {key}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def invalidate(self, key):
+        """Elimina una entrada concreta"""
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def invalidate_file(self, file_path):
+        """Elimina la entrada correspondiente a un archivo SRT"""
+        return self.invalidate(self.key_for(file_path))
+
+    def clear(self):
+        """Vacía la caché por completo"""
+        removed = 0
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        logger.info(f"Cleared {removed} cache entries")
+        return removed
+
+    def _entries(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.npz'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def size(self):
+        """Tamaño total en bytes de las entradas almacenadas"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Expulsa las entradas menos usadas hasta respetar max_bytes"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        for path, size, _ in sorted(entries, key=lambda x: x[2]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} cache entries")
+        return evicted
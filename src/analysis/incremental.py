@@ -0,0 +1,300 @@
+import os
+import json
+import logging
+from collections import defaultdict
+from analysis.lexical_analysis import (
+    list_episode_files, load_episode_counts, load_encoded_episodes, summarize_episode, top_global_words
+)
+from analysis.theme_analysis import identify_main_themes
+from analysis.episode_cache import EpisodeCache, file_digest, pipeline_fingerprint
+from analysis.term_matrix import TermMatrix
+from analysis.ngrams import NgramModel
+from analysis.cooccurrence import CooccurrenceMatrix
+from analysis.tfidf import TfidfModel
+from analysis.inverted_index import InvertedIndex, corpus_fingerprint
+from processing.text_utils import DEFAULT_MODE, check_mode
+from processing import instrumentation
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+STATE_VERSION = 2
+EVOLUTION_TOP = 50
+
+
+class IncrementalCorpus:
+    """
+    Estado persistente del corpus para actualizaciones incrementales.
+
+    Guarda, por archivo, su tamaño, fecha de modificación y hash, junto con el
+    conteo de lemas del episodio y los agregados globales. El estado lleva la
+    huella del pipeline (stopwords y tokenizador/lematizador): si no coincide
+    con la actual se descarta y se reprocesa todo. En cada update()
+    sólo se procesan los archivos añadidos o modificados; los agregados se
+    actualizan restando los conteos antiguos y sumando los nuevos, y los
+    resultados derivados sólo se recalculan si cambian sus entradas.
+    """
+
+    def __init__(self, state_path, jobs=1, cache_dir=None, mode=DEFAULT_MODE):
+        self.state_path = state_path
+        self.jobs = jobs
+        self.mode = check_mode(mode)
+        self.fingerprint = pipeline_fingerprint(mode)
+        self.cache = EpisodeCache(cache_dir, mode=mode) if cache_dir else None
+        self.files = {}
+        self.episode_counts = {}
+        self.global_word_count = defaultdict(int)
+        self.results = {}
+        self.global_top = []
+        self.semantic_evolution = {}
+        self.main_themes = []
+        self._tfidf = None
+        self.load()
+
+    # Persistencia
+
+    def load(self):
+        """Carga el estado guardado (si existe y es compatible)"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable corpus state: {str(e)}")
+            return
+
+        if state.get('version') != STATE_VERSION:
+            logger.info("Corpus state version changed, starting from scratch")
+            return
+        if state.get('mode', DEFAULT_MODE) != self.mode:
+            logger.info("Corpus state was built in another processing mode, starting from scratch")
+            return
+        # Stopwords o tokenizador/lematizador distintos: los conteos guardados ya no valen
+        if state.get('fingerprint') != self.fingerprint:
+            logger.info("Processing pipeline changed since the corpus state was saved, starting from scratch")
+            return
+
+        self.files = state['files']
+        self.episode_counts = state['episode_counts']
+        self.global_word_count = defaultdict(int, state['global_word_count'])
+        self.results = {
+            episode: dict(row, top_words=[tuple(x) for x in row['top_words']])
+            for episode, row in state['results'].items()
+        }
+        self.global_top = [tuple(x) for x in state['global_top']]
+        self.semantic_evolution = {
+            word: [tuple(x) for x in series]
+            for word, series in state['semantic_evolution'].items()
+        }
+        self.main_themes = [
+            (theme, dict(data, top_words=[tuple(x) for x in data['top_words']]))
+            for theme, data in state['main_themes']
+        ]
+
+    def save(self):
+        """Guarda el estado de forma atómica"""
+        state = {
+            'version': STATE_VERSION,
+            'mode': self.mode,
+            'fingerprint': self.fingerprint,
+            'files': self.files,
+            'episode_counts': self.episode_counts,
+            'global_word_count': self.global_word_count,
+            'results': self.results,
+            'global_top': self.global_top,
+            'semantic_evolution': self.semantic_evolution,
+            'main_themes': self.main_themes
+        }
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp_path, self.state_path)
+
+    # Detección de cambios
+
+    def detect_changes(self, data_folder):
+        """Compara la carpeta con el estado guardado"""
+        current = {}
+        added, changed = [], []
+        for episode_num, filepath in list_episode_files(data_folder):
+            filename = os.path.basename(filepath)
+            stat = os.stat(filepath)
+            previous = self.files.get(filename)
+            entry = {
+                'episode': episode_num,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'digest': previous['digest'] if previous else None
+            }
+
+            # Sólo se calcula el hash si el tamaño o la fecha cambiaron
+            if previous is None or (previous['size'], previous['mtime_ns']) != (entry['size'], entry['mtime_ns']):
+                entry['digest'] = file_digest(filepath)
+                if previous is None:
+                    added.append(filename)
+                elif previous['digest'] != entry['digest']:
+                    changed.append(filename)
+            current[filename] = (filepath, entry)
+
+        removed = [filename for filename in self.files if filename not in current]
+        return current, {'added': added, 'changed': changed, 'removed': removed}
+
+    # Actualización
+
+    def _subtract(self, episode_num):
+        for word, count in self.episode_counts.pop(episode_num, {}).items():
+            remaining = self.global_word_count.get(word, 0) - count
+            if remaining > 0:
+                self.global_word_count[word] = remaining
+            else:
+                self.global_word_count.pop(word, None)
+        self.results.pop(episode_num, None)
+        if self._tfidf is not None and episode_num in self._tfidf.rows:
+            self._tfidf.remove_episode(episode_num)
+
+    def _add(self, episode_num, counts):
+        self.episode_counts[episode_num] = counts
+        if self._tfidf is not None:
+            self._tfidf.add_episode(episode_num, counts)
+        for word, count in counts.items():
+            self.global_word_count[word] += count
+        self.results[episode_num] = summarize_episode(episode_num, defaultdict(int, counts))
+
+    def _reorder_global(self):
+        ordered = {}
+        for episode_num in sorted(self.episode_counts):
+            for word in self.episode_counts[episode_num]:
+                if word not in ordered:
+                    ordered[word] = self.global_word_count[word]
+        self.global_word_count = defaultdict(int, ordered)
+
+    @instrumentation.instrumented('incremental.update')
+    def update(self, data_folder):
+        """Procesa sólo los episodios añadidos, modificados o eliminados"""
+        current, changes = self.detect_changes(data_folder)
+        touched = changes['added'] + changes['changed']
+        affected = set()
+        last_episode = max(self.episode_counts) if self.episode_counts else ''
+
+        # Restar episodios eliminados o modificados
+        for filename in changes['removed'] + changes['changed']:
+            episode_num = self.files[filename]['episode']
+            self._subtract(episode_num)
+            affected.add(episode_num)
+
+        # Procesar los episodios nuevos o modificados
+        if touched:
+            episode_files = [(current[f][1]['episode'], current[f][0]) for f in touched]
+            for (episode_num, _), counts in zip(episode_files, load_episode_counts(episode_files, self.jobs, self.cache, self.mode)):
+                self._add(episode_num, counts)
+                affected.add(episode_num)
+
+        # Si el cambio no es sólo añadir episodios al final, se restablece el orden
+        # de primera aparición del conteo global (desempates idénticos a process_episodes)
+        if changes['changed'] or changes['removed'] or any(
+            current[f][1]['episode'] < last_episode for f in changes['added']
+        ):
+            self._reorder_global()
+
+        self.files = {filename: entry for filename, (_, entry) in current.items()}
+        if affected or not self.global_top:
+            self._refresh_derived(affected)
+
+        logger.info(
+            f"Incremental update: {len(changes['added'])} added, "
+            f"{len(changes['changed'])} changed, {len(changes['removed'])} removed"
+        )
+        self.save()
+        return changes
+
+    def _refresh_derived(self, affected):
+        """Recalcula sólo los resultados derivados afectados por el cambio"""
+        episodes = sorted(self.episode_counts)
+
+        # Top 100 global y temas (sólo si el top cambia)
+        global_top = top_global_words(self.global_word_count)
+        if global_top != self.global_top or not self.main_themes:
+            self.global_top = global_top
+            self.main_themes = identify_main_themes(global_top) if global_top else []
+
+        # Evolución semántica: las series existentes sólo se actualizan en los episodios afectados
+        keywords = [word for word, _ in top_global_words(self.global_word_count, EVOLUTION_TOP)]
+        evolution = {}
+        for word in keywords:
+            previous = self.semantic_evolution.get(word)
+            if previous is None:
+                evolution[word] = [(ep, self.episode_counts[ep].get(word, 0)) for ep in episodes]
+                continue
+            series = {ep: freq for ep, freq in previous if ep not in affected}
+            for ep in affected:
+                if ep in self.episode_counts:
+                    series[ep] = self.episode_counts[ep].get(word, 0)
+            evolution[word] = [(ep, series[ep]) for ep in episodes]
+        self.semantic_evolution = evolution
+
+    def term_matrix(self):
+        """Matriz episodios × vocabulario del estado actual"""
+        return TermMatrix.from_counts(
+            [(episode, self.episode_counts[episode]) for episode in sorted(self.episode_counts)]
+        )
+
+    def tfidf_model(self):
+        """
+        Modelo TF-IDF del estado actual. Se construye la primera vez y después
+        update() le añade y quita episodios, actualizando el IDF sin recalcularlo.
+        """
+        if self._tfidf is None:
+            self._tfidf = TfidfModel.from_term_matrix(self.term_matrix())
+        return self._tfidf
+
+    def inverted_index(self, data_folder, path=None, episodes=None):
+        """
+        Índice invertido de los episodios actuales. Con path se reutiliza el
+        guardado mientras los archivos (según sus hashes) y el modo no cambien.
+        """
+        fingerprint = corpus_fingerprint(
+            [(entry['episode'], entry['digest']) for entry in self.files.values()], self.mode
+        )
+        if path:
+            index = InvertedIndex.load(path, fingerprint)
+            if index is not None:
+                return index
+        episodes = episodes if episodes is not None else self.encoded_episodes(data_folder)
+        index = InvertedIndex.from_encoded([num for num, _ in episodes], [episode for _, episode in episodes])
+        logger.info(f"Built inverted index over {len(index)} tokens")
+        if path:
+            index.save(path, fingerprint)
+        return index
+
+    def encoded_episodes(self, data_folder):
+        """Episodios codificados actuales [(episodio, codificación)]; salen de la caché si está activa"""
+        episode_files = list_episode_files(data_folder)
+        encoded = load_encoded_episodes(episode_files, self.jobs, self.cache, self.mode)
+        return [(episode_num, episode) for (episode_num, _), episode in zip(episode_files, encoded)]
+
+    def ngram_model(self, data_folder, orders=(2, 3), episodes=None):
+        """Bigramas/trigramas de los episodios actuales (o de los episodios codificados dados)"""
+        episodes = episodes if episodes is not None else self.encoded_episodes(data_folder)
+        return NgramModel.from_encoded([num for num, _ in episodes], [episode for _, episode in episodes], orders)
+
+    def cooccurrence(self, data_folder, window=5, unit='tokens', episodes=None):
+        """Matriz de co-ocurrencias de los episodios actuales (ventana en tokens o segundos)"""
+        episodes = episodes if episodes is not None else self.encoded_episodes(data_folder)
+        return CooccurrenceMatrix.from_encoded([episode for _, episode in episodes], window, unit)
+
+    def outputs(self):
+        """Resultados en el mismo formato que process_episodes"""
+        results = [self.results[episode] for episode in sorted(self.results)]
+        return results, self.global_top, self.semantic_evolution, self.main_themes
+
+
+def update_episodes(data_folder, state_path, jobs=1, cache_dir=None, mode=DEFAULT_MODE):
+    """Variante incremental de process_episodes: sólo procesa los archivos que cambiaron"""
+    corpus = IncrementalCorpus(state_path, jobs=jobs, cache_dir=cache_dir, mode=mode)
+    corpus.update(data_folder)
+    return corpus.outputs()
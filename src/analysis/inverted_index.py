@@ -0,0 +1,291 @@
+import os
+import json
+import hashlib
+import numpy as np
+import logging
+from processing.vocabulary import Vocabulary
+from processing.text_utils import DEFAULT_MODE, pipeline_config
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+INDEX_VERSION = 2
+
+
+def corpus_fingerprint(file_digests, mode=DEFAULT_MODE):
+    """Huella de los archivos indexados ([(episodio, hash)]) y de la configuración del pipeline"""
+    payload = {'version': INDEX_VERSION, 'files': sorted(file_digests), 'pipeline': pipeline_config(mode)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def smallest_uint(values):
+    """values con el tipo entero sin signo más pequeño que los admite"""
+    values = np.asarray(values)
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if not len(values) or values.max() <= np.iinfo(dtype).max:
+            return values.astype(dtype)
+    return values.astype(np.uint64)
+
+
+def varint_encode(values):
+    """
+    Codificación de longitud variable (7 bits por byte, el bit alto indica que
+    el valor continúa): los valores pequeños ocupan un byte aunque haya
+    alguno grande.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        nbytes += values >= np.uint64(1 << (7 * k))
+    offsets = np.concatenate(([0], np.cumsum(nbytes)))
+    data = np.empty(int(offsets[-1]), dtype=np.uint8)
+    for k in range(int(nbytes.max(initial=0))):
+        selected = np.flatnonzero(nbytes > k)
+        byte = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        data[offsets[selected] + k] = byte | np.where(nbytes[selected] > k + 1, np.uint64(0x80), np.uint64(0))
+    return data
+
+
+def varint_decode(data):
+    """Inversa de varint_encode"""
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    last = (data & 0x80) == 0
+    value_start = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    rank = np.arange(len(data)) - np.repeat(value_start, np.diff(np.append(value_start, len(data))))
+    parts = (data & 0x7F).astype(np.uint64) << (7 * rank).astype(np.uint64)
+    return np.bitwise_or.reduceat(parts, value_start).astype(np.int64)
+
+
+def delta_encode(positions, term_ptr):
+    """
+    Listas de posiciones ordenadas de cada término en forma compacta: la
+    primera posición de cada lista no vacía va aparte (firsts, en el entero
+    sin signo más pequeño posible) y el resto como diferencias con la
+    anterior en varint (gaps), de modo que el tamaño del corpus no obliga a
+    usar enteros anchos para todas las diferencias.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    sizes = np.diff(term_ptr)
+    starts = term_ptr[:-1][sizes > 0]
+    gaps = np.diff(positions, prepend=0)
+    rest = np.ones(len(positions), dtype=bool)
+    rest[starts] = False
+    return smallest_uint(positions[starts]), varint_encode(gaps[rest])
+
+
+def delta_decode(firsts, gaps, term_ptr):
+    """Inversa de delta_encode: suma acumulada que se reinicia en cada término"""
+    sizes = np.diff(term_ptr)
+    starts = term_ptr[:-1][sizes > 0]
+    deltas = np.zeros(int(term_ptr[-1]), dtype=np.int64)
+    rest = np.ones(len(deltas), dtype=bool)
+    rest[starts] = False
+    deltas[rest] = varint_decode(gaps)
+    deltas[starts] = firsts
+    total = np.cumsum(deltas)
+    base = total[starts] - deltas[starts]
+    return total - np.repeat(base, sizes[sizes > 0])
+
+
+def stream_from_postings(term_ptr, positions):
+    """Flujo de IDs reconstruido a partir de las listas de apariciones"""
+    stream = np.empty(len(positions), dtype=np.uint32)
+    stream[positions] = np.repeat(np.arange(len(term_ptr) - 1, dtype=np.uint32), np.diff(term_ptr))
+    return stream
+
+
+class InvertedIndex:
+    """
+    Índice invertido lema → apariciones en todo el corpus.
+
+    Los tokens de todos los episodios se concatenan en un solo flujo de IDs
+    globales; la lista de apariciones de cada lema son sus posiciones en ese
+    flujo, ordenadas, en formato CSR (term_ptr). Episodio, subtítulo, instante
+    y desplazamiento dentro del episodio se deducen de la posición con
+    búsquedas binarias sobre los límites de episodios y subtítulos, y el
+    propio flujo sirve para el contexto (KWIC) y para comprobar frases.
+
+    En disco sólo se guardan las listas, con la primera posición de cada una
+    aparte y el resto como diferencias en varint (ver delta_encode); el flujo
+    se reconstruye a partir de ellas al cargar.
+    """
+
+    def __init__(self, episodes, words, stream, episode_ptr, cue_offsets, cue_ids, cue_start, term_ptr, positions):
+        self.episodes = list(episodes)
+        self.vocabulary = Vocabulary(words)
+        self.stream = stream
+        self.episode_ptr = episode_ptr
+        self.cue_offsets = cue_offsets
+        self.cue_ids = cue_ids
+        self.cue_start = cue_start
+        self.term_ptr = term_ptr
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.stream)
+
+    @classmethod
+    def from_encoded(cls, episode_nums, encoded):
+        """Construye el índice a partir de los episodios codificados (ver lexical_analysis.encode_episode)"""
+        vocabulary = Vocabulary()
+        streams, episode_ptr = [], [0]
+        cue_offsets, cue_ids, cue_start = [np.zeros(1, dtype=np.int64)], [], []
+        for episode in encoded:
+            mapping = vocabulary.merge(episode['words'])
+            ids = mapping[np.asarray(episode['ids'], dtype=np.intp)]
+            streams.append(ids)
+            # Límites de subtítulos en coordenadas del flujo global
+            cue_offsets.append(np.asarray(episode['cue_offsets'][1:], dtype=np.int64) + episode_ptr[-1])
+            cue_ids.append(np.asarray(episode['cue_ids'], dtype=np.int32))
+            cue_start.append(np.asarray(episode['cue_start'], dtype=np.float64))
+            episode_ptr.append(episode_ptr[-1] + len(ids))
+
+        stream = np.concatenate(streams).astype(np.uint32) if streams else np.zeros(0, dtype=np.uint32)
+        # Orden estable por lema: las posiciones de cada lema quedan ordenadas
+        positions = np.argsort(stream, kind='stable').astype(np.int64)
+        term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(stream, minlength=len(vocabulary)), out=term_ptr[1:])
+        return cls(
+            episode_nums, vocabulary.words, stream,
+            np.asarray(episode_ptr, dtype=np.int64),
+            np.concatenate(cue_offsets),
+            np.concatenate(cue_ids) if cue_ids else np.zeros(0, dtype=np.int32),
+            np.concatenate(cue_start) if cue_start else np.zeros(0, dtype=np.float64),
+            term_ptr, positions
+        )
+
+    # Persistencia
+
+    def save(self, path, fingerprint=''):
+        """Guarda el índice (listas codificadas por diferencias, sin el flujo) de forma atómica"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        firsts, gaps = delta_encode(self.positions, self.term_ptr)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    version=np.array(INDEX_VERSION),
+                    fingerprint=np.array(fingerprint),
+                    episodes=np.array(self.episodes, dtype=str),
+                    words=np.array(self.vocabulary.words, dtype=str),
+                    episode_ptr=self.episode_ptr,
+                    cue_offsets=self.cue_offsets,
+                    cue_ids=self.cue_ids,
+                    cue_start=self.cue_start,
+                    term_ptr=self.term_ptr,
+                    firsts=firsts,
+                    gaps=gaps
+                )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing inverted index: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """Carga un índice guardado; None si no existe, no se puede leer o su huella no coincide"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != INDEX_VERSION:
+                    return None
+                if fingerprint is not None and str(data['fingerprint']) != fingerprint:
+                    logger.info("Inverted index is stale, rebuilding")
+                    return None
+                term_ptr = data['term_ptr']
+                positions = delta_decode(data['firsts'], data['gaps'], term_ptr)
+                return cls(
+                    data['episodes'].tolist(), data['words'].tolist(), stream_from_postings(term_ptr, positions),
+                    data['episode_ptr'], data['cue_offsets'], data['cue_ids'], data['cue_start'],
+                    term_ptr, positions
+                )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable inverted index: {str(e)}")
+            return None
+
+    # Consultas
+
+    def _occurrences(self, word):
+        word_id = self.vocabulary.get(word)
+        if word_id is None:
+            return np.zeros(0, dtype=np.int64)
+        return self.positions[self.term_ptr[word_id]:self.term_ptr[word_id + 1]]
+
+    def frequency(self, word):
+        return len(self._occurrences(word))
+
+    def phrase_positions(self, lemmas):
+        """Posiciones de inicio de la secuencia de lemas dentro de un mismo subtítulo"""
+        lemmas = list(lemmas)
+        if not lemmas:
+            return np.zeros(0, dtype=np.int64)
+        ids = [self.vocabulary.get(lemma) for lemma in lemmas]
+        if any(i is None for i in ids):
+            return np.zeros(0, dtype=np.int64)
+        if len(ids) == 1:
+            return self._occurrences(lemmas[0])
+
+        # Se parte del lema menos frecuente y se comprueban sus vecinos en el flujo
+        rarest = int(np.argmin([self.term_ptr[i + 1] - self.term_ptr[i] for i in ids]))
+        starts = self._occurrences(lemmas[rarest]) - rarest
+        starts = starts[(starts >= 0) & (starts + len(ids) <= len(self.stream))]
+        for k, word_id in enumerate(ids):
+            starts = starts[self.stream[starts + k] == word_id]
+        # Las frases no cruzan límites de subtítulo
+        cues = np.searchsorted(self.cue_offsets, starts, side='right')
+        return starts[cues == np.searchsorted(self.cue_offsets, starts + len(ids) - 1, side='right')]
+
+    def locate(self, positions):
+        """Columnas (episodio, número de subtítulo, inicio en segundos, desplazamiento en el episodio)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        episode = np.searchsorted(self.episode_ptr, positions, side='right') - 1
+        cue = np.searchsorted(self.cue_offsets, positions, side='right') - 1
+        return episode, self.cue_ids[cue], self.cue_start[cue], positions - self.episode_ptr[episode]
+
+    def postings(self, word):
+        """Apariciones de un lema: [(episodio, número de subtítulo, inicio en segundos, desplazamiento)]"""
+        episode, cue_id, start, offset = self.locate(self._occurrences(word))
+        return [
+            (self.episodes[e], c, s, o)
+            for e, c, s, o in zip(episode.tolist(), cue_id.tolist(), start.tolist(), offset.tolist())
+        ]
+
+    def concordance(self, lemmas, width=5, limit=100, episode=None):
+        """
+        Concordancia (KWIC) de un lema o una frase de lemas: por aparición,
+        su episodio, subtítulo, instante y los width lemas a cada lado (sin
+        salir del episodio).
+        """
+        lemmas = [lemmas] if isinstance(lemmas, str) else list(lemmas)
+        starts = self.phrase_positions(lemmas)
+        if episode is not None:
+            i = self.episodes.index(episode)
+            starts = starts[(starts >= self.episode_ptr[i]) & (starts < self.episode_ptr[i + 1])]
+        starts = starts[:limit]
+
+        episode_idx, cue_ids, cue_start, offsets = self.locate(starts)
+        words = self.vocabulary.words
+        lines = []
+        for pos, e, cue_id, start, offset in zip(
+            starts.tolist(), episode_idx.tolist(), cue_ids.tolist(), cue_start.tolist(), offsets.tolist()
+        ):
+            left = self.stream[max(self.episode_ptr[e], pos - width):pos]
+            right = self.stream[pos + len(lemmas):min(self.episode_ptr[e + 1], pos + len(lemmas) + width)]
+            lines.append({
+                'episode': self.episodes[e],
+                'cue_id': cue_id,
+                'start_sec': start,
+                'offset': offset,
+                'left': ' '.join(words[i] for i in left.tolist()),
+                'keyword': ' '.join(lemmas),
+                'right': ' '.join(words[i] for i in right.tolist())
+            })
+        return lines
@@ -1,87 +1,434 @@
 import os
+import time
+import tempfile
+import numpy as np
+from contextlib import contextmanager
 from collections import defaultdict
-from processing.srt_parser import parse_srt
-from processing.text_utils import tokenize_and_lemmatize
+from itertools import islice
+from functools import partial
+from processing.srt_parser import iter_srt
+from processing import instrumentation
+from processing.text_utils import (
+    tokenize_and_lemmatize_batch, BATCH_SIZE, DEFAULT_MODE,
+    get_lemma_store, flush_lemma_store, spill_lemma_store, prewarm_lemma_store
+)
+from processing.vocabulary import Vocabulary, StreamEncoder, word_count_from_ids
 from analysis.theme_analysis import identify_main_themes
+from analysis.episode_cache import EpisodeCache, file_digest
+from analysis.term_matrix import TermMatrix
+from analysis.sketches import HeavyHitters
+from analysis.inverted_index import InvertedIndex, corpus_fingerprint
 import logging
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-def process_episodes(data_folder):
+def episode_number(filename):
+    """Número de episodio de un archivo episode_NN*.srt (o su nombre sin extensión)"""
+    filename = os.path.basename(filename)
+    if filename.startswith('episode_'):
+        return filename.split('_')[1].split('.')[0]
+    return filename.split('.')[0]
+
+def list_episode_files(data_folder):
+    """Lista los archivos de episodios (episode_NN*.srt) ordenados por nombre"""
+    episodes = []
+    for filename in sorted(os.listdir(data_folder)):
+        if filename.startswith('episode_') and filename.endswith('.srt'):
+            episodes.append((episode_number(filename), os.path.join(data_folder, filename)))
+    return episodes
+
+def encode_episode(filepath, batch_size=BATCH_SIZE, mode=DEFAULT_MODE):
+    """
+    Parsea y lematiza un episodio por lotes de subtítulos (mode: ver text_utils.MODES).
+    Devuelve un diccionario con el vocabulario local del episodio ('words', en
+    orden de primera aparición), la secuencia de tokens como array de IDs uint32
+    ('ids') y, por subtítulo, el desplazamiento de sus tokens ('cue_offsets'),
+    su número en el SRT ('cue_ids') y sus tiempos ('cue_start', 'cue_end'). Es una representación compacta, apta
+    para enviarse entre procesos y para análisis alineados en el tiempo.
+    """
+    subtitles = iter_srt(filepath)
+    batches = []
+    while True:
+        with instrumentation.stage('parse_srt'):
+            cues = list(islice(subtitles, batch_size))
+        if not cues:
+            break
+        with instrumentation.stage('tokenize_and_lemmatize'):
+            batches.append((cues, tokenize_and_lemmatize_batch(cues, batch_size, mode)))
+    
+    return encode_cues(batches)
+
+def encode_cues(batches):
+    """
+    Codificación de episodio (ver encode_episode) a partir de lotes
+    (subtítulos, lemas de cada subtítulo) ya tokenizados.
+    """
+    encoder = StreamEncoder()
+    cue_offsets = [0]
+    cue_ids, cue_start, cue_end = [], [], []
+    for cues, cue_lemmas in batches:
+        for sub, lemmas in zip(cues, cue_lemmas):
+            encoder.extend(lemmas)
+            cue_offsets.append(len(encoder))
+            cue_ids.append(sub['id'])
+            cue_start.append(sub['start_sec'])
+            cue_end.append(sub['end_sec'])
+    
+    return {
+        'words': encoder.vocabulary.words,
+        'ids': encoder.ids,
+        'cue_offsets': np.asarray(cue_offsets, dtype=np.int64),
+        'cue_ids': np.asarray(cue_ids, dtype=np.int32),
+        'cue_start': np.asarray(cue_start, dtype=np.float64),
+        'cue_end': np.asarray(cue_end, dtype=np.float64)
+    }
+
+def count_episode_words(filepath, mode=DEFAULT_MODE):
+    """Conteo {lema: frecuencia} de un episodio en orden de primera aparición"""
+    episode = encode_episode(filepath, mode=mode)
+    return word_count_from_ids(episode['words'], episode['ids'])
+
+def prewarm_lemmas(filepaths):
+    """Precalienta el almacén de lemas con el vocabulario de los episodios indicados"""
+    return prewarm_lemma_store(sub['text'] for filepath in filepaths for sub in iter_srt(filepath))
+
+def _encode_in_worker(filepath, mode=DEFAULT_MODE):
+    """encode_episode en un worker del pool: los lemas nuevos van a su shard del almacén"""
+    episode = encode_episode(filepath, mode=mode)
+    spill_lemma_store()
+    return episode
+
+def _encode_episodes(filepaths, jobs=1, mode=DEFAULT_MODE):
+    """
+    Codifica varios episodios, en paralelo si jobs > 1. Los lemas nuevos se
+    guardan en el almacén una sola vez al terminar (los de los workers, a
+    través de sus shards).
+    """
+    if jobs and jobs > 1 and len(filepaths) > 1:
+        # Con almacén persistente, los workers arrancan con todos los lemas ya calculados
+        if get_lemma_store().path:
+            prewarm_lemmas(filepaths)
+        logger.info(f"Processing {len(filepaths)} episodes with {jobs} workers")
+        with instrumentation.process_pool(min(jobs, len(filepaths))) as executor:
+            encoded = instrumentation.pool_map(executor, partial(_encode_in_worker, mode=mode), filepaths)
+    else:
+        encoded = []
+        for filepath in filepaths:
+            logger.info(f"Processing {os.path.basename(filepath)}")
+            encoded.append(encode_episode(filepath, mode=mode))
+    
+    flush_lemma_store()
+    return encoded
+
+def load_encoded_episodes(episode_files, jobs=1, cache=None, mode=DEFAULT_MODE):
+    """
+    Devuelve el episodio codificado (ver encode_episode) de cada archivo, reutilizando la caché en disco
+    cuando está disponible y procesando sólo los episodios que faltan.
+    Si se pasa una caché, su modo prevalece sobre mode.
+    """
+    if cache is None:
+        return _encode_episodes([filepath for _, filepath in episode_files], jobs, mode)
+    
+    keys = [cache.key_for(filepath) for _, filepath in episode_files]
+    encoded = []
+    missing = []
+    for i, key in enumerate(keys):
+        payload = cache.get(key)
+        if payload is None:
+            encoded.append(None)
+            missing.append(i)
+        else:
+            payload['words'] = payload['words'].tolist()
+            encoded.append(payload)
+    
+    if missing:
+        computed = _encode_episodes([episode_files[i][1] for i in missing], jobs, cache.mode)
+        for i, episode in zip(missing, computed):
+            encoded[i] = episode
+            cache.put(keys[i], dict(episode, words=np.array(episode['words'], dtype=str)))
+    
+    instrumentation.count('episode_cache.hits', len(episode_files) - len(missing))
+    instrumentation.count('episode_cache.misses', len(missing))
+    logger.info(f"Episode cache: {len(episode_files) - len(missing)} hits, {len(missing)} misses")
+    return encoded
+
+def load_episode_counts(episode_files, jobs=1, cache=None, mode=DEFAULT_MODE):
+    """Conteo {lema: frecuencia} de cada episodio (ver load_encoded_episodes)"""
+    return [
+        word_count_from_ids(episode['words'], episode['ids'])
+        for episode in load_encoded_episodes(episode_files, jobs, cache, mode)
+    ]
+
+def iter_encoded_episodes(episode_files, cache=None, mode=DEFAULT_MODE):
+    """
+    Episodios codificados (ver load_encoded_episodes) de uno en uno y en el
+    mismo proceso: sólo hay un episodio en memoria a la vez. Los que no están
+    en la caché se procesan y se guardan en ella.
+    """
+    hits = misses = 0
+    for _, filepath in episode_files:
+        key = cache.key_for(filepath) if cache else None
+        payload = cache.get(key) if cache else None
+        if payload is not None:
+            hits += 1
+            payload['words'] = payload['words'].tolist()
+            yield payload
+            continue
+        misses += 1
+        episode = encode_episode(filepath, mode=cache.mode if cache else mode)
+        if cache:
+            cache.put(key, dict(episode, words=np.array(episode['words'], dtype=str)))
+        yield episode
+    if cache:
+        instrumentation.count('episode_cache.hits', hits)
+        instrumentation.count('episode_cache.misses', misses)
+
+def _split_groups(items, groups):
+    """items en groups tramos consecutivos de tamaño parecido (sin tramos vacíos)"""
+    groups = max(1, min(groups, len(items)))
+    size, extra = divmod(len(items), groups)
+    bounds = np.cumsum([0] + [size + (i < extra) for i in range(groups)]).tolist()
+    return [items[bounds[i]:bounds[i + 1]] for i in range(groups)]
+
+def _group_in_worker(func, episode_files, cache=None, mode=DEFAULT_MODE):
+    """func en un worker del pool: los lemas nuevos van a su shard del almacén"""
+    output = func(episode_files, cache, mode)
+    spill_lemma_store()
+    return output
+
+def map_episode_groups(func, episode_files, jobs=1, cache=None, mode=DEFAULT_MODE):
+    """
+    Reparte [(clave, ruta SRT)] en tramos consecutivos, uno por worker si
+    jobs > 1, y devuelve en orden los resultados de func(tramo, cache, mode).
+    func (de nivel de módulo, para poder enviarse a los workers) recorre su
+    tramo con iter_encoded_episodes y devuelve sólo lo agregado, de modo que
+    ningún proceso guarda todos los episodios codificados. Los lemas nuevos
+    se guardan en el almacén una sola vez al terminar.
+    """
+    groups = _split_groups(list(episode_files), jobs or 1)
+    if len(groups) > 1:
+        if get_lemma_store().path:
+            prewarm_lemmas([filepath for _, filepath in episode_files])
+        logger.info(f"Processing {len(episode_files)} episodes with {len(groups)} workers")
+        with instrumentation.process_pool(len(groups)) as executor:
+            outputs = instrumentation.pool_map(executor, partial(_group_in_worker, func, cache=cache, mode=mode), groups)
+    else:
+        outputs = [func(group, cache, mode) for group in groups]
+    flush_lemma_store()
+    return outputs
+
+@contextmanager
+def _timed(timings, stage):
+    """
+    Acumula en timings[stage] los segundos que tarda el bloque (si timings no
+    es None) y lo mide como etapa process_episodes.<stage> (ver instrumentation)
+    """
+    start = time.perf_counter()
+    try:
+        with instrumentation.stage(f"process_episodes.{stage}"):
+            yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+def process_episodes(data_folder, jobs=1, cache_dir=None, mode=DEFAULT_MODE, index_path=None, timings=None,
+                     approximate=False):
+    """
+    Procesa todos los episodios de la carpeta y calcula las métricas léxicas.
+    Con jobs > 1 el parseo y la lematización de cada episodio se reparten en un
+    pool de procesos (ver instrumentation.process_pool); los conteos se
+    combinan en orden de episodio, por lo que el resultado es idéntico al del
+    camino secuencial. Si se indica cache_dir,
+    los conteos por episodio se guardan en disco (ver EpisodeCache).
+    mode='fast' cambia algo de precisión en los lemas por velocidad (ver text_utils.MODES).
+    Con index_path se guarda además el índice invertido del corpus (ver InvertedIndex).
+    Si se pasa un diccionario timings, se anotan en él los segundos de cada etapa;
+    con la instrumentación activa (ver processing.instrumentation) se registran
+    además sus subetapas, contadores y, opcionalmente, cProfile y tracemalloc.
+    Con approximate=True el top global y las palabras clave de la evolución
+    semántica salen de un sketch de memoria fija (ver aggregate_encoded) y los
+    episodios no se guardan en memoria: cada worker llena su propio sketch y
+    las series de las palabras clave se leen en una segunda pasada sobre la
+    caché (una temporal si no se indica cache_dir).
+    """
+    return process_episode_files(
+        list_episode_files(data_folder), jobs, cache_dir, mode, index_path, timings, approximate
+    )
+
+@instrumentation.instrumented('process_episodes')
+def process_episode_files(episode_files, jobs=1, cache_dir=None, mode=DEFAULT_MODE, index_path=None, timings=None,
+                          approximate=False):
+    """Igual que process_episodes sobre una lista [(episodio, ruta SRT)] ya ordenada"""
+    if approximate:
+        if cache_dir:
+            return _process_approximate(episode_files, jobs, EpisodeCache(cache_dir, mode=mode), mode, index_path, timings)
+        with tempfile.TemporaryDirectory(prefix='episodes-') as tmp_dir:
+            return _process_approximate(episode_files, jobs, EpisodeCache(tmp_dir, mode=mode), mode, index_path, timings)
+    
+    # Procesar cada episodio
+    cache = EpisodeCache(cache_dir, mode=mode) if cache_dir else None
+    with _timed(timings, 'encode'):
+        encoded = load_encoded_episodes(episode_files, jobs, cache, mode)
+    
+    # Índice invertido para búsquedas de concordancia
+    if index_path:
+        with _timed(timings, 'index'):
+            _save_index(episode_files, encoded, cache.mode if cache else mode, index_path)
+    
+    return aggregate_encoded([episode_num for episode_num, _ in episode_files], encoded, timings)
+
+def _save_index(episode_files, encoded, mode, index_path):
+    """Construye y guarda el índice invertido (encoded puede ser un iterador de episodios)"""
+    fingerprint = corpus_fingerprint(
+        [(episode_num, file_digest(filepath)) for episode_num, filepath in episode_files], mode
+    )
+    InvertedIndex.from_encoded([episode_num for episode_num, _ in episode_files], encoded).save(index_path, fingerprint)
+
+def _process_approximate(episode_files, jobs, cache, mode, index_path=None, timings=None):
+    """process_episode_files con approximate=True: los episodios se recorren de uno en uno"""
+    with _timed(timings, 'encode'):
+        outputs = map_episode_groups(sketch_episodes, episode_files, jobs, cache, mode)
+    results = [row for rows, _ in outputs for row in rows]
+    heavy = outputs[0][1]
+    for _, sketch in outputs[1:]:
+        heavy.merge(sketch)
+    
+    if index_path:
+        with _timed(timings, 'index'):
+            _save_index(episode_files, iter_encoded_episodes(episode_files, cache, mode), cache.mode, index_path)
+    
+    # Segunda pasada sobre la caché para las series de las palabras clave
+    episode_nums = [episode_num for episode_num, _ in episode_files]
+    metrics = _approximate_metrics(episode_nums, results, heavy, iter_encoded_episodes(episode_files, cache, mode), timings)
+    flush_lemma_store()
+    return metrics
+
+def aggregate_encoded(episode_nums, encoded, timings=None, themes=True, approximate=False):
+    """
+    Métricas léxicas de process_episodes a partir de los episodios ya
+    codificados. Con themes=False no se puntúan los temas (main_themes vacío).
+    Con approximate=True no se construye el vocabulario ni la matriz del
+    corpus: el top global y las palabras clave de la evolución semántica son
+    los heavy hitters de un sketch de memoria fija (ver sketches.HeavyHitters;
+    frecuencias estimadas y empates por orden alfabético), y sus series por
+    episodio se cuentan en una segunda pasada sobre los IDs de cada episodio.
+    """
+    if approximate:
+        return _aggregate_approximate(episode_nums, encoded, timings, themes)
+    
     results = []
-    global_word_count = defaultdict(int)
     episode_word_counts = []
     
-    # Procesar cada episodio
-    for filename in sorted(os.listdir(data_folder)):
-        if filename.startswith('episode_') and filename.endswith('.srt'):
-            episode_num = filename.split('_')[1].split('.')[0]
-            filepath = os.path.join(data_folder, filename)
-            
-            logger.info(f"Processing episode {episode_num}")
-            subtitles = parse_srt(filepath)
-            full_text = ' '.join(sub['text'] for sub in subtitles)
-            
-            # Procesamiento de texto
-            lemmatized_words = tokenize_and_lemmatize(full_text)
-            
-            # Filtrar palabras no válidas (números, etc.)
-            lemmatized_words = [word for word in lemmatized_words if word is not None]
-            
-            # Métricas del episodio
-            total_words = len(lemmatized_words)
-            unique_words = len(set(lemmatized_words))
-            lexical_density = unique_words / total_words if total_words > 0 else 0
+    # Vocabulario del corpus: los IDs locales de cada episodio se traducen a IDs globales
+    vocabulary = Vocabulary()
+    episode_ids = []
+    with _timed(timings, 'count'):
+        for episode_num, episode in zip(episode_nums, encoded):
+            words, ids = episode['words'], episode['ids']
+            mapping = vocabulary.merge(words)
+            episode_ids.append(mapping[ids])
             
-            # Conteo de palabras
-            word_count = defaultdict(int)
-            for word in lemmatized_words:
-                word_count[word] += 1
-                global_word_count[word] += 1
-            
-            # Top palabras del episodio
-            top_words = sorted(word_count.items(), key=lambda x: x[1], reverse=True)[:15]
+            # Conteo de palabras (vectorizado con bincount sobre los IDs locales)
+            word_count = defaultdict(int, word_count_from_ids(words, ids))
             episode_word_counts.append((episode_num, word_count))
-            
-            results.append({
-                'episode': episode_num,
-                'total_words': total_words,
-                'unique_words': unique_words,
-                'lexical_density': lexical_density,
-                'top_words': top_words
-            })
+            results.append(summarize_episode(episode_num, word_count))
+    
+    # Matriz episodios × vocabulario (se construye una sola vez)
+    with _timed(timings, 'term_matrix'):
+        term_matrix = TermMatrix.from_id_arrays(list(episode_nums), vocabulary, episode_ids)
     
     # Análisis de evolución semántica
-    semantic_evolution = analyze_semantic_evolution(episode_word_counts)
+    with _timed(timings, 'evolution'):
+        semantic_evolution = analyze_semantic_evolution(episode_word_counts, term_matrix)
     
     # Top 100 global
-    global_top = sorted(global_word_count.items(), key=lambda x: x[1], reverse=True)[:100]
+    global_top = term_matrix.top_k(100)
     
     # Temas principales
-    main_themes = identify_main_themes(global_top)
+    main_themes = []
+    if themes:
+        with _timed(timings, 'themes'):
+            main_themes = identify_main_themes(global_top)
     
     logger.info(f"Processed {len(results)} episodes")
     return results, global_top, semantic_evolution, main_themes
 
-def analyze_semantic_evolution(episode_word_counts):
-    """Analiza la evolución del uso de palabras clave"""
-    evolution = {}
+def _sketch_counts(episode_nums, encoded):
+    """Métricas de cada episodio y HeavyHitters con sus conteos; los conteos no se guardan"""
+    heavy = HeavyHitters()
+    results = []
+    for episode_num, episode in zip(episode_nums, encoded):
+        word_count = word_count_from_ids(episode['words'], episode['ids'])
+        heavy.add_counts(word_count)
+        results.append(summarize_episode(episode_num, word_count))
+    return results, heavy
+
+def sketch_episodes(episode_files, cache=None, mode=DEFAULT_MODE):
+    """_sketch_counts de [(episodio, ruta SRT)] recorridos con iter_encoded_episodes (ver map_episode_groups)"""
+    return _sketch_counts([episode_num for episode_num, _ in episode_files], iter_encoded_episodes(episode_files, cache, mode))
+
+def keyword_series(episode_nums, encoded, words):
+    """Serie {palabra: [(episodio, frecuencia)]} de las palabras indicadas, episodio a episodio"""
+    series = {word: [] for word in words}
+    for episode_num, episode in zip(episode_nums, encoded):
+        vocabulary = Vocabulary(episode['words'])
+        counts = np.bincount(episode['ids'], minlength=len(vocabulary))
+        for word in words:
+            word_id = vocabulary.get(word)
+            series[word].append((episode_num, int(counts[word_id]) if word_id is not None else 0))
+    return series
+
+def _aggregate_approximate(episode_nums, encoded, timings=None, themes=True):
+    """aggregate_encoded con approximate=True"""
+    with _timed(timings, 'count'):
+        results, heavy = _sketch_counts(episode_nums, encoded)
+    return _approximate_metrics(episode_nums, results, heavy, encoded, timings, themes)
+
+def _approximate_metrics(episode_nums, results, heavy, encoded, timings=None, themes=True, top_n=50):
+    """
+    Resultado de process_episodes a partir de las métricas por episodio y el
+    sketch del corpus; encoded se recorre una vez para la evolución semántica
+    de los top_n heavy hitters.
+    """
+    with _timed(timings, 'evolution'):
+        semantic_evolution = keyword_series(episode_nums, encoded, [word for word, _ in heavy.top(top_n)])
+    
+    # Top 100 global (estimado)
+    global_top = heavy.top(100)
     
-    # Seleccionar palabras clave (las 50 más frecuentes globalmente)
-    global_count = defaultdict(int)
-    for _, word_count in episode_word_counts:
-        for word, count in word_count.items():
-            global_count[word] += count
+    main_themes = []
+    if themes:
+        with _timed(timings, 'themes'):
+            main_themes = identify_main_themes(global_top)
     
-    top_words = sorted(global_count.items(), key=lambda x: x[1], reverse=True)[:50]
+    logger.info(f"Processed {len(results)} episodes (approximate global counts)")
+    return results, global_top, semantic_evolution, main_themes
+
+def summarize_episode(episode_num, word_count):
+    """Métricas léxicas de un episodio a partir de su conteo de lemas"""
+    total_words = sum(word_count.values())
+    unique_words = len(word_count)
+    lexical_density = unique_words / total_words if total_words > 0 else 0
     
-    for word, _ in top_words:
-        word_evolution = []
-        for episode, word_count in episode_word_counts:
-            frequency = word_count.get(word, 0)
-            word_evolution.append((episode, frequency))
-        evolution[word] = word_evolution
+    # Top palabras del episodio
+    top_words = sorted(word_count.items(), key=lambda x: x[1], reverse=True)[:15]
     
-    return evolution
\ No newline at end of file
+    return {
+        'episode': episode_num,
+        'total_words': total_words,
+        'unique_words': unique_words,
+        'lexical_density': lexical_density,
+        'top_words': top_words
+    }
+
+def top_global_words(global_word_count, n=100):
+    """Palabras más frecuentes del conjunto de episodios"""
+    return sorted(global_word_count.items(), key=lambda x: x[1], reverse=True)[:n]
+
+def analyze_semantic_evolution(episode_word_counts, term_matrix=None, top_n=50):
+    """Analiza la evolución del uso de palabras clave (las top_n más frecuentes globalmente)"""
+    if term_matrix is None:
+        term_matrix = TermMatrix.from_counts(episode_word_counts)
+    return term_matrix.evolution(top_n)
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import json
+import logging
+from collections import Counter
+from processing.srt_parser import iter_srt
+from processing import text_utils
+from analysis.lexical_analysis import list_episode_files
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def _run_mode(cue_texts, mode):
+    """Lematiza los subtítulos en un modo y devuelve (lemas por subtítulo, segundos)"""
+    # Cargar modelos fuera de la medición
+    if mode == 'fast':
+        text_utils.get_lemma_table()
+    else:
+        text_utils.get_tagger()
+
+    start = time.perf_counter()
+    lemmas = text_utils.tokenize_and_lemmatize_batch(cue_texts, mode=mode)
+    return lemmas, time.perf_counter() - start
+
+
+def _agreement(accurate, fast):
+    """
+    Concordancia a nivel de lema entre dos salidas por subtítulo: lemas comunes
+    (intersección de multiconjuntos) sobre el máximo de lemas de cada subtítulo.
+    """
+    shared = total = 0
+    for a, f in zip(accurate, fast):
+        shared += sum((Counter(a) & Counter(f)).values())
+        total += max(len(a), len(f))
+    return shared / total if total else 1.0
+
+
+def compare_modes(data_folder):
+    """
+    Compara los modos 'accurate' y 'fast' sobre los episodios de data_folder.
+    Devuelve, por episodio y en total, tokens de entrada por segundo de cada
+    modo, la aceleración, la concordancia de lemas y la similitud (Jaccard) de
+    los vocabularios resultantes.
+    """
+    episodes = []
+    totals = {'tokens': 0, 'accurate_secs': 0.0, 'fast_secs': 0.0}
+    all_accurate, all_fast = [], []
+
+    for episode_num, filepath in list_episode_files(data_folder):
+        cue_texts = [sub['text'] for sub in iter_srt(filepath)]
+        tokens = sum(len(text_utils.FAST_TOKEN_PATTERN.findall(text)) for text in cue_texts)
+        accurate, accurate_secs = _run_mode(cue_texts, 'accurate')
+        fast, fast_secs = _run_mode(cue_texts, 'fast')
+
+        episodes.append(_summarize(episode_num, tokens, accurate, accurate_secs, fast, fast_secs))
+        totals['tokens'] += tokens
+        totals['accurate_secs'] += accurate_secs
+        totals['fast_secs'] += fast_secs
+        all_accurate.extend(accurate)
+        all_fast.extend(fast)
+
+    overall = _summarize('all', totals['tokens'], all_accurate, totals['accurate_secs'], all_fast, totals['fast_secs'])
+    return {'episodes': episodes, 'overall': overall}
+
+
+def _summarize(episode_num, tokens, accurate, accurate_secs, fast, fast_secs):
+    accurate_vocab = {lemma for cue in accurate for lemma in cue}
+    fast_vocab = {lemma for cue in fast for lemma in cue}
+    union = accurate_vocab | fast_vocab
+    return {
+        'episode': episode_num,
+        'tokens': tokens,
+        'accurate_tokens_per_sec': tokens / accurate_secs if accurate_secs else 0.0,
+        'fast_tokens_per_sec': tokens / fast_secs if fast_secs else 0.0,
+        'speedup': accurate_secs / fast_secs if fast_secs else 0.0,
+        'lemma_agreement': _agreement(accurate, fast),
+        'vocabulary_jaccard': len(accurate_vocab & fast_vocab) / len(union) if union else 1.0
+    }
+
+
+def format_report(report):
+    """Tabla de texto con los resultados de compare_modes"""
+    header = f"{'episode':>8} {'tokens':>8} {'accurate/s':>11} {'fast/s':>10} {'speedup':>8} {'agree':>7} {'jaccard':>8}"
+    lines = [header, '-' * len(header)]
+    for row in report['episodes'] + [report['overall']]:
+        lines.append(
+            f"{row['episode']:>8} {row['tokens']:>8} {row['accurate_tokens_per_sec']:>11.0f} "
+            f"{row['fast_tokens_per_sec']:>10.0f} {row['speedup']:>7.1f}x "
+            f"{row['lemma_agreement']:>7.1%} {row['vocabulary_jaccard']:>8.1%}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """Uso: python -m analysis.mode_comparison [carpeta_de_datos] [--json]"""
+    argv = sys.argv[1:] if argv is None else argv
+    as_json = '--json' in argv
+    args = [arg for arg in argv if arg != '--json']
+    default_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+    data_folder = args[0] if args else default_folder
+
+    report = compare_modes(data_folder)
+    print(json.dumps(report, indent=2) if as_json else format_report(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
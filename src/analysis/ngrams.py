@@ -0,0 +1,190 @@
+import numpy as np
+from processing.vocabulary import Vocabulary
+
+KEY_DTYPE = np.uint64
+CHUNK_TOKENS = 1 << 20  # Tokens por bloque al contar (limita la memoria de trabajo)
+
+
+def merge_counts(keys_a, counts_a, keys_b, counts_b):
+    """Fusiona dos tablas (claves ordenadas, conteos) sumando las claves repetidas"""
+    if not len(keys_a):
+        return keys_b, counts_b
+    if not len(keys_b):
+        return keys_a, counts_a
+    keys, inverse = np.unique(np.concatenate((keys_a, keys_b)), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate((counts_a, counts_b)), minlength=len(keys))
+    return keys, counts.astype(np.int64)
+
+
+class NgramCounts:
+    """
+    Conteo de n-gramas con las n IDs de cada n-grama empaquetadas en un entero
+    de 64 bits (64 // n bits por ID). Las claves se guardan ordenadas y sin
+    repetir junto a su conteo, de modo que la memoria depende del número de
+    n-gramas distintos y no del de tokens.
+    """
+
+    def __init__(self, n, keys=None, counts=None):
+        self.n = n
+        self.bits = 64 // n
+        self.keys = keys if keys is not None else np.zeros(0, dtype=KEY_DTYPE)
+        self.counts = counts if counts is not None else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def pack(self, ids, starts):
+        """Claves de los n-gramas que empiezan en las posiciones indicadas"""
+        keys = np.zeros(len(starts), dtype=KEY_DTYPE)
+        for offset in range(self.n):
+            keys <<= KEY_DTYPE(self.bits)
+            keys |= ids[starts + offset].astype(KEY_DTYPE)
+        return keys
+
+    def unpack(self, keys=None):
+        """Matriz (n-gramas × n) de IDs a partir de las claves"""
+        keys = self.keys if keys is None else keys
+        mask = KEY_DTYPE((1 << self.bits) - 1)
+        columns = [(keys >> KEY_DTYPE(self.bits * (self.n - 1 - i))) & mask for i in range(self.n)]
+        return np.stack(columns, axis=1).astype(np.int64) if len(keys) else np.zeros((0, self.n), dtype=np.int64)
+
+    def add(self, ids, cue_offsets=None, chunk_tokens=CHUNK_TOKENS):
+        """
+        Cuenta los n-gramas de una secuencia de IDs. Si se dan los límites de
+        los subtítulos (cue_offsets), no se cuentan n-gramas que los crucen.
+        """
+        ids = np.asarray(ids)
+        if len(ids) < self.n:
+            return
+        if ids.max() >> self.bits:
+            raise ValueError(f"Vocabulary too large for {self.n}-gram packing ({self.bits} bits per id)")
+
+        # Subtítulo de cada token: un n-grama es válido si empieza y acaba en el mismo
+        starts = np.arange(len(ids) - self.n + 1)
+        if cue_offsets is not None:
+            cue_offsets = np.asarray(cue_offsets)
+            cue_of = np.repeat(np.arange(len(cue_offsets) - 1), np.diff(cue_offsets))
+            starts = starts[cue_of[starts] == cue_of[starts + self.n - 1]]
+
+        for begin in range(0, len(starts), chunk_tokens):
+            keys, counts = np.unique(self.pack(ids, starts[begin:begin + chunk_tokens]), return_counts=True)
+            self.keys, self.counts = merge_counts(self.keys, self.counts, keys, counts.astype(np.int64))
+
+    def merge(self, other):
+        """Suma otro conteo del mismo orden"""
+        self.keys, self.counts = merge_counts(self.keys, self.counts, other.keys, other.counts)
+
+    def top(self, k):
+        """Índices de los k n-gramas más frecuentes (empates por orden de clave)"""
+        return np.argsort(-self.counts, kind='stable')[:k]
+
+    def marginals(self):
+        """Conteo de cada ID en cada posición del n-grama: lista de n arrays (ID, conteo)"""
+        grams = self.unpack()
+        return [np.bincount(grams[:, i], weights=self.counts).astype(np.int64) for i in range(self.n)]
+
+
+def pmi(counts, grams, marginals, total):
+    """PMI (log2) de cada n-grama a partir de los conteos marginales por posición"""
+    expected = np.ones(len(counts), dtype=np.float64)
+    for i, marginal in enumerate(marginals):
+        expected *= marginal[grams[:, i]] / total
+    return np.log2(counts / total) - np.log2(expected)
+
+
+def log_likelihood(counts, grams, marginals, total):
+    """G² de Dunning de cada bigrama (tabla de contingencia 2 × 2)"""
+    k11 = counts.astype(np.float64)
+    k12 = marginals[0][grams[:, 0]] - k11
+    k21 = marginals[1][grams[:, 1]] - k11
+    k22 = total - k11 - k12 - k21
+    rows = (k11 + k12, k21 + k22)
+    cols = (k11 + k21, k12 + k22)
+
+    def term(observed, row, col):
+        expected = row * col / total
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(observed > 0, observed * np.log(observed / expected), 0.0)
+
+    return 2 * (term(k11, rows[0], cols[0]) + term(k12, rows[0], cols[1])
+                + term(k21, rows[1], cols[0]) + term(k22, rows[1], cols[1]))
+
+
+MEASURES = {'pmi': pmi, 'llr': log_likelihood}
+
+
+class NgramModel:
+    """
+    Bigramas y trigramas reales del corpus, por episodio y de la temporada.
+
+    Se construye a partir de los episodios codificados (IDs + límites de
+    subtítulos, ver lexical_analysis.encode_episode) y traduce los IDs
+    locales de cada episodio a un vocabulario común.
+    """
+
+    def __init__(self, orders=(2, 3)):
+        self.orders = tuple(orders)
+        self.vocabulary = Vocabulary()
+        self.episodes = []
+        self.episode_counts = {}
+        self.season = {n: NgramCounts(n) for n in self.orders}
+
+    @classmethod
+    def from_encoded(cls, episode_nums, encoded, orders=(2, 3)):
+        """Construye el modelo a partir de [(número de episodio)] y sus episodios codificados"""
+        model = cls(orders)
+        for episode_num, episode in zip(episode_nums, encoded):
+            model.add_episode(episode_num, episode['words'], episode['ids'], episode.get('cue_offsets'))
+        return model
+
+    def add_episode(self, episode, words, ids, cue_offsets=None):
+        """Cuenta los n-gramas de un episodio (IDs locales sobre su vocabulario words)"""
+        mapping = self.vocabulary.merge(words)
+        global_ids = mapping[np.asarray(ids, dtype=np.intp)]
+        counts = {}
+        for n in self.orders:
+            counts[n] = NgramCounts(n)
+            counts[n].add(global_ids, cue_offsets)
+            self.season[n].merge(counts[n])
+        self.episodes.append(episode)
+        self.episode_counts[episode] = counts
+
+    def counts(self, n=2, episode=None):
+        if n not in self.orders:
+            raise ValueError(f"Order {n} not counted (available: {self.orders})")
+        return self.season[n] if episode is None else self.episode_counts[episode][n]
+
+    def _decode(self, grams):
+        words = self.vocabulary.words
+        return [tuple(words[i] for i in row) for row in grams.tolist()]
+
+    def top_k(self, k=20, n=2, episode=None):
+        """Top k n-gramas más frecuentes: [((palabra, ...), conteo)]"""
+        table = self.counts(n, episode)
+        order = table.top(k)
+        return list(zip(self._decode(table.unpack(table.keys[order])), table.counts[order].tolist()))
+
+    def collocations(self, k=20, n=2, episode=None, measure='pmi', min_count=3):
+        """
+        Top k colocaciones según measure ('pmi' o 'llr', éste sólo para
+        bigramas) entre los n-gramas con al menos min_count apariciones:
+        [((palabra, ...), puntuación, conteo)].
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure {measure!r} (options: {', '.join(MEASURES)})")
+        if measure == 'llr' and n != 2:
+            raise ValueError("Log-likelihood scoring is only defined for bigrams")
+
+        table = self.counts(n, episode)
+        if not len(table):
+            return []
+        grams = table.unpack()
+        scores = MEASURES[measure](table.counts, grams, table.marginals(), table.total)
+
+        keep = np.flatnonzero(table.counts >= min_count)
+        order = keep[np.argsort(-scores[keep], kind='stable')[:k]]
+        return list(zip(self._decode(grams[order]), scores[order].tolist(), table.counts[order].tolist()))
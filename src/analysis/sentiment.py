@@ -0,0 +1,387 @@
+import re
+import string
+import hashlib
+import numpy as np
+import logging
+from processing import instrumentation
+from processing.srt_parser import iter_srt
+from processing.vocabulary import Vocabulary
+from processing.text_utils import ensure_nltk_resources, OPTIONAL_NLTK_RESOURCES
+from analysis.episode_cache import EpisodeCache
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+SENTIMENT_VERSION = 2
+
+# Umbrales habituales de VADER para clasificar un subtítulo
+POSITIVE = 0.05
+NEGATIVE = -0.05
+
+# Atenuación de un intensificador según su distancia a la palabra (1, 2 o 3 antes)
+BOOSTER_DAMPING = (1.0, 0.95, 0.9)
+
+# Secuencias que se comparan con las expresiones idiomáticas, como
+# desplazamientos respecto a la palabra puntuada, en el orden de VADER: la
+# primera de las anteriores que coincide fija la valencia y las posteriores
+# (palabra y siguientes) la sustituyen
+IDIOM_BEFORE = ((-1, 0), (-2, -1, 0), (-2, -1), (-3, -2, -1), (-3, -2))
+IDIOM_AFTER = ((0, 1), (0, 1, 2))
+
+# Lexicón compilado (se carga la primera vez que se usa)
+_lexicon = None
+_scorer = None
+
+
+def get_lexicon():
+    """Lexicón VADER {palabra: valencia} (recurso NLTK vader_lexicon)"""
+    global _lexicon
+    if _lexicon is None:
+        import nltk
+
+        ensure_nltk_resources(['vader_lexicon'])
+        lexicon = {}
+        with nltk.data.find(OPTIONAL_NLTK_RESOURCES['vader_lexicon']).open() as f:
+            for line in f.read().decode('utf-8').splitlines():
+                fields = line.strip().split('\t')
+                if len(fields) >= 2:
+                    lexicon[fields[0]] = float(fields[1])
+        _lexicon = lexicon
+    return _lexicon
+
+
+def vader_constants():
+    """Negaciones, intensificadores y escalas de VADER (nltk.sentiment.vader)"""
+    from nltk.sentiment.vader import VaderConstants
+    return VaderConstants
+
+
+def sentiment_fingerprint():
+    """Huella del lexicón y de las reglas (clave de la caché de sentimiento)"""
+    constants = vader_constants()
+    digest = hashlib.sha256()
+    digest.update(f"{SENTIMENT_VERSION}\n".encode('utf-8'))
+    for word, valence in sorted(get_lexicon().items()):
+        digest.update(f"{word}\t{valence}\n".encode('utf-8'))
+    digest.update(repr((sorted(constants.NEGATE), sorted(constants.BOOSTER_DICT.items()),
+                        sorted(constants.SPECIAL_CASE_IDIOMS.items()), constants.PUNC_LIST,
+                        constants.N_SCALAR, constants.C_INCR, constants.B_DECR)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _shift(values, k, fill):
+    """values desplazado k posiciones (el valor del token i - k en la posición i; k < 0 mira hacia delante)"""
+    out = np.full_like(values, fill)
+    if k > 0:
+        out[k:] = values[:-k]
+    elif k < 0:
+        out[:k] = values[-k:]
+    else:
+        out[:] = values
+    return out
+
+
+class SentimentScorer:
+    """
+    Puntuación de sentimiento VADER de todos los subtítulos a la vez.
+
+    Reproduce SentimentIntensityAnalyzer.polarity_scores de NLTK: mismas
+    palabras (división por espacios y recorte de la puntuación adyacente),
+    intensificadores (hasta tres palabras antes, atenuados y con el signo de
+    la valencia acumulada; los propios intensificadores y "kind of" valen 0),
+    negaciones (N_SCALAR), "never so"/"never this", "least", expresiones
+    idiomáticas, mayúsculas, "but" y signos de exclamación e interrogación.
+    Como en NLTK, una palabra repetida en el mismo subtítulo toma la
+    valencia de su primera aparición.
+
+    El lexicón y las reglas se compilan en arrays indexados por el ID de
+    cada palabra del vocabulario (en minúsculas y tal cual aparece), que
+    crecen a medida que aparecen palabras nuevas: cada regla es una consulta
+    por índice y unas pocas operaciones sobre el flujo de tokens desplazado,
+    sin bucles por palabra.
+    """
+
+    def __init__(self, lexicon=None, constants=None):
+        self.lexicon = lexicon if lexicon is not None else get_lexicon()
+        self.constants = constants if constants is not None else vader_constants()
+        self.punctuation = re.compile(f"[{re.escape(string.punctuation)}]")
+        self.punc_chars = frozenset(''.join(self.constants.PUNC_LIST))
+
+        # Vocabulario en minúsculas (lexicón, intensificadores, negaciones)
+        self.vocabulary = Vocabulary()
+        self.in_lexicon = np.zeros(0, dtype=bool)
+        self.valence = np.zeros(0, dtype=np.float64)
+        self.booster = np.zeros(0, dtype=np.float64)
+        self.negation = np.zeros(0, dtype=bool)
+        self.but_id = self.vocabulary.add('but')
+        self.kind_id = self.vocabulary.add('kind')
+        self.of_id = self.vocabulary.add('of')
+        self.least_id = self.vocabulary.add('least')
+        self.at_very_ids = [self.vocabulary.add('at'), self.vocabulary.add('very')]
+
+        # Vocabulario tal cual (mayúsculas, "never so" e idiomas distinguen mayúsculas)
+        self.raw_vocabulary = Vocabulary()
+        self.raw_lower = np.zeros(0, dtype=np.intp)
+        self.upper = np.zeros(0, dtype=bool)
+        self.never_id = self.raw_vocabulary.add('never')
+        self.so_ids = [self.raw_vocabulary.add('so'), self.raw_vocabulary.add('this')]
+        self.idioms = [
+            ([self.raw_vocabulary.add(word) for word in phrase.split(' ')], float(value))
+            for phrase, value in self.constants.SPECIAL_CASE_IDIOMS.items()
+        ]
+        self.booster_phrases = [
+            [self.raw_vocabulary.add(word) for word in phrase.split(' ')]
+            for phrase in self.constants.BOOSTER_DICT if ' ' in phrase
+        ]
+        self._compile()
+
+    def _compile(self):
+        """Extiende los arrays del lexicón a las palabras nuevas de los vocabularios"""
+        new_raw = self.raw_vocabulary.words[len(self.raw_lower):]
+        if new_raw:
+            self.raw_lower = np.concatenate((
+                self.raw_lower, self.vocabulary.encode(word.lower() for word in new_raw).astype(np.intp)
+            ))
+            self.upper = np.concatenate((self.upper, [word.isupper() for word in new_raw])).astype(bool)
+
+        new_words = self.vocabulary.words[len(self.valence):]
+        if not new_words:
+            return
+        negate = self.constants.NEGATE
+        boosters = self.constants.BOOSTER_DICT
+        self.in_lexicon = np.concatenate((self.in_lexicon, [word in self.lexicon for word in new_words])).astype(bool)
+        self.valence = np.concatenate((self.valence, [self.lexicon.get(word, 0.0) for word in new_words]))
+        self.booster = np.concatenate((self.booster, [boosters.get(word, 0.0) for word in new_words]))
+        self.negation = np.concatenate((
+            self.negation, [word in negate or "n't" in word for word in new_words]
+        )).astype(bool)
+
+    def words(self, text):
+        """
+        Palabras de un subtítulo como en VADER (SentiText): división por
+        espacios, sin las de un carácter, y sin un signo de PUNC_LIST pegado
+        al principio o al final de una palabra que aparece sin puntuación.
+        """
+        tokens = [token for token in text.split() if len(token) > 1]
+        plain = None
+        for i, token in enumerate(tokens):
+            if token[0] not in self.punc_chars and token[-1] not in self.punc_chars:
+                continue
+            if plain is None:
+                plain = {word for word in self.punctuation.sub('', text).split() if len(word) > 1}
+            for punc in self.constants.PUNC_LIST:
+                if token.startswith(punc) and token[len(punc):] in plain:
+                    tokens[i] = token[len(punc):]
+                    break
+                if token.endswith(punc) and token[:-len(punc)] in plain:
+                    tokens[i] = token[:-len(punc)]
+                    break
+        return tokens
+
+    def score_cues(self, cues):
+        """
+        Puntúa una lista de subtítulos (formato de parse_srt). Devuelve arrays
+        por subtítulo: 'cue_ids', 'cue_start', 'cue_end', 'compound' (-1 a 1)
+        y las proporciones 'pos', 'neg', 'neu' de VADER.
+        """
+        with instrumentation.stage('sentiment.score'):
+            constants = self.constants
+            n_scalar, c_incr = constants.N_SCALAR, constants.C_INCR
+            texts = [sub['text'] for sub in cues]
+            tokens = [self.words(text) for text in texts]
+            sizes = np.fromiter((len(words) for words in tokens), dtype=np.int64, count=len(tokens))
+            raw = self.raw_vocabulary.encode(word for words in tokens for word in words).astype(np.intp)
+            instrumentation.count('sentiment.tokens', len(raw))
+            self._compile()
+            ids = self.raw_lower[raw]
+
+            n_cues = len(cues)
+            cue = np.repeat(np.arange(n_cues), sizes)
+            offsets = np.concatenate(([0], np.cumsum(sizes)))
+            position = np.arange(len(ids)) - offsets[cue]
+            remaining = sizes[cue] - 1 - position  # Palabras que siguen en el subtítulo
+
+            def before(values, k, fill):
+                """Valor de la palabra k posiciones antes (k < 0: después) dentro del subtítulo"""
+                inside = position >= k if k > 0 else remaining >= -k
+                return np.where(inside, _shift(values, k, fill), fill)
+
+            # Mayúsculas: sólo cuentan si el subtítulo mezcla palabras en mayúsculas y en minúsculas
+            upper = self.upper[raw]
+            upper_per_cue = np.bincount(cue, weights=upper, minlength=n_cues)
+            cap_diff = (upper_per_cue > 0) & (upper_per_cue < sizes)
+            emphasis = upper & cap_diff[cue]
+
+            # Los intensificadores y "kind" seguido de "of" valen 0; el resto, su valencia del lexicón
+            scored = self.in_lexicon[ids] & (self.booster[ids] == 0)
+            scored &= ~((ids == self.kind_id) & before(ids == self.of_id, -1, False))
+            valence = self.valence[ids] + np.where(emphasis, np.where(self.valence[ids] > 0, c_incr, -c_incr), 0.0)
+
+            raw_before = {k: before(raw, k, -1) for k in (-2, -1, 1, 2, 3)}
+            raw_before[0] = raw
+            never_so = before(raw == self.never_id, 1, False) & np.isin(raw, self.so_ids)
+            so_this = np.isin(raw, self.so_ids)
+
+            # Las tres palabras anteriores que no están en el lexicón: intensificadores (con el
+            # signo de la valencia acumulada) y después negaciones, "never so" e idiomas
+            for k, damping in enumerate(BOOSTER_DAMPING, start=1):
+                prev_ids = before(ids, k, 0)
+                applies = scored & (position >= k) & ~self.in_lexicon[prev_ids]
+                booster = self.booster[prev_ids]
+                scalar = booster * np.where(valence < 0, -1.0, 1.0)
+                scalar += np.where((booster != 0) & before(emphasis, k, False), np.where(valence > 0, c_incr, -c_incr), 0.0)
+                valence = np.where(applies, valence + scalar * damping, valence)
+
+                negated = self.negation[prev_ids]
+                if k == 1:
+                    factor = np.where(negated, n_scalar, 1.0)
+                elif k == 2:
+                    factor = np.where(before(never_so, 1, False), 1.5, np.where(negated, n_scalar, 1.0))
+                else:
+                    special = before(never_so, 2, False) | before(so_this, 1, False)
+                    factor = np.where(special, 1.25, np.where(negated, n_scalar, 1.0))
+                valence = np.where(applies, valence * factor, valence)
+
+                if k == 3:
+                    valence = self._idioms(valence, applies, raw_before)
+
+            # "least" niega la palabra siguiente salvo en "at least" y "very least"
+            least = before(ids == self.least_id, 1, False) & ~self.in_lexicon[before(ids, 1, 0)]
+            least &= ~(before(np.isin(ids, self.at_very_ids), 2, False))
+            valence = np.where(scored & least, valence * n_scalar, valence)
+            valence = np.where(scored, valence, 0.0)
+
+            # Una palabra repetida en el subtítulo toma la valencia de su primera aparición
+            if len(raw):
+                _, first, inverse = np.unique(cue * len(self.raw_vocabulary) + raw, return_index=True, return_inverse=True)
+                valence = valence[first[inverse]]
+
+            # "but": lo anterior cuenta la mitad y lo posterior un 50 % más
+            is_but = ids == self.but_id
+            if is_but.any():
+                first_but = np.full(n_cues, np.iinfo(np.int64).max)
+                np.minimum.at(first_but, cue[is_but], position[is_but])
+                but_at = first_but[cue]
+                has_but = but_at != np.iinfo(np.int64).max
+                valence *= np.where(has_but & (position < but_at), 0.5, np.where(has_but & (position > but_at), 1.5, 1.0))
+
+            total = np.bincount(cue, weights=valence, minlength=n_cues)
+            pos_sum = np.bincount(cue, weights=np.where(valence > 0, valence + 1, 0.0), minlength=n_cues)
+            neg_sum = np.bincount(cue, weights=np.where(valence < 0, valence - 1, 0.0), minlength=n_cues)
+            neu_count = np.bincount(cue, weights=(valence == 0), minlength=n_cues)
+
+            # Exclamaciones (hasta 4) e interrogaciones (más de una) refuerzan el signo de la suma
+            exclamations = np.fromiter((text.count('!') for text in texts), dtype=np.float64, count=n_cues)
+            questions = np.fromiter((text.count('?') for text in texts), dtype=np.float64, count=n_cues)
+            emphasis_amount = np.minimum(exclamations, 4) * 0.292 + np.where(
+                questions > 1, np.where(questions <= 3, questions * 0.18, 0.96), 0.0
+            )
+            total += np.sign(total) * emphasis_amount
+            stronger_pos, stronger_neg = pos_sum > np.abs(neg_sum), pos_sum < np.abs(neg_sum)
+            pos_sum += np.where(stronger_pos, emphasis_amount, 0.0)
+            neg_sum -= np.where(stronger_neg, emphasis_amount, 0.0)
+
+            compound = np.clip(total / np.sqrt(total * total + 15), -1.0, 1.0)
+            magnitude = pos_sum + np.abs(neg_sum) + neu_count
+            with np.errstate(invalid='ignore', divide='ignore'):
+                proportions = [np.where(magnitude > 0, part / magnitude, 0.0) for part in (pos_sum, np.abs(neg_sum), neu_count)]
+
+        return {
+            'cue_ids': np.asarray([sub['id'] for sub in cues], dtype=np.int32),
+            'cue_start': np.asarray([sub['start_sec'] for sub in cues], dtype=np.float64),
+            'cue_end': np.asarray([sub['end_sec'] for sub in cues], dtype=np.float64),
+            'compound': compound,
+            'pos': proportions[0],
+            'neg': proportions[1],
+            'neu': proportions[2]
+        }
+
+    def _idioms(self, valence, applies, raw_before):
+        """
+        Expresiones idiomáticas y "kind of"/"sort of" antes de la palabra (la
+        comprobación de VADER con la tercera palabra anterior): una expresión
+        fija la valencia y un intensificador de dos palabras resta B_DECR.
+        """
+        def matches(words, offsets):
+            found = np.ones(len(valence), dtype=bool)
+            for word_id, k in zip(words, offsets):
+                found &= raw_before[-k] == word_id
+            return found
+
+        idiom = np.full(len(valence), np.nan)
+        for offsets in IDIOM_BEFORE:
+            for words, value in self.idioms:
+                if len(words) == len(offsets):
+                    idiom = np.where(np.isnan(idiom) & matches(words, offsets), value, idiom)
+        for offsets in IDIOM_AFTER:
+            for words, value in self.idioms:
+                if len(words) == len(offsets):
+                    idiom = np.where(matches(words, offsets), value, idiom)
+        valence = np.where(applies & ~np.isnan(idiom), idiom, valence)
+
+        phrase = np.zeros(len(valence), dtype=bool)
+        for words in self.booster_phrases:
+            if len(words) == 2:
+                phrase |= matches(words, (-3, -2)) | matches(words, (-2, -1))
+        return np.where(applies & phrase, valence + self.constants.B_DECR, valence)
+
+
+def get_scorer():
+    """Puntuador compartido del proceso (el lexicón se compila una vez)"""
+    global _scorer
+    if _scorer is None:
+        _scorer = SentimentScorer()
+    return _scorer
+
+
+def per_minute(scores, bin_seconds=60):
+    """Compound medio de los subtítulos que empiezan en cada tramo de bin_seconds (NaN sin diálogo)"""
+    bins = (scores['cue_start'] // bin_seconds).astype(np.int64)
+    size = int(bins.max(initial=-1)) + 1
+    counts = np.bincount(bins, minlength=size)
+    sums = np.bincount(bins, weights=scores['compound'], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def episode_summary(episode, scores):
+    """Sentimiento de un episodio: compound medio y proporción de subtítulos positivos y negativos"""
+    compound = scores['compound']
+    n = len(compound)
+    return {
+        'episode': episode,
+        'cues': n,
+        'compound': float(compound.mean()) if n else 0.0,
+        'positive_share': float((compound >= POSITIVE).mean()) if n else 0.0,
+        'negative_share': float((compound <= NEGATIVE).mean()) if n else 0.0
+    }
+
+
+def sentiment_cache(cache_dir):
+    """Caché en disco de las puntuaciones por episodio (misma estructura que la de episodios)"""
+    return EpisodeCache(cache_dir, fingerprint=sentiment_fingerprint())
+
+
+def score_episode_files(episode_files, cache=None):
+    """
+    Puntuaciones de cada episodio [(episodio, ruta SRT)] → [(episodio,
+    puntuaciones de score_cues)], reutilizando la caché si se indica.
+    """
+    scorer = get_scorer()
+    results = []
+    hits = 0
+    for episode, filepath in episode_files:
+        key = cache.key_for(filepath) if cache is not None else None
+        scores = cache.get(key) if cache is not None else None
+        if scores is None:
+            scores = scorer.score_cues(list(iter_srt(filepath)))
+            if cache is not None:
+                cache.put(key, scores)
+        else:
+            hits += 1
+        results.append((episode, scores))
+    instrumentation.count('sentiment_cache.hits', hits)
+    if cache is not None:
+        logger.info(f"Sentiment cache: {hits} hits, {len(episode_files) - hits} misses")
+    return results
@@ -0,0 +1,232 @@
+import os
+import math
+import hashlib
+import numpy as np
+
+# Parámetros por defecto: error de las consultas ≤ EPSILON · N con probabilidad
+# 1 - DELTA (count-min) y hasta HEAVY_K candidatos a palabras frecuentes
+EPSILON = 1e-4
+DELTA = 0.01
+HEAVY_K = 1000
+
+
+def word_hashes(words):
+    """Hash de 64 bits de cada palabra, estable entre procesos (a diferencia de hash())"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little') for word in words),
+        dtype=np.uint64, count=len(words)
+    )
+
+
+class CountMinSketch:
+    """
+    Sketch count-min: tabla depth × width de contadores con una función hash
+    (multiplicación-desplazamiento sobre word_hashes) por fila. La estimación
+    de una palabra es el mínimo de sus depth contadores: nunca es menor que la
+    frecuencia real y la supera en más de epsilon · total con probabilidad
+    como mucho delta. Dos sketches con los mismos parámetros se combinan
+    sumando las tablas.
+    """
+
+    def __init__(self, width=1 << 15, depth=5, seed=0):
+        if width < 2 or width & (width - 1):
+            raise ValueError("Sketch width must be a power of two")
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 1 << 63, depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, depth, dtype=np.uint64)
+        self.shift = np.uint64(64 - (width.bit_length() - 1))
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    @classmethod
+    def from_error(cls, epsilon=EPSILON, delta=DELTA, seed=0):
+        """Sketch con error ≤ epsilon · total con probabilidad 1 - delta"""
+        width = 1 << max(1, math.ceil(math.log2(math.e / epsilon)))
+        return cls(width, max(1, math.ceil(math.log(1 / delta))), seed)
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    def params(self):
+        return {'width': self.width, 'depth': self.depth, 'seed': self.seed}
+
+    def _buckets(self, hashes):
+        return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) >> self.shift).astype(np.intp)
+
+    def add(self, hashes, counts):
+        counts = np.asarray(counts, dtype=np.int64)
+        for row, buckets in enumerate(self._buckets(hashes)):
+            np.add.at(self.table[row], buckets, counts)
+        self.total += int(counts.sum())
+
+    def query(self, hashes):
+        """Estimación (cota superior) de la frecuencia de cada hash"""
+        if not len(hashes):
+            return np.zeros(0, dtype=np.int64)
+        return self.table[np.arange(self.depth)[:, None], self._buckets(hashes)].min(axis=0)
+
+    def merge(self, other):
+        if self.params() != other.params():
+            raise ValueError("Cannot merge count-min sketches with different parameters")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+
+class MisraGries:
+    """
+    Resumen Misra-Gries de las palabras más frecuentes con a lo sumo ~2k
+    contadores. Cuando se supera ese tamaño se resta a todos el (k+1)-ésimo
+    mayor valor y se descartan los que quedan a cero; la suma de lo restado
+    (error) acota por debajo cada conteo: real - error ≤ contador ≤ real, con
+    error ≤ total / (k + 1). Toda palabra con frecuencia mayor que error está
+    en el resumen. Los resúmenes se combinan sumando contadores (Agarwal et
+    al., "Mergeable summaries") sin perder la garantía.
+    """
+
+    def __init__(self, k=HEAVY_K):
+        if k < 1:
+            raise ValueError("Misra-Gries needs k >= 1")
+        self.k = k
+        self.counters = {}
+        self.total = 0
+        self.error = 0
+
+    def _update(self, words, counts):
+        counters = self.counters
+        for word, count in zip(words, counts):
+            counters[word] = counters.get(word, 0) + count
+        if len(counters) > 2 * self.k:
+            self._prune()
+
+    def add(self, words, counts):
+        counts = [int(count) for count in counts]
+        self.total += sum(counts)
+        self._update(words, counts)
+
+    def _prune(self):
+        if len(self.counters) <= self.k:
+            return
+        values = np.fromiter(self.counters.values(), dtype=np.int64, count=len(self.counters))
+        threshold = int(np.partition(values, len(values) - self.k - 1)[len(values) - self.k - 1])
+        self.counters = {word: count - threshold for word, count in self.counters.items() if count > threshold}
+        self.error += threshold
+
+    def merge(self, other):
+        self.total += other.total
+        self.error += other.error
+        self._update(list(other.counters), list(other.counters.values()))
+        return self
+
+    def top(self, n=None):
+        """[(palabra, contador)] de mayor a menor (los empates, por orden alfabético)"""
+        self._prune()
+        items = sorted(self.counters.items(), key=lambda item: (-item[1], item[0]))
+        return items[:n] if n else items
+
+
+class HeavyHitters:
+    """
+    Palabras más frecuentes de un corpus sin límite de tamaño con memoria
+    fija: Misra-Gries elige los candidatos y count-min estima su frecuencia.
+    La frecuencia devuelta es la menor de las dos cotas superiores (count-min
+    y contador Misra-Gries + su error). Se combina entre shards o procesos con
+    merge y se guarda en disco con save/load.
+    """
+
+    def __init__(self, k=HEAVY_K, epsilon=EPSILON, delta=DELTA, seed=0, sketch=None):
+        self.summary = MisraGries(k)
+        self.sketch = sketch if sketch is not None else CountMinSketch.from_error(epsilon, delta, seed)
+
+    @property
+    def total(self):
+        return self.summary.total
+
+    def params(self):
+        return dict(self.sketch.params(), k=self.summary.k)
+
+    def empty(self):
+        """Sketch vacío con los mismos parámetros (combinable con merge)"""
+        return HeavyHitters(self.summary.k, sketch=CountMinSketch(self.sketch.width, self.sketch.depth, self.sketch.seed))
+
+    def add(self, words, counts):
+        words = list(words)
+        counts = np.asarray(counts, dtype=np.int64)
+        self.sketch.add(word_hashes(words), counts)
+        self.summary.add(words, counts.tolist())
+
+    def add_counts(self, word_count):
+        """Añade un conteo {palabra: frecuencia}"""
+        self.add(list(word_count), list(word_count.values()))
+
+    def merge(self, other):
+        if self.params() != other.params():
+            raise ValueError("Cannot merge heavy-hitter sketches with different parameters")
+        self.sketch.merge(other.sketch)
+        self.summary.merge(other.summary)
+        return self
+
+    def estimate(self, words):
+        """Cota superior de la frecuencia de cada palabra (count-min)"""
+        words = list(words)
+        return self.sketch.query(word_hashes(words)).tolist()
+
+    def top(self, n):
+        """Top n [(palabra, frecuencia estimada)]; los empates, por orden alfabético"""
+        candidates = self.summary.top()
+        if not candidates:
+            return []
+        words = [word for word, _ in candidates]
+        upper = np.minimum(
+            self.sketch.query(word_hashes(words)),
+            np.array([count for _, count in candidates], dtype=np.int64) + self.summary.error
+        )
+        order = sorted(range(len(words)), key=lambda i: (-upper[i], words[i]))[:n]
+        return [(words[i], int(upper[i])) for i in order]
+
+    def bounds(self):
+        """Garantías de error de las estimaciones sobre el total actual"""
+        return {
+            'total': self.total,
+            'candidates': len(self.summary.counters),
+            'misra_gries_error': self.summary.error,
+            'misra_gries_bound': self.total / (self.summary.k + 1),
+            'count_min_epsilon': self.sketch.epsilon,
+            'count_min_error': self.sketch.epsilon * self.total,
+            'count_min_delta': self.sketch.delta
+        }
+
+    def save(self, path):
+        """Guarda el sketch (.npz comprimido) de forma atómica"""
+        words = list(self.summary.counters)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                params=np.array([self.sketch.width, self.sketch.depth, self.sketch.seed, self.summary.k], dtype=np.int64),
+                stats=np.array([self.summary.total, self.summary.error, self.sketch.total], dtype=np.int64),
+                table=self.sketch.table,
+                words=np.array(words, dtype=str),
+                counts=np.array([self.summary.counters[word] for word in words], dtype=np.int64)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            width, depth, seed, k = data['params'].tolist()
+            sketch = CountMinSketch(width, depth, seed)
+            sketch.table = data['table']
+            total, error, sketch.total = data['stats'].tolist()
+            heavy = cls(k, sketch=sketch)
+            heavy.summary.total, heavy.summary.error = total, error
+            heavy.summary.counters = dict(zip(data['words'].tolist(), data['counts'].tolist()))
+        return heavy
@@ -0,0 +1,131 @@
+import numpy as np
+from processing.vocabulary import Vocabulary
+
+
+class TermMatrix:
+    """
+    Matriz dispersa episodios × vocabulario en formato CSR.
+
+    Se construye una sola vez a partir de los IDs de cada episodio y guarda
+    también la traspuesta (CSC) para que extraer la serie temporal de una
+    palabra sea un corte de arrays, no un recorrido de diccionarios.
+    """
+
+    def __init__(self, episodes, vocabulary, indptr, indices, data):
+        self.episodes = list(episodes)
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+        # Traspuesta (CSC): filas ordenadas por columna
+        rows = np.repeat(np.arange(len(self.episodes)), np.diff(indptr))
+        order = np.argsort(indices, kind='stable')
+        self.col_rows = rows[order]
+        self.col_data = data[order]
+        self.col_ptr = np.concatenate(([0], np.cumsum(np.bincount(indices, minlength=len(vocabulary)))))
+
+        self.row_totals = np.bincount(rows, weights=data, minlength=len(self.episodes)).astype(np.int64)
+        self.totals = np.bincount(indices, weights=data, minlength=len(vocabulary)).astype(np.int64)
+
+    @property
+    def shape(self):
+        return len(self.episodes), len(self.vocabulary)
+
+    @classmethod
+    def from_id_arrays(cls, episodes, vocabulary, episode_ids):
+        """Construye la matriz a partir de un array de IDs de vocabulario por episodio"""
+        indptr = [0]
+        indices, data = [], []
+        for ids in episode_ids:
+            unique, counts = np.unique(ids, return_counts=True)
+            indices.append(unique.astype(np.int64))
+            data.append(counts.astype(np.int64))
+            indptr.append(indptr[-1] + len(unique))
+        return cls(
+            episodes, vocabulary,
+            np.asarray(indptr, dtype=np.int64),
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+            np.concatenate(data) if data else np.zeros(0, dtype=np.int64)
+        )
+
+    @classmethod
+    def from_counts(cls, episode_word_counts):
+        """Construye la matriz a partir de [(episodio, {lema: frecuencia})]"""
+        vocabulary = Vocabulary()
+        episodes, indptr, indices, data = [], [0], [], []
+        for episode, word_count in episode_word_counts:
+            episodes.append(episode)
+            indices.extend(vocabulary.add(word) for word in word_count)
+            data.extend(word_count.values())
+            indptr.append(len(indices))
+        return cls(
+            episodes, vocabulary,
+            np.asarray(indptr, dtype=np.int64),
+            np.asarray(indices, dtype=np.int64),
+            np.asarray(data, dtype=np.int64)
+        )
+
+    def _word_ids(self, words):
+        ids = [self.vocabulary.get(word) for word in words]
+        missing = [word for word, i in zip(words, ids) if i is None]
+        if missing:
+            raise KeyError(f"Unknown words: {', '.join(missing)}")
+        return ids
+
+    def row(self, episode):
+        """Conteo {lema: frecuencia} de un episodio"""
+        i = self.episodes.index(episode)
+        start, end = self.indptr[i], self.indptr[i + 1]
+        words = self.vocabulary.words
+        return {words[j]: count for j, count in zip(self.indices[start:end].tolist(), self.data[start:end].tolist())}
+
+    def top_k(self, k, episode=None):
+        """Top k lemas (global o de un episodio); los empates respetan el orden del vocabulario"""
+        if episode is None:
+            ids = np.arange(len(self.vocabulary))
+            counts = self.totals
+        else:
+            i = self.episodes.index(episode)
+            start, end = self.indptr[i], self.indptr[i + 1]
+            ids, counts = self.indices[start:end], self.data[start:end]
+
+        order = np.argsort(-counts, kind='stable')[:k]
+        words = self.vocabulary.words
+        return [(words[j], int(c)) for j, c in zip(ids[order].tolist(), counts[order].tolist())]
+
+    def series(self, words):
+        """Matriz densa episodios × palabras con los conteos absolutos"""
+        ids = self._word_ids(words)
+        out = np.zeros((len(self.episodes), len(ids)), dtype=np.int64)
+        for k, j in enumerate(ids):
+            start, end = self.col_ptr[j], self.col_ptr[j + 1]
+            out[self.col_rows[start:end], k] = self.col_data[start:end]
+        return out
+
+    def relative_frequencies(self, words):
+        """Frecuencia relativa de cada palabra respecto al total de tokens del episodio"""
+        counts = self.series(words).astype(float)
+        totals = self.row_totals.astype(float)[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(totals > 0, counts / totals, 0.0)
+
+    def correlation(self, words, relative=False):
+        """Matriz de correlación de Pearson palabra-palabra sobre los episodios"""
+        values = self.relative_frequencies(words) if relative else self.series(words).astype(float)
+        centered = values - values.mean(axis=0)
+        norms = np.sqrt((centered ** 2).sum(axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Las palabras de varianza nula quedan como NaN (igual que pandas)
+            return (centered.T @ centered) / np.outer(norms, norms)
+
+    def evolution(self, top_n=50):
+        """Series {lema: [(episodio, frecuencia)]} de los top_n lemas globales"""
+        words = [word for word, _ in self.top_k(top_n)]
+        if not words:
+            return {}
+        counts = self.series(words)
+        return {
+            word: list(zip(self.episodes, counts[:, k].tolist()))
+            for k, word in enumerate(words)
+        }
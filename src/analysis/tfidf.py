@@ -0,0 +1,148 @@
+import numpy as np
+from processing.vocabulary import Vocabulary
+
+
+def select_top(values, k):
+    """Índices de los k mayores valores, ordenados de mayor a menor (argpartition + orden de k)"""
+    if k <= 0 or not len(values):
+        return np.zeros(0, dtype=np.intp)
+    if k < len(values):
+        top = np.argpartition(-values, k - 1)[:k]
+    else:
+        top = np.arange(len(values))
+    # Entre los seleccionados, los empates se ordenan por índice
+    return top[np.lexsort((top, -values[top]))]
+
+
+class TfidfModel:
+    """
+    Pesos TF-IDF de todos los episodios a la vez sobre una matriz dispersa de
+    conteos (CSR, como TermMatrix).
+
+    - sublinear: TF = 1 + log(conteo) en lugar del conteo
+    - smooth: IDF = log((1 + N) / (1 + df)) + 1, como si hubiera un episodio
+      extra con todas las palabras; si no, IDF = log(N / df) + 1
+    - norm: 'l2' normaliza el vector de cada episodio (None para no hacerlo)
+
+    Las frecuencias de documento se mantienen al añadir o quitar episodios,
+    así que actualizar el IDF no requiere recorrer el corpus de nuevo.
+    """
+
+    def __init__(self, sublinear=True, smooth=True, norm='l2'):
+        if norm not in ('l2', None):
+            raise ValueError(f"Unknown norm {norm!r} (options: 'l2', None)")
+        self.sublinear = sublinear
+        self.smooth = smooth
+        self.norm = norm
+        self.vocabulary = Vocabulary()
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self.rows = {}
+        self._csr = None
+
+    @property
+    def episodes(self):
+        return sorted(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def from_term_matrix(cls, term_matrix, sublinear=True, smooth=True, norm='l2'):
+        """Construye el modelo a partir de una TermMatrix (una fila por episodio)"""
+        model = cls(sublinear, smooth, norm)
+        model.vocabulary.merge(term_matrix.vocabulary.words)
+        model.document_frequency = np.bincount(term_matrix.indices, minlength=len(model.vocabulary)).astype(np.int64)
+        for i, episode in enumerate(term_matrix.episodes):
+            start, end = term_matrix.indptr[i], term_matrix.indptr[i + 1]
+            model.rows[episode] = (term_matrix.indices[start:end], term_matrix.data[start:end])
+        return model
+
+    def add_episode(self, episode, word_count):
+        """Añade (o reemplaza) un episodio a partir de su conteo {lema: frecuencia}"""
+        if episode in self.rows:
+            self.remove_episode(episode)
+        words = [word for word, count in word_count.items() if count]
+        indices = self.vocabulary.encode(words).astype(np.int64)
+        data = np.fromiter((word_count[word] for word in words), dtype=np.int64, count=len(words))
+        self.document_frequency = np.concatenate((
+            self.document_frequency,
+            np.zeros(len(self.vocabulary) - len(self.document_frequency), dtype=np.int64)
+        ))
+        self.document_frequency[indices] += 1
+        self.rows[episode] = (indices, data)
+        self._csr = None
+
+    def remove_episode(self, episode):
+        """Quita un episodio y descuenta sus palabras de las frecuencias de documento"""
+        indices, _ = self.rows.pop(episode)
+        self.document_frequency[indices] -= 1
+        self._csr = None
+
+    def idf(self):
+        """IDF de cada palabra del vocabulario (0 para las que ya no aparecen en ningún episodio)"""
+        n = len(self.rows)
+        df = self.document_frequency.astype(np.float64)
+        with np.errstate(divide='ignore'):
+            if self.smooth:
+                idf = np.log((1 + n) / (1 + df)) + 1
+            else:
+                idf = np.log(n / df) + 1
+        return np.where(df > 0, idf, 0.0)
+
+    def _matrix(self):
+        """CSR (episodios, indptr, indices, conteos) en orden de episodio"""
+        if self._csr is None:
+            episodes = self.episodes
+            rows = [self.rows[episode] for episode in episodes]
+            indptr = np.concatenate(([0], np.cumsum([len(indices) for indices, _ in rows]))).astype(np.int64)
+            indices = np.concatenate([indices for indices, _ in rows]) if rows else np.zeros(0, dtype=np.int64)
+            data = np.concatenate([data for _, data in rows]) if rows else np.zeros(0, dtype=np.int64)
+            self._csr = (episodes, indptr, indices, data)
+        return self._csr
+
+    def weights(self):
+        """
+        Pesos TF-IDF de todos los episodios en una sola pasada vectorizada:
+        (episodios, indptr, indices, pesos) en formato CSR.
+        """
+        episodes, indptr, indices, data = self._matrix()
+        tf = data.astype(np.float64)
+        if self.sublinear:
+            tf = 1 + np.log(tf)
+        weights = tf * self.idf()[indices]
+        if self.norm == 'l2' and len(weights):
+            rows = np.repeat(np.arange(len(episodes)), np.diff(indptr))
+            norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(episodes)))
+            weights /= np.where(norms > 0, norms, 1.0)[rows]
+        return episodes, indptr, indices, weights
+
+    def top_k(self, k=20, episode=None):
+        """
+        Los k términos más distintivos de un episodio: [(lema, peso)].
+        Sin episodio, los de mayor peso medio en la temporada.
+        """
+        episodes, indptr, indices, weights = self.weights()
+        words = self.vocabulary.words
+        if episode is None:
+            mean = np.bincount(indices, weights=weights, minlength=len(words)) / max(1, len(episodes))
+            top = select_top(mean, k)
+            return [(words[j], float(mean[j])) for j in top.tolist()]
+
+        i = episodes.index(episode)
+        start, end = indptr[i], indptr[i + 1]
+        top = select_top(weights[start:end], k)
+        return [(words[j], float(w)) for j, w in zip(indices[start:end][top].tolist(), weights[start:end][top].tolist())]
+
+    def distinctive_terms(self, k=20):
+        """Los k términos más distintivos de cada episodio: {episodio: [(lema, peso)]}"""
+        episodes, indptr, indices, weights = self.weights()
+        words = self.vocabulary.words
+        terms = {}
+        for i, episode in enumerate(episodes):
+            start, end = indptr[i], indptr[i + 1]
+            top = select_top(weights[start:end], k)
+            terms[episode] = [
+                (words[j], float(w))
+                for j, w in zip(indices[start:end][top].tolist(), weights[start:end][top].tolist())
+            ]
+        return terms
@@ -1,53 +1,130 @@
-from nltk.corpus import wordnet
+import os
+import json
+import hashlib
 from collections import defaultdict
 import logging
+from processing.text_utils import ensure_nltk_resources, nltk_version
+from processing import instrumentation
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-def identify_main_themes(global_top, threshold=0.01):
-    """Identifica temas principales usando agrupación semántica"""
-    total_words = sum(count for _, count in global_top)
-    word_freq = dict(global_top)
-    
-    # Temas base con palabras clave iniciales
-    base_themes = {
-        'Mystery': ['mystery', 'strange', 'secret', 'unknown', 'puzzle'],
-        'Danger': ['danger', 'threat', 'monster', 'attack', 'death'],
-        'Family': ['family', 'son', 'daughter', 'parent', 'home'],
-        'Survival': ['survive', 'food', 'water', 'shelter', 'resource'],
-        'Location': ['town', 'forest', 'house', 'road', 'building'],
-        'Emotions': ['fear', 'hope', 'trust', 'angry', 'scared'],
-        'Supernatural': ['ghost', 'spirit', 'supernatural', 'paranormal', 'haunted'],
-        'Suspense': ['suspense', 'tension', 'anxiety', 'anticipation', 'uncertainty']
-    }
-    
-    # Expansión de temas con sinónimos
-    expanded_themes = defaultdict(list)
+# Temas base con palabras clave iniciales
+BASE_THEMES = {
+    'Mystery': ['mystery', 'strange', 'secret', 'unknown', 'puzzle'],
+    'Danger': ['danger', 'threat', 'monster', 'attack', 'death'],
+    'Family': ['family', 'son', 'daughter', 'parent', 'home'],
+    'Survival': ['survive', 'food', 'water', 'shelter', 'resource'],
+    'Location': ['town', 'forest', 'house', 'road', 'building'],
+    'Emotions': ['fear', 'hope', 'trust', 'angry', 'scared'],
+    'Supernatural': ['ghost', 'spirit', 'supernatural', 'paranormal', 'haunted'],
+    'Suspense': ['suspense', 'tension', 'anxiety', 'anticipation', 'uncertainty']
+}
+
+INDEX_VERSION = 1
+
+# Ruta del índice persistido (None: sólo en memoria)
+_index_path = None
+_theme_index = None
+
+
+def _index_fingerprint():
+    """Huella de los temas base y la versión de WordNet (NLTK) usadas en el índice"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(BASE_THEMES, sort_keys=True).encode('utf-8'))
+    digest.update(nltk_version().encode('utf-8'))
+    digest.update(str(INDEX_VERSION).encode('utf-8'))
+    return digest.hexdigest()
+
+
+@instrumentation.instrumented('theme_index.build')
+def build_theme_index(base_themes=BASE_THEMES):
+    """
+    Índice invertido palabra → temas a partir de las palabras clave y sus
+    sinónimos en WordNet. Los temas de cada palabra siguen el orden de
+    base_themes.
+    """
+    from nltk.corpus import wordnet
+
+    ensure_nltk_resources(['wordnet', 'omw-1.4'])
+    index = defaultdict(list)
     for theme, keywords in base_themes.items():
         for keyword in keywords:
-            # Añadir palabra base si existe
-            if keyword in word_freq:
-                expanded_themes[theme].append(keyword)
-            
-            # Buscar sinónimos
-            for syn in wordnet.synsets(keyword):
-                for lemma in syn.lemmas():
-                    synonym = lemma.name().replace('_', ' ').lower()
-                    if synonym in word_freq and synonym not in expanded_themes[theme]:
-                        expanded_themes[theme].append(synonym)
-    
-    # Calcular frecuencia de temas
+            # Palabra base y sinónimos
+            words = [keyword] + [
+                lemma.name().replace('_', ' ').lower()
+                for syn in wordnet.synsets(keyword)
+                for lemma in syn.lemmas()
+            ]
+            for word in words:
+                if theme not in index[word]:
+                    index[word].append(theme)
+    return dict(index)
+
+
+def configure_theme_index(path):
+    """Guarda y carga el índice de temas en el archivo indicado (None para no persistirlo)"""
+    global _index_path, _theme_index
+    _index_path = path
+    _theme_index = None
+
+
+def get_theme_index():
+    """Índice de temas, cargado de disco o construido la primera vez que se usa"""
+    global _theme_index
+    if _theme_index is not None:
+        return _theme_index
+
+    fingerprint = _index_fingerprint()
+    if _index_path:
+        try:
+            with open(_index_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('fingerprint') == fingerprint:
+                _theme_index = stored['index']
+                return _theme_index
+            logger.info("Theme index is stale, rebuilding")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable theme index: {str(e)}")
+
+    _theme_index = build_theme_index()
+    logger.info(f"Built theme index with {len(_theme_index)} words")
+
+    if _index_path:
+        index_dir = os.path.dirname(_index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        tmp_path = f"{_index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': fingerprint, 'index': _theme_index}, f, separators=(',', ':'))
+            os.replace(tmp_path, _index_path)
+        except OSError as e:
+            logger.error(f"Error writing theme index: {str(e)}")
+    return _theme_index
+
+
+def score_themes(word_freq, threshold=0.01, top_words=5):
+    """
+    Puntúa los temas sobre cualquier tabla de frecuencias ({palabra: conteo} o
+    pares (palabra, conteo)) en una sola pasada. Devuelve los temas cuya
+    frecuencia alcanza threshold del total, ordenados por frecuencia.
+    """
+    index = get_theme_index()
+    items = word_freq.items() if isinstance(word_freq, dict) else word_freq
+
+    total_words = 0
     theme_freq = defaultdict(int)
     theme_words = defaultdict(list)
-    
-    for word, count in word_freq.items():
-        for theme, keywords in expanded_themes.items():
-            if word in keywords:
-                theme_freq[theme] += count
-                theme_words[theme].append((word, count))
-    
+    for word, count in items:
+        total_words += count
+        for theme in index.get(word, ()):
+            theme_freq[theme] += count
+            theme_words[theme].append((word, count))
+
     # Filtrar temas significativos
     significant_themes = {}
     for theme, freq in theme_freq.items():
@@ -56,8 +133,26 @@ def identify_main_themes(global_top, threshold=0.01):
             theme_words[theme].sort(key=lambda x: x[1], reverse=True)
             significant_themes[theme] = {
                 'frequency': freq,
-                'top_words': theme_words[theme][:5]  # Top 5 palabras
+                'top_words': theme_words[theme][:top_words]
             }
-    
+
     # Ordenar temas por frecuencia
-    return sorted(significant_themes.items(), key=lambda x: x[1]['frequency'], reverse=True)
\ No newline at end of file
+    return sorted(significant_themes.items(), key=lambda x: x[1]['frequency'], reverse=True)
+
+
+@instrumentation.instrumented('identify_main_themes')
+def identify_main_themes(global_top, threshold=0.01):
+    """Identifica temas principales usando agrupación semántica"""
+    return score_themes(global_top, threshold)
+
+
+def themes_for_matrix(term_matrix, episode=None, threshold=0.01):
+    """Temas sobre todo el vocabulario del corpus o, si se indica, de un episodio"""
+    if episode is None:
+        return score_themes(zip(term_matrix.vocabulary.words, term_matrix.totals.tolist()), threshold)
+    return score_themes(term_matrix.row(episode), threshold)
+
+
+def themes_by_episode(term_matrix, threshold=0.01):
+    """Temas de cada episodio: [(episodio, temas)]"""
+    return [(episode, themes_for_matrix(term_matrix, episode, threshold)) for episode in term_matrix.episodes]
@@ -0,0 +1,157 @@
+import numpy as np
+import logging
+from processing.vocabulary import Vocabulary
+from analysis.cooccurrence import token_times
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+WINDOW_TOKENS = 100   # Ventana del MATTR (lemas)
+WINDOW_SECONDS = 60   # Ventana móvil en el tiempo
+STEP_SECONDS = 10     # Resolución de las series
+
+
+def previous_occurrence(ids):
+    """Posición de la aparición anterior del mismo ID en la secuencia (-1 si es la primera)"""
+    ids = np.asarray(ids)
+    order = np.argsort(ids, kind='stable')
+    prev = np.full(len(ids), -1, dtype=np.int64)
+    same = ids[order[1:]] == ids[order[:-1]]
+    prev[order[1:][same]] = order[:-1][same]
+    return prev
+
+
+def mattr_series(ids, window=WINDOW_TOKENS):
+    """
+    Type/token ratio de cada ventana de window tokens consecutivos (moving-
+    average TTR: su media es el MATTR, que no depende de la longitud del
+    texto). Devuelve un array con una ventana por posición inicial; si hay
+    menos tokens que window, el TTR del texto completo.
+
+    Tipos distintos de la ventana [j, j + window) = window - repeticiones, y
+    cada repetición (i, aparición anterior p con i - p < window) cuenta en
+    las ventanas que empiezan en [i - window + 1, p]: se suman con un array de
+    diferencias, sin recorrer las ventanas.
+    """
+    ids = np.asarray(ids)
+    n = len(ids)
+    if n == 0:
+        return np.zeros(0, dtype=np.float64)
+    if n <= window:
+        return np.array([len(np.unique(ids)) / n])
+
+    prev = previous_occurrence(ids)
+    pos = np.arange(n)
+    repeated = (prev >= 0) & (pos - prev < window)
+    first = np.maximum(pos[repeated] - window + 1, 0)
+    last = prev[repeated] + 1
+    starts = n - window + 1
+    diff = np.bincount(first, minlength=n + 1) - np.bincount(last, minlength=n + 1)
+    repeats = np.cumsum(diff)[:starts]
+    return (window - repeats) / window
+
+
+def mattr(ids, window=WINDOW_TOKENS):
+    """MATTR de una secuencia de IDs (media de mattr_series)"""
+    series = mattr_series(ids, window)
+    return float(series.mean()) if len(series) else 0.0
+
+
+def time_grid(end, step=STEP_SECONDS):
+    """Instantes en que se evalúan las series (cada step segundos hasta end)"""
+    return np.arange(0.0, max(float(end), 0.0) + step, step)
+
+
+def rolling_counts(times, grid, window=WINDOW_SECONDS, weights=None):
+    """Suma (o número) de eventos en [t - window/2, t + window/2) para cada t del grid"""
+    order = np.argsort(times, kind='stable')
+    times = np.asarray(times, dtype=np.float64)[order]
+    cumulative = np.concatenate(([0.0], np.cumsum(weights[order] if weights is not None else np.ones(len(times)))))
+    lo = np.searchsorted(times, grid - window / 2, side='left')
+    hi = np.searchsorted(times, grid + window / 2, side='left')
+    return cumulative[hi] - cumulative[lo]
+
+
+def speech_rate(start_sec, end_sec, word_count, grid, window=WINDOW_SECONDS):
+    """
+    Palabras por minuto en la ventana móvil centrada en cada t del grid, con
+    las palabras de cada subtítulo repartidas a lo largo de su duración. Las
+    palabras acumuladas son lineales a trozos entre inicios y finales de
+    subtítulos, así que basta ordenar esos puntos e interpolar.
+    """
+    start_sec = np.asarray(start_sec, dtype=np.float64)
+    if not len(start_sec):
+        return np.zeros(len(grid))
+    end_sec = np.maximum(np.asarray(end_sec, dtype=np.float64), start_sec + 1e-3)
+    rate = np.asarray(word_count, dtype=np.float64) / (end_sec - start_sec)
+    points = np.concatenate((start_sec, end_sec))
+    slopes = np.concatenate((rate, -rate))
+    order = np.argsort(points, kind='stable')
+    points, slopes = points[order], slopes[order]
+    # Palabras acumuladas en cada punto de cambio de la pendiente
+    current = np.cumsum(slopes)
+    cumulative = np.concatenate(([0.0], np.cumsum(current[:-1] * np.diff(points))))
+    words = np.interp(grid + window / 2, points, cumulative) - np.interp(grid - window / 2, points, cumulative)
+    return words * 60.0 / window
+
+
+def episode_timeline(encoded, words=None, keywords=(), window_tokens=WINDOW_TOKENS,
+                     window_seconds=WINDOW_SECONDS, step=STEP_SECONDS, subtitles=None):
+    """
+    Series a lo largo del episodio, evaluadas cada step segundos sobre una
+    ventana móvil de window_seconds:
+
+    - 'time': instantes (segundos)
+    - 'speech_rate': palabras por minuto (de subtitles, columnas start_sec,
+      end_sec y word_count de SubtitleTable; si no se pasan, lemas por minuto)
+    - 'mattr': TTR de la ventana de window_tokens lemas centrada en cada
+      instante (NaN sin diálogo alrededor)
+    - 'keyword_density': proporción de lemas de la ventana que son keywords
+    - 'tokens': lemas en la ventana
+
+    encoded es un episodio codificado (ver lexical_analysis.encode_episode) y
+    words su vocabulario (por defecto encoded['words']). El coste es lineal en
+    el número de tokens salvo las ordenaciones de IDs e instantes.
+    """
+    ids = np.asarray(encoded['ids'], dtype=np.int64)
+    cue_offsets = np.asarray(encoded['cue_offsets'], dtype=np.int64)
+    cue_start = np.asarray(encoded['cue_start'], dtype=np.float64)
+    cue_end = np.asarray(encoded['cue_end'], dtype=np.float64)
+    end = cue_end.max(initial=0.0)
+    if subtitles is not None:
+        end = max(end, float(np.max(subtitles['end_sec'], initial=0.0)))
+    grid = time_grid(end, step)
+
+    times = token_times(cue_offsets, cue_start, cue_end)
+    tokens = rolling_counts(times, grid, window_seconds)
+    empty = tokens == 0
+
+    # MATTR: ventana de tokens centrada en el token más cercano a cada instante
+    series = mattr_series(ids, window_tokens)
+    values = np.full(len(grid), np.nan)
+    if len(series):
+        center = np.searchsorted(np.maximum.accumulate(times), grid)
+        first = np.clip(center - window_tokens // 2, 0, len(series) - 1)
+        values = series[first]
+        values[empty] = np.nan
+
+    # Densidad de palabras clave
+    vocabulary = Vocabulary(words if words is not None else encoded['words'])
+    keyword_ids = [i for i in (vocabulary.get(word) for word in keywords) if i is not None]
+    is_keyword = np.isin(ids, keyword_ids).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        density = np.where(empty, np.nan, rolling_counts(times, grid, window_seconds, is_keyword) / tokens)
+
+    if subtitles is not None:
+        rate = speech_rate(subtitles['start_sec'], subtitles['end_sec'], subtitles['word_count'], grid, window_seconds)
+    else:
+        rate = tokens * 60.0 / window_seconds
+
+    return {
+        'time': grid,
+        'speech_rate': rate,
+        'mattr': values,
+        'keyword_density': density,
+        'tokens': tokens
+    }
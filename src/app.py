@@ -1,32 +1,22 @@
 import streamlit as st
 import os
+import json
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from analysis.lexical_analysis import process_episodes
+from analysis.incremental import IncrementalCorpus
+from analysis.cooccurrence import CooccurrenceMatrix
+from analysis.lexical_analysis import list_episode_files
+from analysis.timeline import episode_timeline, mattr
+from analysis.sentiment import score_episode_files, sentiment_cache, per_minute as sentiment_per_minute, episode_summary
+from processing.subtitle_table import SubtitleTable
+from processing import instrumentation
+from processing.text_utils import configure_lemma_store, ensure_nltk_resources, tokenize_and_lemmatize
+from analysis.theme_analysis import configure_theme_index
 from visualization.wordcloud_generator import generate_wordcloud
-from collections import defaultdict
 import seaborn as sns
 import logging
 
-import nltk
-from nltk import data
-
-# Forzar descarga de recursos si faltan
-resources = [
-    ('punkt', 'tokenizers/punkt'),
-    ('wordnet', 'corpora/wordnet'),
-    ('stopwords', 'corpora/stopwords'),
-    ('averaged_perceptron_tagger', 'taggers/averaged_perceptron_tagger'),
-    ('omw-1.4', 'corpora/omw-1.4')
-]
-
-for res_name, res_path in resources:
-    try:
-        data.find(res_path)
-    except LookupError:
-        nltk.download(res_name, quiet=True)
-
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
@@ -34,15 +24,59 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 st.set_page_config(layout="wide", page_title="ANÁLISIS LÉXICO: 'FROM'")
 st.title("ANÁLISIS LÉXICO: 'FROM' - EVOLUCIÓN TEMPORADA 3")
 
+# Diagnóstico por etapas (FROM_PROFILE=timers|cprofile|tracemalloc); se acumula entre recargas
+instrumentation.enable_from_env()
+
 # Cargar datos
 @st.cache_resource
 def load_data():
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_folder = os.path.join(BASE_DIR, 'data')
-    return process_episodes(data_folder)
+    # Caché en disco compartida entre reinicios (configurable por entorno)
+    cache_root = os.environ.get('FROM_CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+    configure_lemma_store(os.path.join(cache_root, 'lemmas'))
+    configure_theme_index(os.path.join(cache_root, 'theme_index.json'))
+    # Recursos NLTK resueltos una vez aquí, antes de repartir trabajo entre procesos
+    ensure_nltk_resources()
+    # Sólo se procesan los episodios nuevos o modificados desde la última ejecución,
+    # repartidos entre todos los núcleos disponibles
+    corpus = IncrementalCorpus(
+        state_path=os.path.join(cache_root, 'corpus_state.json'),
+        jobs=os.cpu_count(),
+        cache_dir=os.path.join(cache_root, 'episodes')
+    )
+    corpus.update(data_folder)
+    episodes = corpus.encoded_episodes(data_folder)
+    subtitles = SubtitleTable.from_files(list_episode_files(data_folder))
+    index = corpus.inverted_index(data_folder, os.path.join(cache_root, 'inverted_index.npz'), episodes)
+    return corpus.outputs() + (
+        corpus.term_matrix(), corpus.tfidf_model(), corpus.ngram_model(data_folder, episodes=episodes),
+        episodes, subtitles, index
+    )
+
+@st.cache_resource
+def load_sentiment():
+    # Puntuaciones por subtítulo de cada episodio, en caché junto a los demás artefactos
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_root = os.environ.get('FROM_CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+    episode_files = list_episode_files(os.path.join(BASE_DIR, 'data'))
+    return score_episode_files(episode_files, sentiment_cache(os.path.join(cache_root, 'sentiment')))
+
+@st.cache_resource
+def load_timeline(episode, keywords, window_tokens, window_seconds, _episodes, _subtitles):
+    # Series de un episodio (se calculan una vez por episodio y parámetros)
+    encoded = dict(_episodes)[episode]
+    return episode_timeline(
+        encoded, keywords=keywords, window_tokens=window_tokens, window_seconds=window_seconds,
+        subtitles=_subtitles.episode_columns(episode, ('start_sec', 'end_sec', 'word_count'))
+    )
+
+@st.cache_resource
+def load_cooccurrence(window, unit, _episodes):
+    return CooccurrenceMatrix.from_encoded([episode for _, episode in _episodes], window, unit)
 
 try:
-    results, global_top, semantic_evolution, main_themes = load_data()
+    results, global_top, semantic_evolution, main_themes, term_matrix, tfidf_model, ngram_model, encoded_episodes, subtitles, inverted_index = load_data()
     df = pd.DataFrame(results)
     total_words = df['total_words'].sum()
     
@@ -60,29 +94,32 @@ selected_words = st.sidebar.multiselect(
     default=list(semantic_evolution.keys())[:5]
 )
 
-# Funciones auxiliares
-def analyze_correlations(semantic_evolution, selected_words):
-    """Calcula correlaciones entre palabras seleccionadas"""
-    corr_data = defaultdict(dict)
-    
-    for word in selected_words:
-        for ep, freq in semantic_evolution[word]:
-            corr_data[ep][word] = freq
-    
-    corr_df = pd.DataFrame.from_dict(corr_data, orient='index').fillna(0)
-    return corr_df.corr()
+# Panel de diagnóstico (sólo con la instrumentación activa)
+if instrumentation.is_enabled():
+    with st.sidebar.expander("Diagnóstico"):
+        diagnostics = instrumentation.report()
+        stages = pd.DataFrame([
+            dict(entry, stage=name) for name, entry in diagnostics['stages'].items()
+        ])
+        if not stages.empty:
+            stages = stages.set_index('stage').sort_values('seconds', ascending=False)
+            if 'peak_bytes' in stages:
+                stages['peak_mb'] = stages.pop('peak_bytes') / 1e6
+            st.dataframe(stages.style.format(precision=3))
+        if diagnostics['counters']:
+            st.table(pd.Series(diagnostics['counters'], name='total'))
+        for name, functions in diagnostics.get('profiles', {}).items():
+            st.caption(f"cProfile: {name}")
+            st.dataframe(pd.DataFrame(functions).set_index('function').style.format(precision=3))
+        st.download_button(
+            "Descargar informe (JSON)", json.dumps(diagnostics, indent=2),
+            file_name='diagnostics.json', mime='application/json'
+        )
 
-def calculate_bigrams(results):
-    """Calcula bigramas más frecuentes"""
-    bigram_count = defaultdict(int)
-    
-    for episode in results:
-        words = [word for word, _ in episode['top_words']]
-        for i in range(len(words) - 1):
-            bigram = (words[i], words[i+1])
-            bigram_count[bigram] += 1
-    
-    return sorted(bigram_count.items(), key=lambda x: x[1], reverse=True)
+# Funciones auxiliares
+def analyze_correlations(term_matrix, selected_words):
+    """Calcula correlaciones entre palabras seleccionadas (corte de la matriz episodios × vocabulario)"""
+    return pd.DataFrame(term_matrix.correlation(selected_words), index=selected_words, columns=selected_words)
 
 # Pestañas principales
 tab1, tab2, tab3 = st.tabs(["Resumen Temporada", "Evolución Léxica", "Análisis Temático"])
@@ -173,16 +210,10 @@ with tab2:
     if selected_words:
         fig, ax = plt.subplots(figsize=(12, 8))
         
-        for word in selected_words:
-            episodes = []
-            freqs = []
-            for ep, count in semantic_evolution[word]:
-                ep_data = next(x for x in results if x['episode'] == ep)
-                rel_freq = count / ep_data['total_words'] if ep_data['total_words'] > 0 else 0
-                episodes.append(int(ep))  # Convertir a número
-                freqs.append(rel_freq)
-            
-            ax.plot(episodes, freqs, 'o-', label=word, linewidth=2)
+        episodes = [int(ep) for ep in term_matrix.episodes]  # Convertir a número
+        rel_freqs = term_matrix.relative_frequencies(selected_words)
+        for k, word in enumerate(selected_words):
+            ax.plot(episodes, rel_freqs[:, k], 'o-', label=word, linewidth=2)
         
         # Configurar etiquetas de eje x
         all_episodes = sorted(set(episodes))
@@ -198,7 +229,7 @@ with tab2:
         # Correlaciones
         st.subheader("Correlaciones entre Palabras")
         if len(selected_words) > 1:
-            corr_matrix = analyze_correlations(semantic_evolution, selected_words)
+            corr_matrix = analyze_correlations(term_matrix, selected_words)
             fig, ax = plt.subplots(figsize=(10, 8))
             sns.heatmap(corr_matrix, annot=True, cmap="coolwarm", vmin=-1, vmax=1, fmt=".2f", ax=ax)
             ax.set_title("Correlación de Uso entre Palabras")
@@ -208,6 +239,87 @@ with tab2:
     else:
         st.warning("Selecciona palabras para analizar su evolución")
     
+    # Términos distintivos (TF-IDF): palabras propias de cada episodio frente al resto
+    st.subheader("Términos Distintivos por Episodio (TF-IDF)")
+    tfidf_episode = st.selectbox("Episodio", tfidf_model.episodes, format_func=lambda x: f"Ep {x}", key="tfidf_episode")
+    distinctive = tfidf_model.top_k(15, tfidf_episode)
+    if distinctive:
+        tfidf_df = pd.DataFrame(distinctive, columns=['Palabra', 'TF-IDF'])
+        fig, ax = plt.subplots(figsize=(12, 6))
+        sns.barplot(data=tfidf_df, y='Palabra', x='TF-IDF',
+            hue='Palabra', palette="mako", ax=ax, legend=False, dodge=False)
+        ax.set(xlabel="Peso TF-IDF", title=f"Palabras Más Distintivas del Episodio {tfidf_episode}")
+        st.pyplot(fig)
+    
+    # Diálogo en un tramo de tiempo (consultas sobre la tabla columnar de subtítulos)
+    st.subheader("Diálogo por Minuto")
+    time_cols = st.columns(2)
+    time_episode = time_cols[0].selectbox("Episodio", subtitles.episodes, format_func=lambda x: f"Ep {x}", key="time_episode")
+    words_per_minute = subtitles.per_minute('word_count', time_episode)[time_episode]
+    minutes = time_cols[1].slider("Minutos", 0, max(1, len(words_per_minute)), (0, min(5, len(words_per_minute))))
+    
+    fig, ax = plt.subplots(figsize=(12, 4))
+    ax.bar(np.arange(len(words_per_minute)), words_per_minute, color='#377eb8', width=0.9)
+    ax.axvspan(minutes[0] - 0.5, minutes[1] - 0.5, color='orange', alpha=0.2)
+    ax.set(xlabel="Minuto", ylabel="Palabras", title=f"Palabras por Minuto - Episodio {time_episode}")
+    ax.grid(alpha=0.3)
+    st.pyplot(fig)
+    
+    rows = subtitles.overlapping(minutes[0] * 60, minutes[1] * 60, time_episode)
+    if len(rows):
+        dialogue_df = pd.DataFrame(subtitles.to_dicts(rows))[['start', 'end', 'text']]
+        dialogue_df.columns = ['Inicio', 'Fin', 'Texto']
+        st.dataframe(dialogue_df, use_container_width=True, hide_index=True)
+    else:
+        st.info("No hay diálogo en ese tramo")
+    
+    # Ritmo del episodio: métricas en ventanas móviles a lo largo del tiempo
+    st.subheader("Ritmo del Episodio")
+    rhythm_cols = st.columns(3)
+    rhythm_episode = rhythm_cols[0].selectbox("Episodio", [num for num, _ in encoded_episodes], format_func=lambda x: f"Ep {x}", key="rhythm_episode")
+    window_seconds = rhythm_cols[1].slider("Ventana (segundos)", 20, 300, 60, step=10)
+    window_tokens = rhythm_cols[2].slider("Ventana MATTR (lemas)", 25, 500, 100, step=25)
+    timeline = load_timeline(rhythm_episode, tuple(selected_words), window_tokens, window_seconds, encoded_episodes, subtitles)
+    
+    episode_row = df[df['episode'] == rhythm_episode].iloc[0]
+    metric_cols = st.columns(2)
+    metric_cols[0].metric("MATTR del episodio", f"{mattr(dict(encoded_episodes)[rhythm_episode]['ids'], window_tokens):.3f}")
+    metric_cols[1].metric("Densidad léxica (TTR)", f"{episode_row['lexical_density']:.3f}")
+    
+    minutes_axis = timeline['time'] / 60
+    fig, axes = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+    axes[0].plot(minutes_axis, timeline['speech_rate'], color='#e41a1c')
+    axes[0].set(ylabel="Palabras/min", title=f"Ritmo del Episodio {rhythm_episode} (ventana de {window_seconds}s)")
+    axes[1].plot(minutes_axis, timeline['mattr'], color='#4daf4a')
+    axes[1].set(ylabel="MATTR")
+    axes[2].plot(minutes_axis, timeline['keyword_density'] * 100, color='#984ea3')
+    axes[2].set(ylabel="% palabras clave", xlabel="Minuto")
+    for ax in axes:
+        ax.grid(alpha=0.3)
+    st.pyplot(fig)
+    st.caption("Las palabras clave son las seleccionadas en la barra lateral")
+    
+    # Búsqueda en los diálogos (concordancia sobre el índice invertido)
+    st.subheader("Buscar en los Diálogos")
+    query = st.text_input("Palabra o frase", placeholder="p. ej. light, go home")
+    if query:
+        lemmas = tokenize_and_lemmatize(query)
+        lines = inverted_index.concordance(lemmas, width=6, limit=200) if lemmas else []
+        if lines:
+            st.caption(f"{len(lines)} apariciones de «{' '.join(lemmas)}»" + (" (se muestran las 200 primeras)" if len(lines) == 200 else ""))
+            kwic_df = pd.DataFrame(lines)
+            kwic_df['Texto'] = [
+                subtitles.text(row) if row >= 0 else ""
+                for episode, group in kwic_df.groupby('episode', sort=False)
+                for row in subtitles.find_cues(episode, group['cue_id'].to_numpy()).tolist()
+            ]
+            kwic_df['Tiempo'] = kwic_df['start_sec'].apply(lambda x: f"{int(x // 60):02d}:{int(x % 60):02d}")
+            kwic_df = kwic_df[['episode', 'Tiempo', 'left', 'keyword', 'right', 'Texto']]
+            kwic_df.columns = ['Episodio', 'Tiempo', 'Contexto izquierdo', 'Palabra', 'Contexto derecho', 'Subtítulo']
+            st.dataframe(kwic_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("Sin resultados")
+    
     # Novedad léxica
     st.subheader("Cambio en el Vocabulario")
     fig, ax = plt.subplots(figsize=(12, 6))
@@ -269,18 +381,99 @@ with tab3:
     ax.set(xlabel="Episodio", ylabel="Palabra", title="Presencia de Palabras Clave")
     st.pyplot(fig)
     
-    # Bigramas
-    st.subheader("Pares de Palabras Más Frecuentes")
-    bigrams = calculate_bigrams(results)[:20]
+    # N-gramas (bigramas/trigramas reales dentro de cada subtítulo)
+    st.subheader("Secuencias de Palabras Más Frecuentes")
+    scope_options = ["Temporada"] + [f"Ep {ep}" for ep in ngram_model.episodes]
+    ngram_cols = st.columns(3)
+    scope = ngram_cols[0].selectbox("Ámbito", scope_options, key="ngram_scope")
+    n = ngram_cols[1].radio("Tamaño", [2, 3], format_func=lambda x: "Bigramas" if x == 2 else "Trigramas", horizontal=True)
+    measures = {"Frecuencia": None, "PMI": 'pmi'}
+    if n == 2:
+        measures["Log-verosimilitud"] = 'llr'
+    measure = measures[ngram_cols[2].selectbox("Ordenar por", list(measures), key="ngram_measure")]
+    episode = None if scope == "Temporada" else ngram_model.episodes[scope_options.index(scope) - 1]
     
-    if bigrams:
-        bigram_df = pd.DataFrame(bigrams, columns=['Bigrama', 'Frecuencia'])
-        bigram_df['Palabras'] = bigram_df['Bigrama'].apply(lambda x: f"{x[0]} + {x[1]}")
+    if measure is None:
+        ngrams = ngram_model.top_k(20, n, episode)
+    else:
+        ngrams = [(gram, score) for gram, score, _ in ngram_model.collocations(20, n, episode, measure)]
+    
+    if ngrams:
+        value_label = "Frecuencia" if measure is None else "Puntuación"
+        ngram_df = pd.DataFrame(ngrams, columns=['Ngrama', value_label])
+        ngram_df['Palabras'] = ngram_df['Ngrama'].apply(lambda x: " + ".join(x))
         
         fig, ax = plt.subplots(figsize=(12, 8))
-        sns.barplot(data=bigram_df, y='Palabras', x='Frecuencia', 
+        sns.barplot(data=ngram_df, y='Palabras', x=value_label, 
             hue='Palabras', palette="viridis", ax=ax, legend=False, dodge=False)
-        ax.set(xlabel="Frecuencia", title="Pares de Palabras Más Comunes")
+        ax.set(xlabel=value_label, title="Secuencias de Palabras Más Comunes")
+        st.pyplot(fig)
+    else:
+        st.warning("No se encontraron n-gramas significativos")
+    
+    # Red de co-ocurrencias (lemas que aparecen juntos dentro de una ventana deslizante)
+    st.subheader("Red de Co-ocurrencias")
+    net_cols = st.columns(3)
+    unit = net_cols[0].radio("Ventana en", ['tokens', 'seconds'],
+        format_func=lambda x: "Palabras" if x == 'tokens' else "Segundos", horizontal=True)
+    window = net_cols[1].slider("Tamaño de ventana", 2, 20, 5)
+    max_nodes = net_cols[2].slider("Palabras en la red", 10, 100, 40)
+    
+    graph = load_cooccurrence(window, unit, encoded_episodes).to_graph(k=3, max_nodes=max_nodes)
+    if graph['edges']:
+        # Disposición circular: nodos ordenados por frecuencia, tamaño según frecuencia
+        nodes = sorted(graph['nodes'], key=lambda x: x['frequency'], reverse=True)
+        angles = np.linspace(0, 2 * np.pi, len(nodes), endpoint=False)
+        pos = {node['id']: (np.cos(a), np.sin(a)) for node, a in zip(nodes, angles)}
+        max_weight = max(edge['weight'] for edge in graph['edges'])
+        max_freq = nodes[0]['frequency']
+        
+        fig, ax = plt.subplots(figsize=(12, 12))
+        for edge in graph['edges']:
+            (x0, y0), (x1, y1) = pos[edge['source']], pos[edge['target']]
+            ax.plot([x0, x1], [y0, y1], color='steelblue', alpha=0.2 + 0.6 * edge['weight'] / max_weight,
+                linewidth=0.5 + 3 * edge['weight'] / max_weight, zorder=1)
+        xs, ys = zip(*(pos[node['id']] for node in nodes))
+        ax.scatter(xs, ys, s=[50 + 950 * node['frequency'] / max_freq for node in nodes],
+            color='darkorange', zorder=2)
+        for node in nodes:
+            x, y = pos[node['id']]
+            ax.annotate(node['id'], (x * 1.08, y * 1.08), ha='center', va='center', fontsize=9)
+        ax.set_xlim(-1.25, 1.25)
+        ax.set_ylim(-1.25, 1.25)
+        ax.set_aspect('equal')
+        ax.axis('off')
         st.pyplot(fig)
     else:
-        st.warning("No se encontraron bigramas significativos")
\ No newline at end of file
+        st.warning("No se encontraron co-ocurrencias")
+    
+    # Sentimiento del diálogo (lexicón VADER sobre cada subtítulo)
+    st.subheader("Sentimiento del Diálogo")
+    try:
+        sentiment = load_sentiment()
+    except (LookupError, OSError) as e:
+        st.warning(f"Análisis de sentimiento no disponible: {str(e).strip().splitlines()[0]}")
+        sentiment = []
+    if sentiment:
+        sentiment_df = pd.DataFrame([episode_summary(episode, scores) for episode, scores in sentiment])
+        sentiment_df['episode_num'] = sentiment_df['episode'].astype(int)
+        
+        fig, ax = plt.subplots(figsize=(12, 4))
+        ax.bar(sentiment_df['episode_num'], sentiment_df['compound'],
+            color=np.where(sentiment_df['compound'] >= 0, '#4daf4a', '#e41a1c'))
+        ax.axhline(0, color='gray', linewidth=0.8)
+        ax.set(xlabel="Episodio", ylabel="Compound medio", title="Sentimiento Medio por Episodio")
+        ax.grid(alpha=0.3)
+        st.pyplot(fig)
+        
+        sentiment_episode = st.selectbox("Episodio", [episode for episode, _ in sentiment], format_func=lambda x: f"Ep {x}", key="sentiment_episode")
+        scores = dict(sentiment)[sentiment_episode]
+        curve = sentiment_per_minute(scores)
+        fig, ax = plt.subplots(figsize=(12, 4))
+        ax.scatter(scores['cue_start'] / 60, scores['compound'], s=6, alpha=0.25, color='gray', label="Subtítulos")
+        ax.plot(np.arange(len(curve)) + 0.5, curve, color='#984ea3', linewidth=2, label="Media por minuto")
+        ax.axhline(0, color='gray', linewidth=0.8)
+        ax.set(xlabel="Minuto", ylabel="Compound", ylim=(-1.05, 1.05), title=f"Sentimiento a lo Largo del Episodio {sentiment_episode}")
+        ax.legend()
+        ax.grid(alpha=0.3)
+        st.pyplot(fig)
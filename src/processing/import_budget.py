@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import subprocess
+
+# Módulos que deben importarse rápido y sin cargar NLTK: el parser y lo que
+# app.py importa antes de la primera pintada (excluidas las dependencias de UI),
+# y las CLI sin interfaz
+BUDGETS = {
+    'processing.srt_parser': 0.25,
+    'processing.text_utils': 0.75,
+    'analysis.lexical_analysis': 1.0,
+    'analysis.incremental': 1.0,
+    'analysis.batch': 1.0,
+    'analysis.archive': 1.0
+}
+
+# Paquetes pesados que no deben cargarse sólo por importar (ninguno de estos
+# módulos necesita la interfaz ni los gráficos)
+FORBIDDEN = ('nltk', 'chardet', 'streamlit', 'matplotlib', 'seaborn', 'pandas')
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module, src_dir=None):
+    """Mide en un intérprete nuevo el tiempo de importar un módulo y qué paquetes prohibidos carga"""
+    src_dir = src_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE.format(module=module, forbidden=FORBIDDEN)],
+        cwd=src_dir, capture_output=True, text=True, check=True,
+        env=dict(os.environ, PYTHONPATH=src_dir)
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check_import_budget(budgets=None, repeat=3):
+    """
+    Comprueba que cada módulo se importa dentro de su presupuesto (mejor de
+    repeat intentos, en segundos) sin cargar NLTK. Devuelve la lista de fallos.
+    """
+    failures = []
+    for module, budget in (budgets or BUDGETS).items():
+        runs = [measure_import(module) for _ in range(repeat)]
+        best = min(run['seconds'] for run in runs)
+        loaded = sorted({name for run in runs for name in run['loaded']})
+        status = 'ok' if best <= budget and not loaded else 'FAIL'
+        print(f"{status:>4} {module:<28} {best * 1000:8.1f} ms (budget {budget * 1000:.0f} ms)"
+              + (f" loaded: {', '.join(loaded)}" if loaded else ''))
+        if status != 'ok':
+            failures.append((module, best, loaded))
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_import_budget() else 0)
@@ -0,0 +1,296 @@
+import os
+import time
+import logging
+from contextlib import contextmanager, nullcontext
+from functools import partial, wraps
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# Activación por entorno: FROM_PROFILE=timers | cprofile | tracemalloc (se
+# pueden combinar separados por comas; cprofile y tracemalloc incluyen timers)
+PROFILE_ENV = 'FROM_PROFILE'
+PROFILE_OPTIONS = ('timers', 'cprofile', 'tracemalloc')
+PROFILE_TOP = 15  # Funciones por etapa en el resumen de cProfile
+
+# Colector activo (None: instrumentación desactivada)
+_collector = None
+_NOOP = nullcontext()
+
+
+class Collector:
+    """
+    Acumula tiempos por etapa (llamadas, total, máximo), contadores y,
+    opcionalmente, el perfil de cProfile y el pico de memoria (tracemalloc)
+    de cada etapa.
+
+    Las etapas pueden anidarse; el perfil de cProfile sólo se captura en las
+    etapas más externas (un único perfilador activo a la vez) y el pico de
+    memoria de una etapa incluye el de sus etapas internas. Con jobs > 1 los
+    workers de process_pool tienen su propio colector y lo que miden se suma
+    al de este proceso (ver pool_map): el tiempo de sus etapas es la suma de
+    todos los workers, no tiempo de reloj.
+    """
+
+    def __init__(self, cprofile=False, tracemalloc=False):
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.stages = {}
+        self.counters = {}
+        self.profiles = {}
+        self._stack = []
+        self._profiler = None
+        self.started = time.time()
+        if tracemalloc:
+            import tracemalloc as tm
+            if not tm.is_tracing():
+                tm.start()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name):
+        frame = {'peak': 0}
+        self._stack.append(frame)
+        profiler = None
+        if self.cprofile and self._profiler is None:
+            import cProfile
+            profiler = self._profiler = cProfile.Profile()
+            profiler.enable()
+        if self.tracemalloc:
+            import tracemalloc as tm
+            # El pico acumulado hasta ahora pertenece a la etapa que contiene a ésta
+            if len(self._stack) > 1:
+                self._stack[-2]['peak'] = max(self._stack[-2]['peak'], tm.get_traced_memory()[1])
+            tm.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._profiler = None
+                self._merge_profile(name, profiler)
+            self._stack.pop()
+
+            entry = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += elapsed
+            entry['max_seconds'] = max(entry['max_seconds'], elapsed)
+            if self.tracemalloc:
+                import tracemalloc as tm
+                peak = max(tm.get_traced_memory()[1], frame['peak'])
+                entry['peak_bytes'] = max(entry.get('peak_bytes', 0), peak)
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+
+    def _merge_profile(self, name, profiler):
+        import pstats
+        if name in self.profiles:
+            self.profiles[name].add(profiler)
+        else:
+            self.profiles[name] = pstats.Stats(profiler)
+
+    def snapshot(self):
+        """Lo acumulado, en un formato que se puede enviar entre procesos (ver merge)"""
+        return {
+            'stages': {name: dict(entry) for name, entry in self.stages.items()},
+            'counters': dict(self.counters),
+            'profiles': {name: stats.stats for name, stats in self.profiles.items()}
+        }
+
+    def merge(self, snapshot):
+        """Suma lo medido en otro proceso (snapshot) a este colector"""
+        import pstats
+        for name, other in snapshot['stages'].items():
+            entry = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            entry['calls'] += other['calls']
+            entry['seconds'] += other['seconds']
+            entry['max_seconds'] = max(entry['max_seconds'], other['max_seconds'])
+            if 'peak_bytes' in other:
+                entry['peak_bytes'] = max(entry.get('peak_bytes', 0), other['peak_bytes'])
+        for name, n in snapshot['counters'].items():
+            self.count(name, n)
+        for name, stats in snapshot['profiles'].items():
+            stats = pstats.Stats(_StatsSnapshot(stats))
+            if name in self.profiles:
+                self.profiles[name].add(stats)
+            else:
+                self.profiles[name] = stats
+
+    def report(self, top=PROFILE_TOP):
+        """Informe estructurado (serializable a JSON)"""
+        report = {
+            'enabled': True,
+            'cprofile': self.cprofile,
+            'tracemalloc': self.tracemalloc,
+            'wall_seconds': time.time() - self.started,
+            'stages': {name: dict(entry) for name, entry in self.stages.items()},
+            'counters': dict(self.counters)
+        }
+        if self.profiles:
+            report['profiles'] = {name: _top_functions(stats, top) for name, stats in self.profiles.items()}
+        return report
+
+
+class _StatsSnapshot:
+    """Tabla de pstats recibida de otro proceso, con la interfaz que acepta pstats.Stats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _top_functions(stats, top):
+    """Funciones con mayor tiempo acumulado de un pstats.Stats"""
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'calls': calls,
+            'tottime': tottime,
+            'cumtime': cumtime
+        })
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:top]
+
+
+def enable(cprofile=False, tracemalloc=False):
+    """Activa la instrumentación (descartando lo acumulado) y devuelve el colector"""
+    global _collector
+    _collector = Collector(cprofile, tracemalloc)
+    return _collector
+
+
+def disable():
+    """Desactiva la instrumentación y devuelve el informe de lo acumulado (None si no estaba activa)"""
+    global _collector
+    collector, _collector = _collector, None
+    if collector is None:
+        return None
+    if collector.tracemalloc:
+        import tracemalloc as tm
+        tm.stop()
+    return collector.report()
+
+
+def enable_from_env():
+    """Activa la instrumentación según FROM_PROFILE; devuelve si quedó activa"""
+    options = {option.strip() for option in os.environ.get(PROFILE_ENV, '').split(',') if option.strip()}
+    unknown = options - set(PROFILE_OPTIONS) - {'1'}
+    if unknown:
+        logger.warning(f"Ignoring unknown {PROFILE_ENV} options: {', '.join(sorted(unknown))}")
+    if not options - unknown:
+        return False
+    if _collector is None:
+        enable(cprofile='cprofile' in options, tracemalloc='tracemalloc' in options)
+    return True
+
+
+def is_enabled():
+    return _collector is not None
+
+
+def stage(name):
+    """Contexto que mide una etapa; sin instrumentación es un contexto vacío compartido"""
+    collector = _collector
+    if collector is None:
+        return _NOOP
+    return collector.stage(name)
+
+
+def count(name, n=1):
+    """Suma n al contador name (no hace nada si la instrumentación está desactivada)"""
+    collector = _collector
+    if collector is not None:
+        collector.count(name, n)
+
+
+def instrumented(name):
+    """Decorador: mide cada llamada a la función como la etapa name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            collector = _collector
+            if collector is None:
+                return func(*args, **kwargs)
+            with collector.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Workers de procesos: cada uno mide con su propio colector y devuelve lo
+# medido junto con el resultado de cada llamada
+
+def _init_worker(options):
+    """Inicializador de los workers: descarta el colector heredado del padre y crea uno con sus opciones"""
+    global _collector
+    _collector = None
+    if options is not None:
+        enable(**options)
+
+
+def _call_in_worker(func, *args, **kwargs):
+    """func en un worker: devuelve (resultado, snapshot de lo medido en esta llamada o None)"""
+    result = func(*args, **kwargs)
+    collector = _collector
+    if collector is None:
+        return result, None
+    snapshot = collector.snapshot()
+    collector.stages, collector.counters, collector.profiles = {}, {}, {}
+    return result, snapshot
+
+
+def process_pool(max_workers):
+    """ProcessPoolExecutor cuyos workers se miden con las mismas opciones que este proceso (ver pool_map)"""
+    from concurrent.futures import ProcessPoolExecutor
+    collector = _collector
+    options = None if collector is None else {'cprofile': collector.cprofile, 'tracemalloc': collector.tracemalloc}
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(options,))
+
+
+def pool_map(executor, func, *iterables):
+    """
+    executor.map(func, *iterables) sobre un pool de process_pool: lo medido
+    en los workers se suma al colector de este proceso. Devuelve la lista de
+    resultados en orden.
+    """
+    results = []
+    for result, snapshot in executor.map(partial(_call_in_worker, func), *iterables):
+        collector = _collector
+        if collector is not None and snapshot is not None:
+            collector.merge(snapshot)
+        results.append(result)
+    return results
+
+
+def report():
+    """Informe de la instrumentación activa ({'enabled': False} si está desactivada)"""
+    collector = _collector
+    return collector.report() if collector is not None else {'enabled': False}
+
+
+def format_report(report, top=10):
+    """Resumen en texto de un informe (etapas por tiempo total, contadores)"""
+    if not report.get('enabled'):
+        return f"Instrumentation disabled (set {PROFILE_ENV}=timers)"
+    lines = [f"{'stage':<40} {'calls':>7} {'total s':>9} {'max s':>8}" + ("  peak MB" if report['tracemalloc'] else '')]
+    for name, entry in sorted(report['stages'].items(), key=lambda item: item[1]['seconds'], reverse=True):
+        line = f"{name:<40} {entry['calls']:>7} {entry['seconds']:>9.3f} {entry['max_seconds']:>8.3f}"
+        if 'peak_bytes' in entry:
+            line += f"  {entry['peak_bytes'] / 1e6:>7.1f}"
+        lines.append(line)
+    if report['counters']:
+        lines.append('')
+        lines.extend(f"{name:<40} {value:>12}" for name, value in sorted(report['counters'].items()))
+    for name, functions in report.get('profiles', {}).items():
+        lines.append('')
+        lines.append(f"[{name}]")
+        lines.extend(f"  {row['cumtime']:>8.3f}s {row['calls']:>9} {row['function']}" for row in functions[:top])
+    return '\n'.join(lines)
@@ -0,0 +1,251 @@
+import os
+import uuid
+import logging
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# Variable de entorno con el directorio del almacén (la heredan los procesos hijos)
+STORE_ENV = 'FROM_LEMMA_STORE'
+
+
+class LemmaStore:
+    """
+    Almacén persistente (palabra, POS) → lema compartido entre procesos.
+
+    Las entradas se guardan en un único archivo .npy con un array estructurado
+    ordenado por clave ('pos:palabra'), que se abre con memoria mapeada: varios
+    procesos lo leen a la vez sin cargarlo entero y las búsquedas son binarias
+    (np.searchsorted). Los lemas calculados en el proceso quedan pendientes:
+    los workers de un pool los vuelcan con spill() a un shard propio (sólo las
+    entradas nuevas, sin reescribir nada) y el proceso principal ejecuta
+    flush() una vez por pasada, que bajo un cerrojo de archivo fusiona el
+    almacén, los shards y sus propios pendientes con una escritura atómica,
+    de modo que los lectores existentes siguen viendo la versión anterior y
+    no se pierden entradas de otros procesos. Un valor vacío representa una
+    palabra sin lema válido (None).
+
+    Sin path, el almacén funciona sólo en memoria.
+    """
+
+    def __init__(self, compute, path=None, version=''):
+        self.compute = compute
+        self.path = path
+        self.file_path = os.path.join(path, f"lemmas-{version}.npy" if version else "lemmas.npy") if path else None
+        self._token = uuid.uuid4().hex[:12]
+        self._spills = 0
+        self.memo = {}
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.entries = None
+        self._mtime = None
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._open()
+
+    # Lectura
+
+    def _open(self):
+        """(Re)abre el archivo en disco con memoria mapeada"""
+        try:
+            self._mtime = os.stat(self.file_path).st_mtime_ns
+            self.entries = np.load(self.file_path, mmap_mode='r', allow_pickle=False)
+        except FileNotFoundError:
+            self.entries = None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable lemma store: {str(e)}")
+            self.entries = None
+
+    def __len__(self):
+        return len(self.entries) if self.entries is not None else 0
+
+    def _lookup(self, key):
+        entries = self.entries
+        if entries is None or not len(entries):
+            return None
+        keys = entries['key']
+        i = int(np.searchsorted(keys, key))
+        if i < len(keys) and keys[i] == key:
+            return str(entries['lemma'][i])
+        return None
+
+    def lemmatize(self, word, pos):
+        """Lema de (word, pos), consultando memoria, disco y por último el lematizador"""
+        key = f"{pos}:{word}"
+        lemma = self.memo.get(key)
+        if lemma is None:
+            lemma = self._lookup(key)
+            if lemma is None:
+                self.misses += 1
+                lemma = self.compute(word, pos) or ''
+                self.pending[key] = lemma
+            else:
+                self.hits += 1
+            self.memo[key] = lemma
+        else:
+            self.hits += 1
+        return lemma or None
+
+    # Escritura
+
+    def _shard_prefix(self):
+        return f"{os.path.basename(self.file_path)[:-len('.npy')]}."
+
+    def _shards(self):
+        """Shards de lemas pendientes de fusionar (de cualquier proceso)"""
+        prefix = self._shard_prefix()
+        return sorted(
+            os.path.join(self.path, filename) for filename in os.listdir(self.path)
+            if filename.startswith(prefix) and filename.endswith('.part.npy')
+        )
+
+    @staticmethod
+    def _read(path, merged):
+        """Añade a merged las entradas de un archivo del almacén (si existe y es legible)"""
+        try:
+            current = np.load(path, allow_pickle=False)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable lemma store file {os.path.basename(path)}: {str(e)}")
+            return
+        merged.update(zip(current['key'].tolist(), current['lemma'].tolist()))
+
+    @staticmethod
+    def _write(path, lemmas):
+        """Guarda {clave: lema} como array estructurado ordenado, de forma atómica"""
+        keys = sorted(lemmas)
+        key_width = max(len(key) for key in keys)
+        lemma_width = max(1, max(len(lemmas[key]) for key in keys))
+        entries = np.empty(len(keys), dtype=[('key', f'U{key_width}'), ('lemma', f'U{lemma_width}')])
+        entries['key'] = keys
+        entries['lemma'] = [lemmas[key] for key in keys]
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, entries)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing lemma store: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
+
+    @contextmanager
+    def _locked(self):
+        """Cerrojo exclusivo entre procesos sobre el almacén en disco"""
+        with open(f"{self.file_path}.lock", 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def spill(self):
+        """
+        Vuelca los lemas pendientes a un shard nuevo de este proceso (lo usan
+        los workers del pool). Cada shard tiene un nombre único y sólo contiene
+        las entradas nuevas, así que no hay carreras entre procesos; flush()
+        los fusiona con el almacén.
+        """
+        if not self.pending or not self.file_path:
+            return 0
+        self._spills += 1
+        shard = os.path.join(
+            self.path, f"{self._shard_prefix()}{os.getpid()}-{self._token}-{self._spills}.part.npy"
+        )
+        if not self._write(shard, self.pending):
+            return 0
+        spilled = len(self.pending)
+        self.pending.clear()
+        return spilled
+
+    def flush(self):
+        """
+        Fusiona con el archivo en disco los lemas pendientes y los shards
+        volcados por otros procesos. La lectura, fusión y escritura se hacen
+        bajo un cerrojo de archivo, por lo que flush() concurrentes no pierden
+        entradas; los shards se borran sólo después de quedar incorporados.
+        """
+        if not self.file_path:
+            return 0
+
+        with self._locked():
+            shards = self._shards()
+            if not self.pending and not shards:
+                return 0
+
+            # Releer el archivo por si otro proceso lo actualizó entretanto
+            merged = {}
+            self._read(self.file_path, merged)
+            stored = len(merged)
+            for shard in shards:
+                self._read(shard, merged)
+            merged.update(self.pending)
+            added = len(merged) - stored
+            if not self._write(self.file_path, merged):
+                return 0
+            for shard in shards:
+                try:
+                    os.remove(shard)
+                except FileNotFoundError:
+                    pass
+
+        self.pending.clear()
+        self._open()
+        return added
+
+    def refresh(self):
+        """Vuelve a mapear el archivo si otro proceso lo ha reescrito"""
+        if not self.file_path:
+            return
+        try:
+            mtime = os.stat(self.file_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self._open()
+
+    def prewarm(self, words, pos_tags):
+        """Calcula y guarda los lemas de todas las combinaciones (palabra, POS) que falten"""
+        hits, misses = self.hits, self.misses
+        for word in words:
+            for pos in pos_tags:
+                self.lemmatize(word, pos)
+        computed = self.misses - misses
+        # El precalentamiento no cuenta en las estadísticas de uso
+        self.hits, self.misses = hits, misses
+        self.flush()
+        return computed
+
+    def stats(self):
+        """Estadísticas de aciertos/fallos del proceso actual"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'stored': len(self),
+            'pending': len(self.pending),
+            'path': self.file_path
+        }
@@ -1,9 +1,11 @@
 import re
-import chardet
+import io
+import mmap
 import logging
 from datetime import timedelta
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
 import os
+from processing import instrumentation
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -24,82 +26,153 @@ def time_to_seconds(time_str: str) -> float:
         logger.error(f"Error parsing time string '{time_str}': {str(e)}")
         return 0.0
 
-def parse_srt(file_path: str, min_duration: float = 0.1) -> List[Dict]:
-    """Parsea archivos SRT con detección de encoding y limpieza avanzada"""
-    # Detectar encoding
+# Patrón regex mejorado (se aplica bloque a bloque)
+CUE_PATTERN = re.compile(
+    r'(\d+)\s*\n'  # ID
+    r'(\d{1,2}:\d{2}:\d{2}[,.:]\d{1,3})\s*-->\s*(\d{1,2}:\d{2}:\d{2}[,.:]\d{1,3})\s*\n'  # Tiempos
+    r'((?:.+[\r\n]+)*.+)'  # Texto (puede tener múltiples líneas)
+)
+
+def detect_encoding(file_path: str, sample_size: int = 10000) -> str:
+    """Detecta el encoding de un archivo a partir de sus primeros bytes"""
     encoding = 'utf-8'
-    try:
-        with open(file_path, 'rb') as f:
-            rawdata = f.read(10000)
-            encoding_info = chardet.detect(rawdata)
-            if encoding_info['confidence'] > 0.7:
-                encoding = encoding_info['encoding']
-    except Exception as e:
-        logger.error(f"Error detecting encoding: {str(e)}")
+    with instrumentation.stage('parse_srt.detect_encoding'):
+        try:
+            import chardet
+            with open(file_path, 'rb') as f:
+                rawdata = f.read(sample_size)
+                encoding_info = chardet.detect(rawdata)
+                if encoding_info['confidence'] > 0.7:
+                    encoding = encoding_info['encoding']
+        except Exception as e:
+            logger.error(f"Error detecting encoding: {str(e)}")
+    return encoding
+
+def _iter_blocks_mmap(mm, encoding: str) -> Iterator[str]:
+    """Recorre un archivo mapeado en memoria devolviendo bloques separados por líneas vacías"""
+    lines = []
+    pos = 0
+    size = len(mm)
+    while pos < size:
+        end = mm.find(b'\n', pos)
+        if end == -1:
+            end = size
+        line = mm[pos:end]
+        pos = end + 1
+        if line.strip():
+            lines.append(line.rstrip(b'\r'))
+        elif lines:
+            yield b'\n'.join(lines).decode(encoding, errors='replace')
+            lines = []
+    if lines:
+        yield b'\n'.join(lines).decode(encoding, errors='replace')
+
+def _iter_blocks_text(f) -> Iterator[str]:
+    """Variante en modo texto para encodings de ancho fijo (UTF-16/32)"""
+    lines = []
+    for line in f:
+        if line.strip():
+            lines.append(line.rstrip('\r\n'))
+        elif lines:
+            yield '\n'.join(lines)
+            lines = []
+    if lines:
+        yield '\n'.join(lines)
+
+def _parse_cue(match, min_duration: float) -> Optional[Dict]:
+    """Construye el diccionario de un subtítulo a partir de un match del patrón"""
+    sub_id = int(match.group(1))
+    start = match.group(2).replace('.', ',')
+    end = match.group(3).replace('.', ',')
+    text = match.group(4).strip()
     
-    # Leer contenido
-    try:
-        with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-            content = f.read()
-    except Exception as e:
-        logger.error(f"Error reading file: {str(e)}")
-        return []
+    # Calcular duración
+    start_sec = time_to_seconds(start)
+    end_sec = time_to_seconds(end)
+    duration = end_sec - start_sec
     
-    # Patrón regex mejorado
-    pattern = re.compile(
-        r'(\d+)\s*\n'  # ID
-        r'(\d{1,2}:\d{2}:\d{2}[,.:]\d{1,3})\s*-->\s*(\d{1,2}:\d{2}:\d{2}[,.:]\d{1,3})\s*\n'  # Tiempos
-        r'((?:.+[\r\n]+)*.+)'  # Texto (puede tener múltiples líneas)
-    )
+    # Filtrar subtítulos muy cortos
+    if duration < min_duration:
+        return None
     
-    subtitles = []
+    # Limpieza avanzada de texto
+    text = re.sub(r'<[^>]+>', '', text)  # HTML tags
+    text = re.sub(r'\{[^}]+\}', '', text)  # Marcadores
+    text = re.sub(r'\s+', ' ', text).strip()  # Espacios
+    
+    # Eliminar números (nuevo filtro)
+    text = re.sub(r'\b\d+\b', '', text)  # Elimina números sueltos
+    
+    # Calcular palabras por minuto
+    word_count = len(text.split())
+    wpm = int((word_count / duration) * 60) if duration > 0 else 0
+    
+    return {
+        'id': sub_id,
+        'start': start,
+        'end': end,
+        'text': text,
+        'duration': round(duration, 3),
+        'start_sec': start_sec,
+        'end_sec': end_sec,
+        'word_count': word_count,
+        'wpm': wpm
+    }
+
+def iter_srt(file_path: str, min_duration: float = 0.1) -> Iterator[Dict]:
+    """
+    Recorre un archivo SRT subtítulo a subtítulo sin cargarlo completo.
+    El archivo se mapea en memoria y se decodifica bloque a bloque, por lo que
+    el consumo de memoria depende del tamaño de un subtítulo, no del archivo.
+    """
+    encoding = detect_encoding(file_path)
+    count = 0
     errors = 0
     
-    for match in pattern.finditer(content):
+    try:
+        f = open(file_path, 'rb')
+    except Exception as e:
+        logger.error(f"Error reading file: {str(e)}")
+        return
+    
+    with f:
+        if encoding.lower().replace('_', '-').startswith(('utf-16', 'utf-32')):
+            blocks = _iter_blocks_text(io.TextIOWrapper(f, encoding=encoding, errors='replace'))
+            mm = None
+        else:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Archivo vacío: mmap no admite longitud cero
+                mm = None
+                blocks = iter(())
+            else:
+                blocks = _iter_blocks_mmap(mm, encoding)
+        
         try:
-            sub_id = int(match.group(1))
-            start = match.group(2).replace('.', ',')
-            end = match.group(3).replace('.', ',')
-            text = match.group(4).strip()
-            
-            # Calcular duración
-            start_sec = time_to_seconds(start)
-            end_sec = time_to_seconds(end)
-            duration = end_sec - start_sec
-            
-            # Filtrar subtítulos muy cortos
-            if duration < min_duration:
-                continue
-            
-            # Limpieza avanzada de texto
-            text = re.sub(r'<[^>]+>', '', text)  # HTML tags
-            text = re.sub(r'\{[^}]+\}', '', text)  # Marcadores
-            text = re.sub(r'\s+', ' ', text).strip()  # Espacios
-            
-            # Eliminar números (nuevo filtro)
-            text = re.sub(r'\b\d+\b', '', text)  # Elimina números sueltos
-            
-            # Calcular palabras por minuto
-            word_count = len(text.split())
-            wpm = int((word_count / duration) * 60) if duration > 0 else 0
-            
-            subtitles.append({
-                'id': sub_id,
-                'start': start,
-                'end': end,
-                'text': text,
-                'duration': round(duration, 3),
-                'start_sec': start_sec,
-                'end_sec': end_sec,
-                'word_count': word_count,
-                'wpm': wpm
-            })
-        except Exception as e:
-            errors += 1
-            logger.warning(f"Error parsing subtitle: {str(e)}")
+            for block in blocks:
+                for match in CUE_PATTERN.finditer(block):
+                    try:
+                        subtitle = _parse_cue(match, min_duration)
+                    except Exception as e:
+                        errors += 1
+                        logger.warning(f"Error parsing subtitle: {str(e)}")
+                        continue
+                    if subtitle is not None:
+                        count += 1
+                        yield subtitle
+        finally:
+            if mm is not None:
+                mm.close()
     
-    logger.info(f"Parsed {len(subtitles)} subtitles with {errors} errors")
-    return subtitles
+    instrumentation.count('cues', count)
+    instrumentation.count('parse_errors', errors)
+    logger.info(f"Parsed {count} subtitles with {errors} errors")
+
+def parse_srt(file_path: str, min_duration: float = 0.1) -> List[Dict]:
+    """Parsea archivos SRT con detección de encoding y limpieza avanzada"""
+    with instrumentation.stage('parse_srt'):
+        return list(iter_srt(file_path, min_duration))
 
 def format_timestamp(seconds: float) -> str:
     """Formatea segundos a formato SRT (HH:MM:SS,mmm)"""
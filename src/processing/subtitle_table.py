@@ -0,0 +1,201 @@
+import numpy as np
+import logging
+from processing.srt_parser import iter_srt, format_timestamp
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# Columnas numéricas de la tabla y su tipo
+COLUMNS = {
+    'cue_id': np.int32,
+    'start_sec': np.float64,
+    'end_sec': np.float64,
+    'duration': np.float64,
+    'word_count': np.int32,
+    'wpm': np.int32,
+}
+
+
+class SubtitleTable:
+    """
+    Subtítulos de varios episodios en formato columnar.
+
+    Cada columna es un array de NumPy (ver COLUMNS) y el texto de todos los
+    subtítulos se guarda en una sola cadena con sus desplazamientos. Las filas
+    están ordenadas por episodio e inicio, y cada episodio ocupa un tramo
+    contiguo (episode_ptr), así que las consultas por tiempo son búsquedas
+    binarias.
+
+    Para las consultas de solapamiento se guarda, por episodio, el máximo
+    acumulado del fin de los subtítulos (max_end): como es creciente, con una
+    búsqueda binaria se descartan todas las filas que acaban antes del
+    intervalo y con otra las que empiezan después.
+    """
+
+    def __init__(self, episodes, episode_ptr, columns, text, text_offsets):
+        self.episodes = list(episodes)
+        self.episode_ptr = episode_ptr
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+        self.text_buffer = text
+        self.text_offsets = text_offsets
+
+        # Máximo acumulado del fin por episodio (índice de intervalos)
+        self.max_end = np.empty_like(self.end_sec)
+        for i in range(len(self.episodes)):
+            start, end = episode_ptr[i], episode_ptr[i + 1]
+            self.max_end[start:end] = np.maximum.accumulate(self.end_sec[start:end])
+
+    def __len__(self):
+        return len(self.start_sec)
+
+    @classmethod
+    def from_subtitles(cls, episode_subtitles):
+        """Construye la tabla a partir de [(episodio, subtítulos)] con el formato de parse_srt"""
+        episodes, episode_ptr = [], [0]
+        columns = {name: [] for name in COLUMNS}
+        texts = []
+        for episode, subtitles in episode_subtitles:
+            subtitles = sorted(subtitles, key=lambda sub: sub['start_sec'])
+            episodes.append(episode)
+            episode_ptr.append(episode_ptr[-1] + len(subtitles))
+            columns['cue_id'].extend(sub['id'] for sub in subtitles)
+            for name in ('start_sec', 'end_sec', 'duration', 'word_count', 'wpm'):
+                columns[name].extend(sub[name] for sub in subtitles)
+            texts.extend(sub['text'] for sub in subtitles)
+
+        text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+        return cls(
+            episodes,
+            np.asarray(episode_ptr, dtype=np.int64),
+            {name: np.asarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()},
+            ''.join(texts),
+            text_offsets
+        )
+
+    @classmethod
+    def from_files(cls, episode_files, min_duration=0.1):
+        """Construye la tabla parseando [(episodio, ruta SRT)]"""
+        table = cls.from_subtitles(
+            (episode, iter_srt(filepath, min_duration)) for episode, filepath in episode_files
+        )
+        logger.info(f"Subtitle table: {len(table)} cues from {len(table.episodes)} episodes")
+        return table
+
+    # Acceso a filas
+
+    def _episode_range(self, episode):
+        i = self.episodes.index(episode)
+        return int(self.episode_ptr[i]), int(self.episode_ptr[i + 1])
+
+    def _ranges(self, episode):
+        """Tramos (inicio, fin) de filas de un episodio o de todos"""
+        if episode is not None:
+            return [self._episode_range(episode)]
+        return [(int(self.episode_ptr[i]), int(self.episode_ptr[i + 1])) for i in range(len(self.episodes))]
+
+    def episode_of(self, rows):
+        """Episodio de cada fila"""
+        positions = np.searchsorted(self.episode_ptr, rows, side='right') - 1
+        return [self.episodes[i] for i in np.asarray(positions).tolist()]
+
+    def find_cues(self, episode, cue_ids):
+        """Filas de los subtítulos de un episodio con los números de SRT indicados (-1 si no existen)"""
+        first, last = self._episode_range(episode)
+        order = np.argsort(self.cue_id[first:last], kind='stable')
+        ids = self.cue_id[first:last][order]
+        cue_ids = np.asarray(cue_ids, dtype=ids.dtype)
+        if not len(ids):
+            return np.full(len(cue_ids), -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(ids, cue_ids), len(ids) - 1)
+        return np.where(ids[found] == cue_ids, first + order[found], -1)
+
+    def episode_columns(self, episode, names=tuple(COLUMNS)):
+        """Columnas de las filas de un episodio (vistas sobre la tabla, sin copia)"""
+        first, last = self._episode_range(episode)
+        return {name: getattr(self, name)[first:last] for name in names}
+
+    def text(self, row):
+        return self.text_buffer[self.text_offsets[row]:self.text_offsets[row + 1]]
+
+    def texts(self, rows):
+        offsets = self.text_offsets
+        return [self.text_buffer[offsets[row]:offsets[row + 1]] for row in np.asarray(rows).tolist()]
+
+    def to_dicts(self, rows):
+        """Filas en el formato de parse_srt, con su episodio"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return [
+            {
+                'episode': episode,
+                'id': int(self.cue_id[row]),
+                'start': format_timestamp(self.start_sec[row]),
+                'end': format_timestamp(self.end_sec[row]),
+                'text': text,
+                'duration': float(self.duration[row]),
+                'start_sec': float(self.start_sec[row]),
+                'end_sec': float(self.end_sec[row]),
+                'word_count': int(self.word_count[row]),
+                'wpm': int(self.wpm[row])
+            }
+            for row, episode, text in zip(rows.tolist(), self.episode_of(rows), self.texts(rows))
+        ]
+
+    # Consultas por tiempo
+
+    def between(self, start, end, episode=None):
+        """Filas de los subtítulos que empiezan en [start, end) (segundos)"""
+        found = []
+        for first, last in self._ranges(episode):
+            starts = self.start_sec[first:last]
+            lo = first + np.searchsorted(starts, start, side='left')
+            hi = first + np.searchsorted(starts, end, side='left')
+            found.append(np.arange(lo, hi))
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def overlapping(self, start, end, episode=None):
+        """Filas de los subtítulos que se solapan con el intervalo [start, end) (segundos)"""
+        found = []
+        for first, last in self._ranges(episode):
+            # Las filas antes de lo acaban (todas) antes de start; desde hi empiezan después de end
+            lo = first + np.searchsorted(self.max_end[first:last], start, side='right')
+            hi = first + np.searchsorted(self.start_sec[first:last], end, side='left')
+            candidates = np.arange(lo, max(lo, hi))
+            found.append(candidates[self.end_sec[candidates] > start])
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def overlapping_pairs(self, episode=None, min_overlap=0.0):
+        """
+        Pares (fila, fila) de subtítulos del mismo episodio que se solapan en
+        más de min_overlap segundos: diálogos simultáneos.
+        """
+        pairs = []
+        for first, last in self._ranges(episode):
+            starts = self.start_sec[first:last]
+            ends = self.end_sec[first:last]
+            # Los que empiezan antes de que acabe cada subtítulo (y después de él)
+            limit = np.searchsorted(starts, ends, side='left')
+            counts = np.maximum(limit - np.arange(1, len(starts) + 1), 0)
+            a = np.repeat(np.arange(len(starts)), counts)
+            b = a + 1 + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+            overlap = np.minimum(ends[a], ends[b]) - starts[b]
+            keep = overlap > min_overlap
+            pairs.append(np.stack((a[keep] + first, b[keep] + first), axis=1))
+        return np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+
+    def per_minute(self, column='word_count', episode=None, bin_seconds=60):
+        """
+        Suma de una columna (o número de subtítulos con column='cues') por
+        tramo de bin_seconds según el inicio de cada subtítulo. Devuelve
+        {episodio: array por tramo}.
+        """
+        if column != 'cues' and column not in COLUMNS:
+            raise ValueError(f"Unknown column {column!r} (options: cues, {', '.join(COLUMNS)})")
+        out = {}
+        for (first, last), name in zip(self._ranges(episode), [episode] if episode is not None else self.episodes):
+            bins = (self.start_sec[first:last] // bin_seconds).astype(np.int64)
+            weights = None if column == 'cues' else getattr(self, column)[first:last].astype(np.float64)
+            out[name] = np.bincount(bins, weights=weights, minlength=int(bins.max(initial=-1)) + 1)
+        return out
@@ -0,0 +1,149 @@
+import os
+import re
+import numpy as np
+import logging
+from collections import Counter
+from processing.srt_parser import parse_srt, format_timestamp
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z']+")
+
+# Encodings de los archivos generados y su probabilidad (con messy=True)
+MESSY_ENCODINGS = (('utf-8', 0.6), ('utf-8-sig', 0.15), ('cp1252', 0.15), ('utf-16', 0.1))
+
+# Ruido de los subtítulos reales: etiquetas, marcadores y caracteres no ASCII
+TAGS = (('<i>', '</i>'), ('<b>', '</b>'), ('<font color="#ffff00">', '</font>'))
+MARKERS = ('{\\an8}', '{\\i1}')
+ACCENTED = ('José', 'café', 'Mañana', 'señor', 'naïve', 'Zoë')
+
+
+def build_profile(episode_files):
+    """
+    Estadísticas de un corpus real [(episodio, ruta SRT)]: subtítulos por
+    episodio, duraciones, pausas entre subtítulos, palabras por subtítulo y
+    frecuencia de cada palabra.
+    """
+    cue_counts, durations, gaps, words_per_cue = [], [], [], []
+    vocabulary = Counter()
+    for _, filepath in episode_files:
+        subtitles = parse_srt(filepath)
+        cue_counts.append(len(subtitles))
+        for previous, sub in zip([None] + subtitles[:-1], subtitles):
+            tokens = TOKEN_PATTERN.findall(sub['text'])
+            vocabulary.update(tokens)
+            words_per_cue.append(len(tokens))
+            durations.append(sub['duration'])
+            if previous is not None:
+                gaps.append(sub['start_sec'] - previous['end_sec'])
+    if not cue_counts:
+        raise ValueError("Cannot build a corpus profile without episodes")
+
+    words, counts = zip(*vocabulary.most_common()) if vocabulary else (('word',), (1,))
+    return {
+        'cue_counts': cue_counts,
+        'durations': durations,
+        'gaps': gaps or [0.5],
+        'words_per_cue': words_per_cue,
+        'words': list(words),
+        'word_counts': list(counts)
+    }
+
+
+class SyntheticCorpus:
+    """
+    Generador de episodios SRT sintéticos con la forma de un corpus real
+    (ver build_profile): número de subtítulos, duraciones, pausas y palabras
+    por subtítulo se muestrean de las distribuciones observadas, y las
+    palabras siguen su frecuencia real.
+
+    Con messy=True se imitan los problemas de los archivos reales: varios
+    encodings (con y sin BOM, UTF-16), finales de línea CRLF, etiquetas HTML,
+    marcadores {\\an8}, números sueltos y subtítulos de dos líneas.
+    cue_scale escala el número de subtítulos por episodio (para corpus
+    grandes y rápidos).
+    """
+
+    def __init__(self, profile, seed=0, messy=True, cue_scale=1.0):
+        self.profile = profile
+        self.rng = np.random.default_rng(seed)
+        self.messy = messy
+        self.cue_scale = cue_scale
+        counts = np.asarray(profile['word_counts'], dtype=np.float64)
+        self.word_probs = counts / counts.sum()
+        self.words = np.asarray(profile['words'], dtype=object)
+        self.durations = np.asarray(profile['durations'], dtype=np.float64)
+        self.gaps = np.asarray(profile['gaps'], dtype=np.float64)
+        self.words_per_cue = np.asarray(profile['words_per_cue'], dtype=np.int64)
+
+    def _cue_text(self, words):
+        """Texto de un subtítulo a partir de sus palabras (con ruido si messy)"""
+        rng = self.rng
+        words = list(words) or ['Hmm']
+        words[0] = words[0][:1].upper() + words[0][1:]
+        if self.messy:
+            if rng.random() < 0.03:
+                words.insert(int(rng.integers(len(words) + 1)), str(int(rng.integers(1, 100))))
+            if rng.random() < 0.02:
+                words.insert(int(rng.integers(len(words) + 1)), ACCENTED[int(rng.integers(len(ACCENTED)))])
+        text = ' '.join(words) + ('.', '?', '!', '...', ',')[int(rng.integers(5))]
+        # Subtítulos largos en dos líneas
+        if len(words) > 6 and rng.random() < 0.6:
+            split = len(words) // 2
+            text = ' '.join(words[:split]) + '\n' + text.split(' ', split)[-1]
+        if self.messy:
+            if rng.random() < 0.05:
+                opening, closing = TAGS[int(rng.integers(len(TAGS)))]
+                text = f"{opening}{text}{closing}"
+            if rng.random() < 0.01:
+                text = MARKERS[int(rng.integers(len(MARKERS)))] + text
+        return text
+
+    def episode(self):
+        """Contenido SRT de un episodio sintético"""
+        rng = self.rng
+        n_cues = max(1, int(rng.choice(self.profile['cue_counts']) * self.cue_scale))
+        durations = rng.choice(self.durations, n_cues)
+        gaps = np.maximum(rng.choice(self.gaps, n_cues), 0.0)
+        starts = 5.0 + np.cumsum(gaps) + np.concatenate(([0.0], np.cumsum(durations)[:-1]))
+        sizes = np.maximum(rng.choice(self.words_per_cue, n_cues), 1)
+        tokens = self.words[rng.choice(len(self.words), int(sizes.sum()), p=self.word_probs)]
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+        blocks = []
+        for i in range(n_cues):
+            start, end = format_timestamp(starts[i]), format_timestamp(starts[i] + durations[i])
+            if self.messy and rng.random() < 0.02:
+                # Separador de milisegundos alternativo
+                start, end = start.replace(',', '.'), end.replace(',', '.')
+            blocks.append(f"{i + 1}\n{start} --> {end}\n{self._cue_text(tokens[offsets[i]:offsets[i + 1]])}\n")
+        return '\n'.join(blocks)
+
+    def write_episode(self, path):
+        """Escribe un episodio sintético en path con un encoding y final de línea aleatorios"""
+        content = self.episode()
+        encoding = 'utf-8'
+        if self.messy:
+            names, probs = zip(*MESSY_ENCODINGS)
+            encoding = names[int(self.rng.choice(len(names), p=probs))]
+            if self.rng.random() < 0.3:
+                content = content.replace('\n', '\r\n')
+        with open(path, 'w', encoding=encoding, errors='replace', newline='') as f:
+            f.write(content)
+        return encoding
+
+    def write_corpus(self, directory, n_episodes):
+        """Escribe n_episodes archivos episode_NNNNN.srt en directory; devuelve [(episodio, ruta)]"""
+        os.makedirs(directory, exist_ok=True)
+        width = max(2, len(str(n_episodes)))
+        episode_files = []
+        encodings = Counter()
+        for i in range(1, n_episodes + 1):
+            episode_num = f"{i:0{width}d}"
+            path = os.path.join(directory, f"episode_{episode_num}.srt")
+            encodings[self.write_episode(path)] += 1
+            episode_files.append((episode_num, path))
+        logger.info(f"Wrote {n_episodes} synthetic episodes to {directory} ({dict(encodings)})")
+        return episode_files
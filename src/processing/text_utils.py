@@ -1,40 +1,102 @@
 import re
 import os
-import nltk
-from nltk.stem import WordNetLemmatizer
-from nltk.corpus import wordnet
-from functools import lru_cache
+import time
+import atexit
 import logging
+import numpy as np
+from processing.vocabulary import StreamEncoder, ID_DTYPE
+from processing.lemma_store import LemmaStore, STORE_ENV
+from processing import instrumentation
+
+# NLTK (y sus corpus) se cargan de forma perezosa: importar este módulo no
+# toca la red ni el disco; los recursos se resuelven la primera vez que se
+# procesa texto y sólo una vez por proceso.
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'wordnet': 'corpora/wordnet',
+    'stopwords': 'corpora/stopwords',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+    'omw-1.4': 'corpora/omw-1.4'
+}
 
-def download_nltk_resources():
-    resources = {
-        'punkt': 'tokenizers/punkt',
-        'wordnet': 'corpora/wordnet',
-        'stopwords': 'corpora/stopwords',
-        'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
-        'omw-1.4': 'corpora/omw-1.4'
-    }
+# Desde NLTK 3.9 word_tokenize carga punkt_tab y PerceptronTagger
+# averaged_perceptron_tagger_eng en lugar de los recursos antiguos
+NLTK_39_RESOURCES = {
+    'punkt': ('punkt_tab', 'tokenizers/punkt_tab'),
+    'averaged_perceptron_tagger': ('averaged_perceptron_tagger_eng', 'taggers/averaged_perceptron_tagger_eng')
+}
+
+# Recursos que sólo usan análisis opcionales (no se resuelven por defecto)
+OPTIONAL_NLTK_RESOURCES = {
+    'vader_lexicon': 'sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt'
+}
+
+# Con FROM_NLTK_OFFLINE=1 nunca se descarga nada: un recurso ausente es un error inmediato
+OFFLINE_ENV = 'FROM_NLTK_OFFLINE'
+
+# Etiquetas POS de WordNet (valores de nltk.corpus.wordnet.NOUN, VERB, ADJ, ADV)
+WN_NOUN, WN_VERB, WN_ADJ, WN_ADV = 'n', 'v', 'a', 'r'
+
+_resolved_resources = set()
+
+def is_offline():
+    """Indica si está activo el modo sin conexión"""
+    return os.environ.get(OFFLINE_ENV, '').lower() in ('1', 'true', 'yes')
+
+def nltk_resource_paths(names=None):
+    """
+    [(nombre, ruta)] de los recursos indicados (por defecto los de
+    NLTK_RESOURCES) con los nombres que usa la versión de NLTK instalada
+    (ver NLTK_39_RESOURCES)
+    """
+    version = tuple(int(part) for part in re.findall(r'\d+', nltk_version())[:2])
+    renamed = NLTK_39_RESOURCES if not version or version >= (3, 9) else {}
+    paths = []
+    for name in (NLTK_RESOURCES if names is None else names):
+        paths.append(renamed.get(name) or (name, NLTK_RESOURCES.get(name) or OPTIONAL_NLTK_RESOURCES[name]))
+    return paths
+
+def ensure_nltk_resources(names=None, offline=None):
+    """
+    Comprueba (y si falta, descarga) los recursos NLTK indicados; por defecto
+    todos los de NLTK_RESOURCES, con los nombres de la versión de NLTK
+    instalada (ver nltk_resource_paths). Cada recurso se resuelve una sola vez
+    por proceso. En modo sin conexión un recurso ausente lanza LookupError.
+    """
+    import nltk
     
-    for resource, path in resources.items():
+    offline = is_offline() if offline is None else offline
+    for name, path in nltk_resource_paths(names):
+        if name in _resolved_resources:
+            continue
         try:
             nltk.data.find(path)
         except LookupError:
-            nltk.download(resource, quiet=True)
+            if offline:
+                raise LookupError(
+                    f"Recurso NLTK '{name}' no disponible y el modo sin conexión está activo "
+                    f"({OFFLINE_ENV}); instálalo con nltk.download('{name}')"
+                )
+            logger.warning(f"Descargando recurso faltante: {name}")
+            nltk.download(name, quiet=True)
+        _resolved_resources.add(name)
 
-# Llama a la función al inicio
-download_nltk_resources()
-
-lemmatizer = WordNetLemmatizer()
-stopwords = set(nltk.corpus.stopwords.words('english'))
+def download_nltk_resources():
+    """Resuelve todos los recursos NLTK del pipeline (compatibilidad)"""
+    ensure_nltk_resources()
 
 # Cargar stopwords adicionales
 def load_custom_stopwords():
     """Carga stopwords personalizadas"""
+    from nltk.corpus import stopwords as stopwords_corpus
+    
+    ensure_nltk_resources(['stopwords'])
+    stopwords = set(stopwords_corpus.words('english'))
     custom_stopwords = set()
     script_dir = os.path.dirname(os.path.abspath(__file__))
     stopwords_file = os.path.join(script_dir, "stopwords.txt")
@@ -50,37 +112,125 @@ def load_custom_stopwords():
     tv_stopwords = {'im', 'dont', 'youre', 'hes', 'shes', 'thats', 'whats', 'theres', 'ill', 'ive', 'theyre', 'wanna', 'gonna', 'gotta'}
     return stopwords.union(custom_stopwords).union(tv_stopwords)
 
-# Precarga en memoria
-STOP_WORDS = load_custom_stopwords()
-logger.info(f"Loaded {len(STOP_WORDS)} stopwords")
+_stop_words = None
+
+def get_stop_words():
+    """Conjunto de stopwords (se carga una sola vez por proceso)"""
+    global _stop_words
+    if _stop_words is None:
+        _stop_words = frozenset(load_custom_stopwords())
+        logger.info(f"Loaded {len(_stop_words)} stopwords")
+    return _stop_words
+
+_lemmatizer = None
+
+def get_lemmatizer():
+    """Instancia única del WordNetLemmatizer"""
+    global _lemmatizer
+    if _lemmatizer is None:
+        from nltk.stem import WordNetLemmatizer
+        ensure_nltk_resources(['wordnet', 'omw-1.4'])
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer
+
+def __getattr__(name):
+    # Atributos antiguos del módulo, ahora perezosos
+    if name == 'STOP_WORDS':
+        return get_stop_words()
+    if name == 'lemmatizer':
+        return get_lemmatizer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_nltk_version = None
+
+def nltk_version():
+    """Versión de NLTK instalada (sin importar el paquete; se lee una sola vez por proceso)"""
+    global _nltk_version
+    if _nltk_version is None:
+        from importlib.metadata import version, PackageNotFoundError
+        try:
+            _nltk_version = version('nltk')
+        except PackageNotFoundError:
+            _nltk_version = 'unknown'
+    return _nltk_version
 
 # Regex precompiladas - SOLO PALABRAS ALFABÉTICAS
 WORD_PATTERN = re.compile(r"\b[a-zA-Z']{3,}\b")  # Palabras de 3+ letras (con apóstrofes)
 
+# Versión del pipeline de tokenización/lematización (incrementar al cambiar su lógica)
+PIPELINE_VERSION = 4
+
+# Modos de procesamiento: 'accurate' (word_tokenize + POS tagging) o 'fast'
+# (regex + tabla palabra→lema precalculada, sin POS tagging)
+MODES = ('accurate', 'fast')
+DEFAULT_MODE = 'accurate'
+
+# Tokenizador del modo rápido: sólo letras; las contracciones se separan como
+# en word_tokenize ("don't" → "do", "John's" → "John")
+FAST_TOKEN_PATTERN = re.compile(r"[A-Za-z]+?(?=n't\b)|[A-Za-z]+")
+
+def check_mode(mode):
+    """Valida el modo de procesamiento"""
+    if mode not in MODES:
+        raise ValueError(f"Modo de procesamiento desconocido: {mode!r} (opciones: {', '.join(MODES)})")
+    return mode
+
+# Recursos NLTK de cada modo: el rápido no tokeniza con punkt ni etiqueta POS
+MODE_NLTK_RESOURCES = {
+    'accurate': tuple(NLTK_RESOURCES),
+    'fast': ('wordnet', 'stopwords', 'omw-1.4')
+}
+
+def nltk_resources_for(mode=DEFAULT_MODE):
+    """Recursos NLTK que necesita el modo de procesamiento (para ensure_nltk_resources)"""
+    return MODE_NLTK_RESOURCES[check_mode(mode)]
+
+def pipeline_config(mode=DEFAULT_MODE):
+    """Describe la configuración del tokenizador/lematizador (usada como clave de caché)"""
+    if check_mode(mode) == 'fast':
+        return {
+            'version': PIPELINE_VERSION,
+            'mode': mode,
+            'nltk': nltk_version(),
+            'tokenizer': 'regex',
+            'tagger': None,
+            'lemmatizer': 'wordnet_table',
+            'word_pattern': FAST_TOKEN_PATTERN.pattern,
+            'min_length': 3
+        }
+    return {
+        'version': PIPELINE_VERSION,
+        'nltk': nltk_version(),
+        'tokenizer': 'word_tokenize',
+        'tagger': 'averaged_perceptron_tagger',
+        'lemmatizer': 'wordnet',
+        'word_pattern': WORD_PATTERN.pattern,
+        'min_length': 3
+    }
+
 # Mapeo POS mejorado
 def get_wordnet_pos(treebank_tag):
     """Obtiene POS tag simplificado para lematización"""
     if treebank_tag.startswith('J'):
-        return wordnet.ADJ
+        return WN_ADJ
     elif treebank_tag.startswith('V'):
-        return wordnet.VERB
+        return WN_VERB
     elif treebank_tag.startswith('N'):
-        return wordnet.NOUN
+        return WN_NOUN
     elif treebank_tag.startswith('R'):
-        return wordnet.ADV
+        return WN_ADV
     else:
-        return wordnet.NOUN  # Por defecto sustantivo
+        return WN_NOUN  # Por defecto sustantivo
 
-# Lematización con caché y POS tagging
-@lru_cache(maxsize=10000)
-def cached_lemmatize(word, pos=wordnet.NOUN):
+# Lematización con POS tagging (sin caché)
+def _lemmatize_word(word, pos=WN_NOUN):
     """Lematización con POS tagging"""
     # Excluir palabras numéricas
     if word.isdigit():
         return None
     
     try:
-        lemma = lemmatizer.lemmatize(word.lower(), pos)
+        lemma = get_lemmatizer().lemmatize(word.lower(), pos)
         # Asegurar que el lema sea alfabético
         if lemma.isalpha():
             return lemma
@@ -88,106 +238,343 @@ def cached_lemmatize(word, pos=wordnet.NOUN):
     except:
         return None
 
-# Tokenización y lematización mejorada
-def tokenize_and_lemmatize(text):
-    """Procesamiento de texto con POS tagging y filtrado numérico"""
-    # 1. Verificar recursos NLTK
-    required_resources = ['punkt', 'averaged_perceptron_tagger']
-    for resource in required_resources:
-        try:
-            nltk.data.find(f'tokenizers/{resource}' if resource == 'punkt' else f'taggers/{resource}')
-        except LookupError:
-            logger.warning(f"Descargando recurso faltante: {resource}")
-            nltk.download(resource, quiet=True)
+# Almacén de lemas compartido (se abre una sola vez por proceso)
+_lemma_store = None
+
+def get_lemma_store():
+    """
+    Almacén (palabra, POS) → lema del proceso. Es persistente y compartido
+    entre procesos si se configuró un directorio (configure_lemma_store o la
+    variable de entorno FROM_LEMMA_STORE); si no, sólo vive en memoria.
+    """
+    global _lemma_store
+    if _lemma_store is None:
+        _lemma_store = LemmaStore(_lemmatize_word, os.environ.get(STORE_ENV) or None, version=nltk_version())
+        atexit.register(_lemma_store.flush)
+    return _lemma_store
+
+def configure_lemma_store(path):
+    """Usa el directorio indicado como almacén de lemas (None para desactivar la persistencia)"""
+    global _lemma_store
+    if _lemma_store is not None:
+        _lemma_store.flush()
+    # Se publica en el entorno para que lo hereden los procesos del pool
+    if path:
+        os.environ[STORE_ENV] = path
+    else:
+        os.environ.pop(STORE_ENV, None)
+    _lemma_store = None
+    return get_lemma_store()
+
+def flush_lemma_store():
+    """Guarda en disco los lemas calculados por este proceso (y los volcados por los workers)"""
+    return get_lemma_store().flush()
+
+def spill_lemma_store():
+    """Vuelca los lemas nuevos de este worker a su shard (ver LemmaStore.spill)"""
+    return get_lemma_store().spill()
+
+def lemma_store_stats():
+    """Aciertos/fallos del almacén de lemas en este proceso"""
+    return get_lemma_store().stats()
+
+def prewarm_lemma_store(texts):
+    """
+    Precalcula los lemas de todas las palabras de los textos para cada POS
+    de WordNet, de modo que el procesamiento posterior sólo tenga aciertos.
+    """
+    stop_words = get_stop_words()
+    words = set()
+    for text in texts:
+        for match in FAST_TOKEN_PATTERN.finditer(text):
+            word = match.group().lower()
+            if len(word) >= 3 and word not in stop_words:
+                words.add(word)
+    computed = get_lemma_store().prewarm(words, (WN_NOUN, WN_VERB, WN_ADJ, WN_ADV))
+    logger.info(f"Lemma store prewarmed: {len(words)} words, {computed} new entries")
+    return computed
+
+def cached_lemmatize(word, pos=WN_NOUN):
+    """Lematización con POS tagging, consultando el almacén de lemas"""
+    return get_lemma_store().lemmatize(word, pos)
+
+def _lemmatize_tagged(pos_tags):
+    """Filtra y lematiza una secuencia de pares (token, etiqueta POS)"""
+    stop_words = get_stop_words()
+    lemmatized = []
+    for word, tag in pos_tags:
+        word_lower = word.lower()
+        
+        # Filtros clave
+        if (word_lower in stop_words or 
+            len(word) < 3 or 
+            word.isdigit() or 
+            not word.isalpha()):
+            continue
+        
+        # Lematizar con POS específico
+        wn_pos = get_wordnet_pos(tag)
+        lemma = cached_lemmatize(word_lower, wn_pos)
+        
+        if lemma and lemma.isalpha() and len(lemma) > 2:
+            lemmatized.append(lemma)
     
-    # 2. Tokenización segura con doble verificación
-    tokens = []
+    return lemmatized
+
+def _safe_tokenize(text):
+    """Tokenización con alternativa regex si NLTK falla"""
     try:
-        tokens = nltk.word_tokenize(text)
+        from nltk import word_tokenize
+        return word_tokenize(text)
     except Exception as e:
         logger.error(f"Tokenización fallida: {str(e)} - Usando alternativa regex")
-        tokens = re.findall(r"\b[a-zA-Z']{3,}\b", text)
+        return re.findall(r"\b[a-zA-Z']{3,}\b", text)
+
+# Tokenización y lematización mejorada
+def tokenize_and_lemmatize(text, mode=DEFAULT_MODE):
+    """Procesamiento de texto con POS tagging y filtrado numérico (ver MODES)"""
+    if check_mode(mode) == 'fast':
+        return fast_tokenize_and_lemmatize(text)
+    
+    # 1. Verificar recursos NLTK (sólo la primera vez en el proceso)
+    ensure_nltk_resources(['punkt', 'averaged_perceptron_tagger'])
+    
+    # 2. Tokenización segura con doble verificación
+    tokens = _safe_tokenize(text)
     
     # 3. POS Tagging con manejo de errores
     pos_tags = []
     try:
-        pos_tags = nltk.pos_tag(tokens)
+        pos_tags = get_tagger().tag(tokens)
     except Exception as e:
         logger.error(f"POS Tagging fallido: {str(e)} - Continuando sin POS")
         pos_tags = [(token, '') for token in tokens]
     
     # 4. Lematización con filtrado
+    return _lemmatize_tagged(pos_tags)
+
+# Tabla palabra→lema del modo rápido (se construye una sola vez por proceso)
+_lemma_table = None
+
+def get_lemma_table():
+    """
+    Tabla palabra→lema precalculada a partir de las listas de excepciones de
+    WordNet (formas irregulares, con prioridad verbo > sustantivo > adjetivo >
+    adverbio). Las palabras regulares se resuelven en fast_lemmatize y se
+    añaden a la tabla la primera vez que aparecen.
+    """
+    global _lemma_table
+    if _lemma_table is None:
+        from nltk.corpus import wordnet
+        ensure_nltk_resources(['wordnet', 'omw-1.4'])
+        wordnet.ensure_loaded()
+        table = {}
+        for pos in (wordnet.VERB, wordnet.NOUN, wordnet.ADJ, wordnet.ADV):
+            for inflected, bases in wordnet._exception_map[pos].items():
+                if bases:
+                    table.setdefault(inflected, bases[0])
+        _lemma_table = table
+        logger.info(f"Loaded {len(table)} lemma table entries")
+    return _lemma_table
+
+def fast_lemmatize(word):
+    """Lema de una palabra en minúsculas sin POS: tabla, luego sustantivo y luego verbo"""
+    table = get_lemma_table()
+    lemma = table.get(word)
+    if lemma is None:
+        lemma = cached_lemmatize(word, WN_NOUN) or word
+        if lemma == word:
+            lemma = cached_lemmatize(word, WN_VERB) or word
+        table[word] = lemma
+    return lemma
+
+def fast_tokenize_and_lemmatize(text):
+    """Modo rápido: tokenización regex y tabla de lemas, sin POS tagging"""
+    stop_words = get_stop_words()
     lemmatized = []
-    for word, tag in pos_tags:
-        word_lower = word.lower()
-        
-        # Filtros clave
-        if (word_lower in STOP_WORDS or 
-            len(word) < 3 or 
-            word.isdigit() or 
-            not word.isalpha()):
+    for match in FAST_TOKEN_PATTERN.finditer(text):
+        word_lower = match.group().lower()
+        if len(word_lower) < 3 or word_lower in stop_words:
             continue
         
-        # Lematizar con POS específico
-        wn_pos = get_wordnet_pos(tag)
-        lemma = cached_lemmatize(word_lower, wn_pos)
-        
-        if lemma and lemma.isalpha() and len(lemma) > 2:
+        lemma = fast_lemmatize(word_lower)
+        if lemma.isalpha() and len(lemma) > 2:
             lemmatized.append(lemma)
     
     return lemmatized
 
+# Etiquetador compartido (se carga una sola vez por proceso)
+_tagger = None
+
+def get_tagger():
+    """Instancia única del etiquetador POS de NLTK"""
+    global _tagger
+    if _tagger is None:
+        from nltk.tag import PerceptronTagger
+        ensure_nltk_resources(['punkt', 'averaged_perceptron_tagger'])
+        _tagger = PerceptronTagger()
+    return _tagger
+
+BATCH_SIZE = 512  # Subtítulos por lote de etiquetado
+
+def tokenize_and_lemmatize_batch(texts, batch_size=BATCH_SIZE, mode=DEFAULT_MODE):
+    """
+    Versión por lotes de tokenize_and_lemmatize.
+    Acepta textos o subtítulos (diccionarios con 'text'), etiqueta cada lote de
+    frases con una única instancia del etiquetador (tag_sents) y devuelve la
+    lista de lemas de cada entrada, en el mismo orden. No comprueba recursos
+    en cada llamada. En modo 'fast' no hay etiquetado y cada entrada se procesa
+    directamente.
+    """
+    if check_mode(mode) == 'fast':
+        with instrumentation.stage('fast_tokenize_and_lemmatize'):
+            results = [
+                fast_tokenize_and_lemmatize(item['text'] if isinstance(item, dict) else item)
+                for item in texts
+            ]
+        instrumentation.count('lemmas', sum(len(lemmas) for lemmas in results))
+        return results
+    
+    results = []
+    batch = []
+    
+    def flush():
+        with instrumentation.stage('tokenize'):
+            tokenized = [_safe_tokenize(text) for text in batch]
+        instrumentation.count('tokens', sum(len(tokens) for tokens in tokenized))
+        with instrumentation.stage('pos_tag'):
+            try:
+                tagged = get_tagger().tag_sents(tokenized)
+            except Exception as e:
+                logger.error(f"POS Tagging fallido: {str(e)} - Continuando sin POS")
+                tagged = [[(token, '') for token in tokens] for tokens in tokenized]
+        with instrumentation.stage('lemmatize'):
+            lemmatized = [_lemmatize_tagged(pos_tags) for pos_tags in tagged]
+        instrumentation.count('lemmas', sum(len(lemmas) for lemmas in lemmatized))
+        results.extend(lemmatized)
+        batch.clear()
+    
+    for item in texts:
+        batch.append(item['text'] if isinstance(item, dict) else item)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    
+    return results
+
+def measure_batch_throughput(texts, batch_size=BATCH_SIZE):
+    """
+    Compara el rendimiento de tokenize_and_lemmatize (un texto por llamada)
+    con tokenize_and_lemmatize_batch sobre los mismos textos.
+    Devuelve textos por segundo de cada camino, la aceleración, si las
+    salidas coinciden y si se pudo cargar el etiquetador.
+    """
+    texts = [item['text'] if isinstance(item, dict) else item for item in texts]
+    # Excluir la carga del modelo de la medición; sin etiquetador, ambos
+    # caminos continúan sin POS y se miden igualmente
+    try:
+        get_tagger()
+        tagger = True
+    except Exception as e:
+        logger.error(f"POS Tagging fallido: {str(e)} - Continuando sin POS")
+        tagger = False
+
+    start = time.perf_counter()
+    single = [tokenize_and_lemmatize(text) for text in texts]
+    single_secs = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    batched = tokenize_and_lemmatize_batch(texts, batch_size)
+    batch_secs = time.perf_counter() - start
+    
+    stats = {
+        'texts': len(texts),
+        'single_per_sec': len(texts) / single_secs if single_secs else 0.0,
+        'batch_per_sec': len(texts) / batch_secs if batch_secs else 0.0,
+        'speedup': single_secs / batch_secs if batch_secs else 0.0,
+        'identical': single == batched,
+        'tagger': tagger
+    }
+    logger.info(
+        f"Tokenization throughput: {stats['single_per_sec']:.0f} texts/s single, "
+        f"{stats['batch_per_sec']:.0f} texts/s batched ({stats['speedup']:.1f}x)"
+    )
+    return stats
+
+def _empty_file_stats(file_path):
+    return {
+        'file': os.path.basename(file_path),
+        'total_words': 0,
+        'unique_words': 0,
+        'lexical_density': 0.0,
+        'words': [],
+        'token_ids': np.zeros(0, dtype=ID_DTYPE)
+    }
+
 # Función para procesar archivos .srt
-def process_srt_file(file_path):
-    """Procesa un archivo .srt y devuelve estadísticas"""
+def process_srt_file(file_path, mode=DEFAULT_MODE):
+    """
+    Procesa un archivo .srt y devuelve estadísticas.
+    El texto lematizado se devuelve codificado: 'words' es el vocabulario del
+    archivo y 'token_ids' la secuencia de tokens como array uint32.
+    """
     try:
         with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
             content = f.read()
         
         # Extraer textos de subtítulos
-        full_text = ' '.join(re.findall(r'\d+\n\d{2}:\d{2}:\d{2},\d{3} --> \d{2}:\d{2}:\d{2},\d{3}\n([^\n]+)', content))
+        cue_texts = re.findall(r'\d+\n\d{2}:\d{2}:\d{2},\d{3} --> \d{2}:\d{2}:\d{2},\d{3}\n([^\n]+)', content)
         
-        if not full_text:
-            return {
-                'file': os.path.basename(file_path),
-                'total_words': 0,
-                'unique_words': 0,
-                'lexical_density': 0.0,
-                'content': ""
-            }
+        if not cue_texts:
+            return _empty_file_stats(file_path)
         
-        # Procesamiento de texto
-        processed_words = tokenize_and_lemmatize(full_text)
-        unique_count = len(set(processed_words))
-        total_count = len(processed_words)
+        # Procesamiento de texto (por lotes de subtítulos)
+        encoder = StreamEncoder()
+        for lemmas in tokenize_and_lemmatize_batch(cue_texts, mode=mode):
+            encoder.extend(lemmas)
+        unique_count = len(encoder.vocabulary)
+        total_count = len(encoder)
         
         return {
             'file': os.path.basename(file_path),
             'total_words': total_count,
             'unique_words': unique_count,
             'lexical_density': unique_count / total_count if total_count else 0.0,
-            'content': ' '.join(processed_words)
+            'words': encoder.vocabulary.words,
+            'token_ids': encoder.ids
         }
     
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
-        return {
-            'file': os.path.basename(file_path),
-            'total_words': 0,
-            'unique_words': 0,
-            'lexical_density': 0.0,
-            'content': ""
-        }
+        return _empty_file_stats(file_path)
+
+def _process_srt_file_in_worker(file_path, mode=DEFAULT_MODE):
+    """process_srt_file en un worker del pool: los lemas nuevos van a su shard del almacén"""
+    stats = process_srt_file(file_path, mode)
+    spill_lemma_store()
+    return stats
 
 # Procesamiento por lotes
-def process_srt_directory(directory):
-    """Procesa todos los archivos .srt en un directorio"""
-    results = []
-    for filename in os.listdir(directory):
-        if filename.lower().endswith('.srt'):
-            file_path = os.path.join(directory, filename)
-            results.append(process_srt_file(file_path))
+def process_srt_files(file_paths, mode=DEFAULT_MODE, jobs=1):
+    """Procesa una lista de archivos .srt, repartidos entre jobs procesos si jobs > 1"""
+    if jobs and jobs > 1 and len(file_paths) > 1:
+        from functools import partial
+        with instrumentation.process_pool(min(jobs, len(file_paths))) as executor:
+            results = instrumentation.pool_map(executor, partial(_process_srt_file_in_worker, mode=mode), file_paths)
+    else:
+        results = [process_srt_file(file_path, mode) for file_path in file_paths]
+    flush_lemma_store()
     
     # Generar reporte
     logger.info(f"Processed {len(results)} files")
-    return results
\ No newline at end of file
+    return results
+
+def process_srt_directory(directory, mode=DEFAULT_MODE, jobs=1):
+    """Procesa todos los archivos .srt en un directorio"""
+    file_paths = [
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.lower().endswith('.srt')
+    ]
+    return process_srt_files(file_paths, mode, jobs)
\ No newline at end of file
@@ -0,0 +1,88 @@
+import numpy as np
+from array import array
+
+ID_DTYPE = np.uint32
+
+
+class Vocabulary:
+    """
+    Vocabulario del corpus: asigna a cada lema un identificador entero denso.
+
+    Los identificadores se asignan por orden de primera aparición, de modo que
+    recorrer el vocabulario por ID reproduce el orden de inserción de los
+    antiguos diccionarios de conteo.
+    """
+
+    def __init__(self, words=()):
+        self.words = []
+        self.index = {}
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def add(self, word):
+        """Devuelve el ID del lema, añadiéndolo si no existe"""
+        word_id = self.index.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.index[word] = word_id
+            self.words.append(word)
+        return word_id
+
+    def get(self, word, default=None):
+        """ID de un lema sin añadirlo"""
+        return self.index.get(word, default)
+
+    def encode(self, words):
+        """Convierte una secuencia de lemas en un array de IDs (añadiendo los nuevos)"""
+        add = self.add
+        return np.fromiter((add(word) for word in words), dtype=ID_DTYPE)
+
+    def decode(self, ids):
+        """Convierte un array de IDs en la lista de lemas"""
+        words = self.words
+        return [words[i] for i in np.asarray(ids).tolist()]
+
+    def counts(self, ids):
+        """Frecuencia de cada ID del vocabulario en un array de IDs"""
+        return np.bincount(np.asarray(ids, dtype=np.intp), minlength=len(self.words))
+
+    def merge(self, words):
+        """
+        Incorpora los lemas de otro vocabulario (en su orden) y devuelve el array
+        que traduce sus IDs locales a IDs de este vocabulario.
+        """
+        return self.encode(words)
+
+
+class StreamEncoder:
+    """Codifica un flujo de lemas en un vocabulario local con almacenamiento compacto (4 bytes/token)"""
+
+    def __init__(self):
+        self.vocabulary = Vocabulary()
+        self._ids = array('I')
+
+    def extend(self, words):
+        add = self.vocabulary.add
+        self._ids.extend(add(word) for word in words)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def ids(self):
+        return np.frombuffer(self._ids, dtype=ID_DTYPE) if self._ids else np.zeros(0, dtype=ID_DTYPE)
+
+
+def word_count_from_ids(words, ids):
+    """Conteo {lema: frecuencia} en el orden del vocabulario, calculado con np.bincount"""
+    counts = np.bincount(np.asarray(ids, dtype=np.intp), minlength=len(words))
+    return {word: count for word, count in zip(words, counts.tolist()) if count}
@@ -0,0 +1,168 @@
+import numpy as np
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+GRID_STEP = 4  # Píxeles por celda de la rejilla de ocupación
+
+
+def mask_to_cells(mask, step=GRID_STEP, margin=1):
+    """
+    Reduce una máscara de píxeles (True = ocupado) a celdas de step × step
+    píxeles; una celda queda ocupada si contiene algún píxel. margin añade un
+    borde de celdas libres alrededor (separación entre palabras).
+    """
+    mask = np.asarray(mask, dtype=bool)
+    h, w = mask.shape
+    rows, cols = -(-h // step), -(-w // step)
+    padded = np.zeros((rows * step, cols * step), dtype=bool)
+    padded[:h, :w] = mask
+    cells = padded.reshape(rows, step, cols, step).any(axis=(1, 3))
+    if margin:
+        cells = np.pad(cells, margin)
+    return cells
+
+
+def cells_shape(bbox, step=GRID_STEP, margin=1):
+    """Forma en celdas (con margen) de una caja (x0, y0, x1, y1), igual a la de mask_to_cells"""
+    h, w = max(1, bbox[3] - bbox[1]), max(1, bbox[2] - bbox[0])
+    return -(-h // step) + 2 * margin, -(-w // step) + 2 * margin
+
+
+class OccupancyGrid:
+    """
+    Rejilla de ocupación para colocar palabras sin solaparse.
+
+    La imagen se divide en celdas de GRID_STEP píxeles; cada palabra marca
+    sólo las celdas que cubren sus píxeles (máscara del glifo), no su caja
+    completa, por lo que otras palabras pueden ocupar los huecos. La tabla de
+    sumas acumuladas (imagen integral) permite saber en O(1) si un rectángulo
+    está libre, y find_position recorre las posiciones por bloques con NumPy
+    desde el centro hacia fuera.
+
+    shape_mask (opcional, en píxeles) restringe la nube a una forma: True
+    donde se pueden colocar palabras.
+    """
+
+    def __init__(self, width, height, step=GRID_STEP, border=10, shape_mask=None):
+        self.width = width
+        self.height = height
+        self.step = step
+        self.rows = height // step
+        self.cols = width // step
+        self.grid = np.zeros((self.rows, self.cols), dtype=np.uint8)
+
+        # Márgenes de la imagen
+        b = -(-border // step)
+        if b:
+            self.grid[:b, :] = 1
+            self.grid[-b:, :] = 1
+            self.grid[:, :b] = 1
+            self.grid[:, -b:] = 1
+
+        # Forma: las celdas fuera de la máscara se consideran ocupadas
+        if shape_mask is not None:
+            allowed = np.asarray(shape_mask, dtype=bool)
+            if allowed.shape != (height, width):
+                raise ValueError(f"shape_mask must be {height}x{width}, got {allowed.shape[0]}x{allowed.shape[1]}")
+            blocked = ~allowed[:self.rows * step, :self.cols * step]
+            self.grid |= blocked.reshape(self.rows, step, self.cols, step).any(axis=(1, 3))
+
+        self.integral = np.zeros((self.rows + 1, self.cols + 1), dtype=np.int32)
+        self.integral[1:, 1:] = self.grid.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+
+        # Celdas ordenadas por distancia al centro (orden de búsqueda) y, por
+        # tamaño de rectángulo, cuántas de ellas ya se sabe que están ocupadas
+        center_row, center_col = (self.rows - 1) / 2.0, (self.cols - 1) / 2.0
+        rows_idx, cols_idx = np.indices((self.rows, self.cols))
+        order = np.argsort(((rows_idx - center_row) ** 2 + (cols_idx - center_col) ** 2).ravel(), kind='stable')
+        self._order_rows = (order // self.cols).astype(np.int64)
+        self._order_cols = (order % self.cols).astype(np.int64)
+        self._cursors = {}
+
+    def is_free(self, row, col, rows, cols):
+        """Indica en O(1) si el rectángulo de celdas está libre"""
+        if row < 0 or col < 0 or row + rows > self.rows or col + cols > self.cols:
+            return False
+        I = self.integral
+        return (I[row + rows, col + cols] - I[row, col + cols] - I[row + rows, col] + I[row, col]) == 0
+
+    def find_position(self, rows, cols):
+        """
+        Posición (fila, columna) de la esquina de un rectángulo libre de
+        rows × cols celdas cuyo centro está lo más cerca posible del centro de
+        la imagen; None si no cabe en ningún sitio.
+
+        Los centros se prueban en orden de distancia, por bloques y con cuatro
+        consultas a la imagen integral por posición. Como la rejilla sólo se
+        llena, una posición ocupada para un tamaño lo seguirá estando, también
+        para cualquier rectángulo mayor centrado en el mismo punto: cada tamaño
+        guarda un cursor que sólo avanza y que arranca desde el de los tamaños
+        menores ya vistos.
+        """
+        if rows > self.rows or cols > self.cols:
+            return None
+        size = (rows, cols)
+        cursor = self._cursors.get(size)
+        if cursor is None:
+            cursor = max((k for (r, c), k in self._cursors.items() if r <= rows and c <= cols), default=0)
+
+        I = self.integral
+        total = len(self._order_rows)
+        chunk = 256
+        while cursor < total:
+            end = min(total, cursor + chunk)
+            top = self._order_rows[cursor:end] - rows // 2
+            left = self._order_cols[cursor:end] - cols // 2
+            valid = (top >= 0) & (left >= 0) & (top <= self.rows - rows) & (left <= self.cols - cols)
+            t = np.clip(top, 0, self.rows - rows)
+            l = np.clip(left, 0, self.cols - cols)
+            sums = I[t + rows, l + cols] - I[t, l + cols] - I[t + rows, l] + I[t, l]
+            free = valid & (sums == 0)
+            if free.any():
+                i = int(np.argmax(free))
+                self._cursors[size] = cursor + i
+                return int(top[i]), int(left[i])
+            cursor = end
+            chunk *= 2
+
+        self._cursors[size] = total
+        return None
+
+    def place(self, cells, row, col):
+        """Marca como ocupadas las celdas de la máscara y actualiza la imagen integral"""
+        rows, cols = cells.shape
+        region = self.grid[row:row + rows, col:col + cols]
+        added = np.asarray(cells, dtype=bool) & (region == 0)
+        if not added.any():
+            return
+        region |= added
+
+        # Sólo cambian las sumas por debajo y a la derecha de la posición
+        partial = added.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+        I = self.integral
+        I[row + 1:row + rows + 1, col + 1:col + cols + 1] += partial
+        I[row + rows + 1:, col + 1:col + cols + 1] += partial[-1]
+        I[row + 1:row + rows + 1, col + cols + 1:] += partial[:, -1:]
+        I[row + rows + 1:, col + cols + 1:] += partial[-1, -1]
+
+
+def layout_words(items, width, height, step=GRID_STEP, border=10, shape_mask=None):
+    """
+    Coloca una secuencia de (clave, máscara de píxeles) por orden, devolviendo
+    {clave: (x, y)} con la esquina superior izquierda de cada máscara en
+    píxeles. Las que no caben se omiten.
+    """
+    grid = OccupancyGrid(width, height, step=step, border=border, shape_mask=shape_mask)
+    positions = {}
+    for key, mask in items:
+        cells = mask_to_cells(mask, step)
+        position = grid.find_position(*cells.shape)
+        if position is None:
+            continue
+        grid.place(cells, *position)
+        # Se descuenta el margen de una celda añadido por mask_to_cells
+        positions[key] = ((position[1] + 1) * step, (position[0] + 1) * step)
+    return positions
@@ -0,0 +1,92 @@
+import sys
+import math
+import time
+import random
+import numpy as np
+from visualization.placement import layout_words
+
+
+def synthetic_boxes(n_words, seed=0, min_height=8, max_height=60):
+    """Cajas (ancho, alto) con reparto tipo Zipf, como las palabras de una nube"""
+    rng = random.Random(seed)
+    boxes = []
+    for rank in range(1, n_words + 1):
+        height = max(min_height, int(max_height / rank ** 0.5))
+        width = int(height * rng.uniform(2.0, 6.0))
+        boxes.append((width, height))
+    return boxes
+
+
+def spiral_layout(boxes, width, height):
+    """Colocación anterior de generate_wordcloud: espiral con comprobación contra todas las cajas"""
+    positions = []
+    placed_count = 0
+    center_x, center_y = width // 2, height // 2
+    max_radius = min(width, height) // 3
+    spiral_step = 0.05
+    spiral_radius = 0
+
+    for text_width, text_height in boxes:
+        placed = False
+        attempts = 0
+        while not placed and attempts < 100:
+            attempts += 1
+            angle = spiral_step * attempts
+            spiral_radius = min(spiral_radius + 0.3, max_radius)
+
+            x = center_x + int(spiral_radius * math.cos(angle)) - text_width // 2
+            y = center_y + int(spiral_radius * math.sin(angle)) - text_height // 2
+
+            if x < 10 or y < 10 or x + text_width > width - 10 or y + text_height > height - 10:
+                continue
+
+            new_box = (x - 5, y - 5, x + text_width + 5, y + text_height + 5)
+            collision = False
+            for existing_box in positions:
+                if (new_box[0] < existing_box[2] and
+                    new_box[2] > existing_box[0] and
+                    new_box[1] < existing_box[3] and
+                    new_box[3] > existing_box[1]):
+                    collision = True
+                    break
+
+            if not collision:
+                positions.append(new_box)
+                placed = True
+        placed_count += placed
+    return placed_count
+
+
+def grid_layout(boxes, width, height):
+    """Colocación con la rejilla de ocupación (cajas completas como máscara)"""
+    items = ((i, np.ones((h, w), dtype=bool)) for i, (w, h) in enumerate(boxes))
+    return len(layout_words(items, width, height))
+
+
+def benchmark_placement(sizes=(100, 500, 1000, 2000, 5000), width=1600, height=1200):
+    """Tiempo y palabras colocadas por cada motor para varios tamaños de nube"""
+    rows = []
+    for n_words in sizes:
+        boxes = synthetic_boxes(n_words)
+        row = {'words': n_words}
+        for name, layout in (('spiral', spiral_layout), ('grid', grid_layout)):
+            start = time.perf_counter()
+            row[f'{name}_placed'] = layout(boxes, width, height)
+            row[f'{name}_secs'] = time.perf_counter() - start
+        rows.append(row)
+    return rows
+
+
+def main():
+    """Uso: python -m visualization.placement_benchmark"""
+    print(f"{'words':>6} {'spiral s':>9} {'placed':>7} {'grid s':>8} {'placed':>7}")
+    for row in benchmark_placement():
+        print(
+            f"{row['words']:>6} {row['spiral_secs']:>9.3f} {row['spiral_placed']:>7} "
+            f"{row['grid_secs']:>8.3f} {row['grid_placed']:>7}"
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
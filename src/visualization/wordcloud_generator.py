@@ -1,19 +1,170 @@
 from PIL import Image, ImageDraw, ImageFont
-import random
-import math
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import numpy as np
 import re
 import logging
+from processing import instrumentation
+from visualization.placement import OccupancyGrid, mask_to_cells, cells_shape, GRID_STEP
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-def generate_wordcloud(word_freq, width=800, height=600, background_color=(255, 255, 255)):
+# Tamaños de fuente escalables y archivos candidatos (se usa el primero disponible)
+FONT_SIZES = tuple(range(20, 71, 5))
+FONT_FILES = ("arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf")
+
+# Paleta de colores mejorada (accesible)
+COLORS = (
+    (0, 82, 147),    # Azul oscuro
+    (213, 0, 50),     # Rojo
+    (0, 132, 61),     # Verde
+    (126, 49, 141),   # Púrpura
+    (243, 119, 53),   # Naranja
+    (0, 155, 166),    # Turquesa
+    (165, 42, 42),    # Marrón
+)
+
+GLYPH_CACHE_SIZE = 50000
+IMAGE_CACHE_BYTES = 64 * 1024 * 1024  # 64 MB
+
+# Fuentes cargadas (una sola vez por proceso)
+_fonts = None
+
+def get_fonts():
+    """Fuentes de FONT_SIZES con el primer archivo de FONT_FILES que se pueda cargar"""
+    global _fonts
+    if _fonts is None:
+        for font_file in FONT_FILES:
+            try:
+                _fonts = tuple(ImageFont.truetype(font_file, size) for size in FONT_SIZES)
+                break
+            except OSError:
+                continue
+        else:
+            logger.warning("No TrueType font found, using default bitmap font")
+            _fonts = (ImageFont.load_default(),)
+    return _fonts
+
+@lru_cache(maxsize=GLYPH_CACHE_SIZE)
+def glyph_bbox(word, font_idx):
+    """Caja (x0, y0, x1, y1) de una palabra con la fuente indicada"""
+    try:
+        return get_fonts()[font_idx].getbbox(word)
+    except Exception as e:
+        logger.error(f"Error getting text size: {str(e)}")
+        return (0, 0, 100, 40)  # Tamaño por defecto
+
+@lru_cache(maxsize=GLYPH_CACHE_SIZE)
+def glyph_cells(word, font_idx):
+    """Máscara del glifo reducida a celdas de la rejilla de ocupación"""
+    bbox = glyph_bbox(word, font_idx)
+    glyph = Image.new('L', (max(1, bbox[2] - bbox[0]), max(1, bbox[3] - bbox[1])), 0)
+    ImageDraw.Draw(glyph).text((-bbox[0], -bbox[1]), word, fill=255, font=get_fonts()[font_idx])
+    cells = mask_to_cells(np.asarray(glyph) > 0)
+    cells.flags.writeable = False
+    return cells
+
+
+class ImageCache:
+    """
+    LRU de nubes ya generadas con límite de tamaño en bytes.
+
+    Las imágenes devueltas se comparten entre llamadas: no deben modificarse.
+    """
+
+    def __init__(self, max_bytes=IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        img = self.entries.get(key)
+        if img is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return img
+
+    def put(self, key, img):
+        size = self._size(img)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= self._size(self.entries.pop(key))
+        self.entries[key] = img
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= self._size(evicted)
+
+    @staticmethod
+    def _size(img):
+        return img.width * img.height * len(img.getbands())
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'bytes': self.bytes}
+
+_image_cache = ImageCache()
+
+def wordcloud_cache_stats():
+    """Estadísticas de las cachés de glifos e imágenes"""
+    return {
+        'images': _image_cache.stats(),
+        'glyph_bbox': glyph_bbox.cache_info()._asdict(),
+        'glyph_cells': glyph_cells.cache_info()._asdict()
+    }
+
+def clear_wordcloud_cache():
+    """Vacía las cachés de glifos e imágenes"""
+    _image_cache.clear()
+    glyph_bbox.cache_clear()
+    glyph_cells.cache_clear()
+
+def _cache_key(word_freq, width, height, background_color, colors, mask):
+    mask_digest = None
+    if mask is not None:
+        mask = np.ascontiguousarray(mask, dtype=bool)
+        mask_digest = (mask.shape, hashlib.sha1(mask.tobytes()).hexdigest())
+    return (tuple(word_freq.items()), width, height, tuple(background_color), tuple(colors), mask_digest)
+
+def generate_wordcloud(word_freq, width=800, height=600, background_color=(255, 255, 255), mask=None, colors=COLORS):
+    """
+    Devuelve la nube de palabras (ver render_wordcloud), reutilizando la imagen
+    si ya se generó con la misma tabla de frecuencias, tamaño, colores y
+    máscara. La imagen devuelta puede estar compartida: no debe modificarse.
+    """
+    with instrumentation.stage('generate_wordcloud'):
+        key = _cache_key(word_freq, width, height, background_color, colors, mask)
+        img = _image_cache.get(key)
+        instrumentation.count('wordcloud_cache.misses' if img is None else 'wordcloud_cache.hits')
+        if img is None:
+            with instrumentation.stage('generate_wordcloud.render'):
+                img, ok = render_wordcloud(word_freq, width, height, background_color, mask, colors)
+            # Las imágenes de error no se guardan
+            if ok:
+                _image_cache.put(key, img)
+    return img
+
+def render_wordcloud(word_freq, width=800, height=600, background_color=(255, 255, 255), mask=None, colors=COLORS):
     """
     Genera una nube de palabras mejorada con:
     - Filtrado de números y palabras cortas
-    - Algoritmo de colocación mejorado
+    - Colocación sobre una rejilla de ocupación con máscaras de glifo
+      (ver visualization.placement); si una palabra no cabe se reduce su fuente
+    - Máscara de forma opcional (mask: array height × width, True donde se
+      pueden colocar palabras)
     - Manejo de errores robusto
+    Devuelve (imagen, correcta); la imagen es None si no hay palabras válidas.
     """
     try:
         # Filtrar palabras no deseadas (números y palabras cortas)
@@ -24,46 +175,13 @@ def generate_wordcloud(word_freq, width=800, height=600, background_color=(255,
         
         if not filtered_freq:
             logger.warning("No valid words for word cloud after filtering")
-            return None
+            return None, False
         
         # Crear imagen con fondo sólido
         img = Image.new('RGB', (width, height), background_color)
         draw = ImageDraw.Draw(img)
         
-        # Función para obtener tamaño de texto
-        def get_text_size(text, font):
-            try:
-                bbox = draw.textbbox((0, 0), text, font=font)
-                return bbox[2] - bbox[0], bbox[3] - bbox[1]
-            except Exception as e:
-                logger.error(f"Error getting text size: {str(e)}")
-                return (100, 40)  # Tamaño por defecto
-        
-        # Fuentes escalables
-        fonts = []
-        try:
-            # Intentar cargar varias fuentes comunes
-            for size in range(20, 71, 5):
-                try:
-                    fonts.append(ImageFont.truetype("arial.ttf", size))
-                except:
-                    try:
-                        fonts.append(ImageFont.truetype("DejaVuSans.ttf", size))
-                    except:
-                        fonts.append(ImageFont.truetype("LiberationSans-Regular.ttf", size))
-        except:
-            fonts = [ImageFont.load_default()]
-        
-        # Paleta de colores mejorada (accesible)
-        colors = [
-            (0, 82, 147),    # Azul oscuro
-            (213, 0, 50),     # Rojo
-            (0, 132, 61),     # Verde
-            (126, 49, 141),   # Púrpura
-            (243, 119, 53),   # Naranja
-            (0, 155, 166),    # Turquesa
-            (165, 42, 42),    # Marrón
-        ]
+        fonts = get_fonts()
         
         # Calcular frecuencias
         freqs = list(filtered_freq.values())
@@ -71,70 +189,46 @@ def generate_wordcloud(word_freq, width=800, height=600, background_color=(255,
         max_freq = max(freqs) if freqs else 1
         freq_range = max(1, max_freq - min_freq)
         
-        # Posiciones y tamaños
-        positions = []
-        center_x, center_y = width // 2, height // 2
-        max_radius = min(width, height) // 3
+        # Rejilla de ocupación (márgenes de 10 px y forma opcional)
+        grid = OccupancyGrid(width, height, border=10, shape_mask=mask)
         
         # Ordenar palabras por frecuencia
         sorted_words = sorted(filtered_freq.items(), key=lambda x: x[1], reverse=True)
         
-        # Espiral para colocación
-        spiral_step = 0.05
-        spiral_radius = 0
-        
+        placed = 0
+        dropped = []
         for word, freq in sorted_words:
             # Tamaño proporcional a la frecuencia
             size_ratio = (freq - min_freq) / freq_range
             font_idx = min(int(len(fonts) * size_ratio), len(fonts) - 1)
-            font = fonts[font_idx]
             
-            # Obtener tamaño del texto
-            text_width, text_height = get_text_size(word, font)
+            # Buscar hueco, reduciendo la fuente si la palabra no cabe
+            position = None
+            for idx in range(font_idx, -1, -1):
+                bbox = glyph_bbox(word, idx)
+                position = grid.find_position(*cells_shape(bbox))
+                if position is not None:
+                    break
+            
+            if position is None:
+                dropped.append(word)
+                continue
             
-            # Intentar colocar la palabra
-            placed = False
-            attempts = 0
+            grid.place(glyph_cells(word, idx), *position)
             
-            while not placed and attempts < 100:
-                attempts += 1
-                
-                # Usar espiral para colocación
-                angle = spiral_step * attempts
-                spiral_radius = min(spiral_radius + 0.3, max_radius)
-                
-                x = center_x + int(spiral_radius * math.cos(angle)) - text_width // 2
-                y = center_y + int(spiral_radius * math.sin(angle)) - text_height // 2
-                
-                # Verificar límites
-                if x < 10 or y < 10 or x + text_width > width - 10 or y + text_height > height - 10:
-                    continue
-                
-                # Verificar colisiones
-                collision = False
-                new_box = (x-5, y-5, x + text_width + 5, y + text_height + 5)
-                
-                for existing_box in positions:
-                    if (new_box[0] < existing_box[2] and 
-                        new_box[2] > existing_box[0] and 
-                        new_box[1] < existing_box[3] and 
-                        new_box[3] > existing_box[1]):
-                        collision = True
-                        break
-                
-                if not collision:
-                    # Seleccionar color
-                    color = colors[len(positions) % len(colors)]
-                    
-                    # Dibujar texto
-                    draw.text((x, y), word, fill=color, font=font)
-                    positions.append(new_box)
-                    placed = True
+            # Esquina del glifo (descontando el margen de una celda)
+            x = (position[1] + 1) * GRID_STEP
+            y = (position[0] + 1) * GRID_STEP
+            
+            # Seleccionar color y dibujar texto
+            color = colors[placed % len(colors)]
+            draw.text((x - bbox[0], y - bbox[1]), word, fill=color, font=fonts[idx])
+            placed += 1
         
-        if not placed:
-            logger.warning(f"Could not place word: {word}")
+        if dropped:
+            logger.warning(f"Could not place {len(dropped)} words (e.g. {dropped[0]})")
         
-        return img
+        return img, True
     
     except Exception as e:
         logger.error(f"Error generating word cloud: {str(e)}")
@@ -146,4 +240,4 @@ def generate_wordcloud(word_freq, width=800, height=600, background_color=(255,
             draw.text((50, height//2), "Error generating word cloud", fill=(255, 0, 0), font=font)
         except:
             pass
-        return img
\ No newline at end of file
+        return img, False
\ No newline at end of file
@@ -0,0 +1,58 @@
+import os
+import sys
+import pytest
+
+# Los módulos se importan como en la aplicación: con src/ en el path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture(scope='session')
+def season_cues():
+    """Subtítulos de los episodios incluidos en data/ [(episodio, subtítulos)]"""
+    from analysis.lexical_analysis import list_episode_files
+    from processing.srt_parser import parse_srt
+    return [(episode, parse_srt(path)) for episode, path in list_episode_files(DATA_DIR)]
+
+
+@pytest.fixture(scope='session')
+def random_episodes():
+    """
+    Episodios codificados sintéticos (ver lexical_analysis.encode_episode):
+    IDs con distribución tipo Zipf, subtítulos de 0 a 12 lemas (algunos
+    vacíos) y tiempos crecientes con huecos. [(episodio, codificación)]
+    """
+    import numpy as np
+    rng = np.random.default_rng(7)
+    lemmas = [f"w{i}" for i in range(400)]
+    episodes = []
+    for number in range(1, 7):
+        sizes = rng.integers(0, 13, 150)
+        n = int(sizes.sum())
+        global_ids = np.minimum(rng.zipf(1.3, n) - 1, len(lemmas) - 1)
+        words, ids = [], np.empty(n, dtype=np.uint32)
+        local = {}
+        for k, g in enumerate(global_ids.tolist()):
+            if g not in local:
+                local[g] = len(words)
+                words.append(lemmas[g])
+            ids[k] = local[g]
+        cue_start = np.cumsum(rng.uniform(0.5, 8.0, len(sizes)))
+        episodes.append((f"{number:02d}", {
+            'words': words,
+            'ids': ids,
+            'cue_offsets': np.concatenate(([0], np.cumsum(sizes))).astype(np.int64),
+            'cue_ids': np.arange(1, len(sizes) + 1, dtype=np.int32),
+            'cue_start': cue_start,
+            'cue_end': cue_start + rng.uniform(0.3, 6.0, len(sizes))
+        }))
+    return episodes
+
+
+def cue_lemmas(episode):
+    """Lemas de cada subtítulo de un episodio codificado (listas de cadenas)"""
+    words, ids, offsets = episode['words'], episode['ids'], episode['cue_offsets']
+    return [[words[i] for i in ids[offsets[k]:offsets[k + 1]].tolist()] for k in range(len(offsets) - 1)]
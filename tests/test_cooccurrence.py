@@ -0,0 +1,59 @@
+from collections import Counter
+import numpy as np
+import pytest
+from analysis.cooccurrence import CooccurrenceMatrix, token_times
+
+
+def brute_cooccurrences(episodes, window, unit):
+    """Pares de lemas distintos dentro de la ventana, comparando cada par de tokens"""
+    pairs = Counter()
+    for episode in episodes:
+        words = [episode['words'][i] for i in episode['ids'].tolist()]
+        if unit == 'tokens':
+            for i in range(len(words)):
+                for j in range(i + 1, min(i + window, len(words))):
+                    if words[i] != words[j]:
+                        pairs[frozenset((words[i], words[j]))] += 1
+        else:
+            sizes = np.diff(episode['cue_offsets'])
+            times = []
+            for k, size in enumerate(sizes.tolist()):
+                start, end = episode['cue_start'][k], episode['cue_end'][k]
+                times.extend(start + (end - start) * (r + 0.5) / size for r in range(size))
+            order = sorted(range(len(words)), key=lambda i: times[i])
+            for a, i in enumerate(order):
+                for j in order[a + 1:]:
+                    if times[j] > times[i] + window:
+                        break
+                    if words[i] != words[j]:
+                        pairs[frozenset((words[i], words[j]))] += 1
+    return pairs
+
+
+def as_pairs(matrix):
+    src, dst, weights = matrix.edges()
+    words = matrix.vocabulary.words
+    return {frozenset((words[a], words[b])): w for a, b, w in zip(src.tolist(), dst.tolist(), weights.tolist())}
+
+
+@pytest.mark.parametrize('window,unit', [(2, 'tokens'), (5, 'tokens'), (3.0, 'seconds'), (12.5, 'seconds')])
+def test_windows_match_brute_force(random_episodes, window, unit):
+    episodes = [episode for _, episode in random_episodes]
+    matrix = CooccurrenceMatrix.from_encoded(episodes, window, unit)
+    assert as_pairs(matrix) == dict(brute_cooccurrences(episodes, window, unit))
+
+    frequencies = Counter(episode['words'][i] for episode in episodes for i in episode['ids'].tolist())
+    assert dict(zip(matrix.vocabulary.words, matrix.frequencies.tolist())) == dict(frequencies)
+
+
+def test_neighbors_are_heaviest_edges(random_episodes):
+    matrix = CooccurrenceMatrix.from_encoded([episode for _, episode in random_episodes], 5)
+    pairs = as_pairs(matrix)
+    word = matrix.vocabulary.words[0]
+    expected = sorted((w for pair, w in pairs.items() if word in pair), reverse=True)[:10]
+    assert [weight for _, weight in matrix.neighbors(word, 10)] == expected
+
+
+def test_token_times_spread_over_cue():
+    times = token_times(np.array([0, 2, 2, 3]), np.array([0.0, 5.0, 10.0]), np.array([4.0, 6.0, 11.0]))
+    assert np.allclose(times, [1.0, 3.0, 10.5])
@@ -0,0 +1,13 @@
+import pytest
+from processing.import_budget import BUDGETS, check_import_budget
+
+
+@pytest.mark.parametrize('module', sorted(BUDGETS))
+def test_import_within_budget(module):
+    """Cada módulo se importa dentro de su presupuesto y sin cargar paquetes pesados"""
+    failures = check_import_budget({module: BUDGETS[module]})
+    assert not failures, [
+        f"{name}: {seconds * 1000:.1f} ms (budget {BUDGETS[name] * 1000:.0f} ms)"
+        + (f", loaded {', '.join(loaded)}" if loaded else '')
+        for name, seconds, loaded in failures
+    ]
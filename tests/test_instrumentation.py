@@ -0,0 +1,45 @@
+import pytest
+from processing import instrumentation
+
+
+def work(n):
+    with instrumentation.stage('work'):
+        with instrumentation.stage('work.inner'):
+            instrumentation.count('items', n)
+    return n * 2
+
+
+@pytest.fixture
+def collector():
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+
+
+def test_pool_workers_are_measured(collector):
+    with instrumentation.stage('parent'):
+        work(1)
+    with instrumentation.process_pool(2) as executor:
+        assert instrumentation.pool_map(executor, work, [1, 2, 3, 4]) == [2, 4, 6, 8]
+    report = instrumentation.disable()
+    # Lo del padre antes del pool no se cuenta dos veces en los workers
+    assert report['stages']['work']['calls'] == 5
+    assert report['stages']['work.inner']['calls'] == 5
+    assert report['stages']['parent']['calls'] == 1
+    assert report['counters'] == {'items': 11}
+
+
+def test_pool_without_instrumentation():
+    assert not instrumentation.is_enabled()
+    with instrumentation.process_pool(2) as executor:
+        assert instrumentation.pool_map(executor, work, [1, 2]) == [2, 4]
+    assert instrumentation.report() == {'enabled': False}
+
+
+def test_cprofile_merges_worker_profiles():
+    instrumentation.enable(cprofile=True)
+    with instrumentation.process_pool(2) as executor:
+        instrumentation.pool_map(executor, work, [1, 2, 3])
+    report = instrumentation.disable()
+    assert report['stages']['work']['calls'] == 3
+    assert any(row['function'].endswith('(count)') and row['calls'] == 3 for row in report['profiles']['work'])
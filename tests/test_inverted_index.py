@@ -0,0 +1,88 @@
+from collections import Counter
+import numpy as np
+import pytest
+from conftest import cue_lemmas
+from analysis.inverted_index import InvertedIndex, delta_decode, delta_encode, varint_decode, varint_encode
+
+
+@pytest.fixture(scope='module')
+def index(random_episodes):
+    return InvertedIndex.from_encoded([name for name, _ in random_episodes], [episode for _, episode in random_episodes])
+
+
+def brute_tokens(random_episodes):
+    """(lema, episodio, número de subtítulo, inicio, desplazamiento, índice de subtítulo global) de cada token, en orden"""
+    tokens, cue_base = [], 0
+    for name, episode in random_episodes:
+        offset = 0
+        for k, lemmas in enumerate(cue_lemmas(episode)):
+            for lemma in lemmas:
+                tokens.append((lemma, name, int(episode['cue_ids'][k]), float(episode['cue_start'][k]), offset, cue_base + k))
+                offset += 1
+        cue_base += len(episode['cue_ids'])
+    return tokens
+
+
+def test_varint_round_trip():
+    rng = np.random.default_rng(3)
+    values = np.concatenate((
+        [0, 1, 127, 128, 16_383, 16_384, 2 ** 32 - 1, 2 ** 32, 2 ** 62],
+        rng.integers(0, 2 ** 40, 1000)
+    )).astype(np.int64)
+    data = varint_encode(values)
+    assert data.dtype == np.uint8
+    assert varint_encode([5, 300]).tolist() == [5, 0xAC, 0x02]
+    assert varint_decode(data).tolist() == values.tolist()
+    assert varint_decode(varint_encode([])).tolist() == []
+
+
+def test_delta_round_trip(index):
+    firsts, gaps = delta_encode(index.positions, index.term_ptr)
+    assert len(firsts) == np.count_nonzero(np.diff(index.term_ptr))
+    assert delta_decode(firsts, gaps, index.term_ptr).tolist() == index.positions.tolist()
+    # Términos sin apariciones intercalados
+    term_ptr = np.array([0, 0, 3, 3, 4, 4])
+    positions = np.array([2, 9, 700, 5])
+    assert delta_decode(*delta_encode(positions, term_ptr), term_ptr).tolist() == positions.tolist()
+
+
+def test_save_load_round_trip(index, tmp_path):
+    path = str(tmp_path / 'index.npz')
+    index.save(path, fingerprint='abc')
+    loaded = InvertedIndex.load(path, fingerprint='abc')
+    assert loaded.stream.tolist() == index.stream.tolist()
+    assert loaded.positions.tolist() == index.positions.tolist()
+    assert loaded.term_ptr.tolist() == index.term_ptr.tolist()
+    assert loaded.episodes == index.episodes
+    assert loaded.vocabulary.words == index.vocabulary.words
+    assert InvertedIndex.load(path) is not None
+    assert InvertedIndex.load(path, fingerprint='other') is None
+    assert InvertedIndex.load(str(tmp_path / 'missing.npz')) is None
+
+
+def test_postings_match_brute_force(random_episodes, index):
+    tokens = brute_tokens(random_episodes)
+    assert len(index) == len(tokens)
+    assert [index.vocabulary.words[i] for i in index.stream.tolist()] == [lemma for lemma, *_ in tokens]
+    frequencies = Counter(lemma for lemma, *_ in tokens)
+    for lemma in sorted(frequencies)[:60] + ['missing']:
+        assert index.frequency(lemma) == frequencies[lemma]
+        assert index.postings(lemma) == [(name, cue_id, start, offset) for word, name, cue_id, start, offset, _ in tokens if word == lemma]
+
+
+def test_phrase_positions_match_brute_force(random_episodes, index):
+    tokens = brute_tokens(random_episodes)
+    lemmas = [lemma for lemma, *_ in tokens]
+    cues = [cue for *_, cue in tokens]
+    # Frases que aparecen (dentro o a caballo entre subtítulos) y otras al azar
+    rng = np.random.default_rng(5)
+    phrases = [lemmas[i:i + n] for n in (2, 3, 4) for i in rng.integers(0, len(lemmas) - n, 40).tolist()]
+    phrases += [[f"w{i}" for i in rng.integers(0, 20, n).tolist()] for n in (2, 3) for _ in range(20)]
+    phrases += [['w0'], ['w0', 'missing'], []]
+    for phrase in phrases:
+        n = len(phrase)
+        expected = [
+            i for i in range(len(lemmas) - n + 1)
+            if lemmas[i:i + n] == phrase and cues[i] == cues[i + n - 1]
+        ] if phrase else []
+        assert sorted(index.phrase_positions(phrase).tolist()) == expected, phrase
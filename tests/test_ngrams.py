@@ -0,0 +1,78 @@
+import math
+from collections import Counter
+import numpy as np
+import pytest
+from analysis.ngrams import NgramModel
+from conftest import cue_lemmas
+
+
+def brute_counts(episode, n):
+    """Conteo de n-gramas dentro de cada subtítulo"""
+    counts = Counter()
+    for lemmas in cue_lemmas(episode):
+        counts.update(tuple(lemmas[i:i + n]) for i in range(len(lemmas) - n + 1))
+    return counts
+
+
+def brute_marginals(counts, n):
+    marginals = [Counter() for _ in range(n)]
+    for gram, count in counts.items():
+        for i, word in enumerate(gram):
+            marginals[i][word] += count
+    return marginals
+
+
+@pytest.fixture(scope='module')
+def model(random_episodes):
+    return NgramModel.from_encoded([num for num, _ in random_episodes], [ep for _, ep in random_episodes])
+
+
+@pytest.mark.parametrize('n', [2, 3])
+def test_counts_match_brute_force(model, random_episodes, n):
+    season = Counter()
+    for num, episode in random_episodes:
+        expected = brute_counts(episode, n)
+        season.update(expected)
+        assert dict(model.top_k(len(expected) + 1, n, num)) == dict(expected)
+    assert dict(model.top_k(len(season) + 1, n)) == dict(season)
+
+
+@pytest.mark.parametrize('n', [2, 3])
+def test_pmi_matches_closed_form(model, random_episodes, n):
+    season = Counter()
+    for _, episode in random_episodes:
+        season.update(brute_counts(episode, n))
+    total = sum(season.values())
+    marginals = brute_marginals(season, n)
+    for gram, score, count in model.collocations(k=len(season), n=n, measure='pmi', min_count=2):
+        expected = math.log2(count / total) - sum(math.log2(marginals[i][w] / total) for i, w in enumerate(gram))
+        assert count == season[gram]
+        assert score == pytest.approx(expected, abs=1e-9)
+
+
+def test_llr_matches_contingency_table(model, random_episodes):
+    season = Counter()
+    for _, episode in random_episodes:
+        season.update(brute_counts(episode, 2))
+    total = sum(season.values())
+    first, second = brute_marginals(season, 2)
+    results = model.collocations(k=len(season), n=2, measure='llr', min_count=3)
+    assert len(results) == sum(1 for count in season.values() if count >= 3)
+    for (a, b), score, count in results:
+        table = [[count, first[a] - count], [second[b] - count, total - first[a] - second[b] + count]]
+        rows = [sum(row) for row in table]
+        cols = [table[0][j] + table[1][j] for j in range(2)]
+        expected = 2 * sum(
+            table[i][j] * math.log(table[i][j] * total / (rows[i] * cols[j]))
+            for i in range(2) for j in range(2) if table[i][j] > 0
+        )
+        assert score == pytest.approx(expected, rel=1e-9, abs=1e-9)
+    scores = [score for _, score, _ in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_ngrams_do_not_cross_cues():
+    episode = {'words': ['a', 'b', 'c'], 'ids': np.array([0, 1, 2, 0], dtype=np.uint32),
+               'cue_offsets': np.array([0, 2, 4])}
+    model = NgramModel.from_encoded(['01'], [episode], orders=(2,))
+    assert dict(model.top_k(10)) == {('a', 'b'): 1, ('c', 'a'): 1}
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+from analysis.sentiment import SentimentScorer, get_lexicon
+
+# Lexicón pequeño con palabras frecuentes en el diálogo y las que activan
+# reglas especiales (intensificadores y "kind" con valencia propia, idiomas,
+# emoticonos); con vader_lexicon instalado se prueba además el lexicón real
+LEXICON = {
+    'good': 1.9, 'bad': -2.5, 'love': 3.2, 'hate': -2.7, 'kill': -3.7, 'dead': -3.3, 'safe': 1.9, 'help': 1.7,
+    'scared': -1.9, 'happy': 2.7, 'hurt': -2.4, 'okay': 0.9, 'sorry': -0.3, 'please': 1.3, 'no': -1.2,
+    'nice': 1.8, 'great': 3.1, 'fine': 0.8, 'die': -2.9, 'fear': -2.2, 'trust': 2.3, 'hope': 1.9,
+    'wrong': -2.1, 'like': 1.5, 'want': 0.3, 'kind': 2.4, 'fucking': -1.5, 'fuck': -2.5, 'shit': -2.6,
+    'yeah': 1.2, 'right': 0.5, 'really': 0.4, 'god': 1.1, 'damn': -1.7, 'bomb': -2.2, 'ass': -2.5,
+    'sure': 1.3, 'well': 1.1, 'lost': -1.3, 'alone': -1.0, 'free': 2.3, ':)': 2.0, 'XD': 2.7
+}
+
+SENTENCES = [
+    "fucking good", "He is the least happy", "You are kind of happy", "hardly not good", "at least happy",
+    "least happy", "I don't love you", "This is VERY good", "It is good but you are bad!!!", "never so good",
+    "never really so good", "so very good", "that is the shit", "yeah right, good", "Good good good",
+    "good, bad. good", "You are kind of a good guy", "XD so happy :)", "NOT good at all", "Are you okay??"
+]
+
+
+def reference(lexicon):
+    """SentimentIntensityAnalyzer de NLTK con el lexicón dado"""
+    analyzer = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+    analyzer.lexicon = dict(lexicon)
+    analyzer.constants = VaderConstants()
+    return analyzer
+
+
+def as_cues(texts):
+    return [{'id': i, 'text': text, 'start_sec': float(i), 'end_sec': i + 1.0} for i, text in enumerate(texts)]
+
+
+def assert_parity(lexicon, texts):
+    scores = SentimentScorer(lexicon=lexicon).score_cues(as_cues(texts))
+    analyzer = reference(lexicon)
+    expected = [analyzer.polarity_scores(text) for text in texts]
+    mismatches = [
+        (text, key, row[key], float(scores[key][i]))
+        for i, (text, row) in enumerate(zip(texts, expected))
+        for key, tolerance in (('compound', 1e-4), ('pos', 1e-3), ('neg', 1e-3), ('neu', 1e-3))
+        if abs(row[key] - scores[key][i]) > tolerance
+    ]
+    assert not mismatches, mismatches[:10]
+
+
+def test_rules_match_nltk():
+    assert_parity(LEXICON, SENTENCES)
+
+
+def test_season_matches_nltk(season_cues):
+    assert_parity(LEXICON, [sub['text'] for _, cues in season_cues for sub in cues])
+
+
+def test_season_matches_nltk_with_vader_lexicon(season_cues):
+    try:
+        lexicon = get_lexicon()
+    except LookupError:
+        pytest.skip("vader_lexicon is not installed")
+    assert_parity(lexicon, [sub['text'] for _, cues in season_cues for sub in cues])
+
+
+def test_empty_cues():
+    scores = SentimentScorer(lexicon=LEXICON).score_cues(as_cues(["", "a", "ok good"]))
+    assert np.allclose(scores['compound'][:2], 0.0)
+    assert np.allclose(scores['neu'][:2], 0.0)
@@ -0,0 +1,137 @@
+from collections import Counter
+import numpy as np
+import pytest
+from analysis.sketches import CountMinSketch, HeavyHitters, MisraGries, word_hashes
+
+
+@pytest.fixture(scope='module')
+def stream():
+    """Conteos tipo Zipf de 5000 palabras repartidos en 40 lotes"""
+    rng = np.random.default_rng(13)
+    batches = []
+    for _ in range(40):
+        ids = np.minimum(rng.zipf(1.2, 2000), 5000)
+        batches.append(Counter(f"w{i}" for i in ids.tolist()))
+    return batches
+
+
+def totals(batches):
+    counts = Counter()
+    for batch in batches:
+        counts.update(batch)
+    return counts
+
+
+def assert_misra_gries(summary, counts):
+    """Garantías de Misra-Gries frente a los conteos exactos"""
+    total = sum(counts.values())
+    assert summary.total == total
+    assert summary.error <= total / (summary.k + 1)
+    for word, count in counts.items():
+        if count > summary.error:
+            assert word in summary.counters, word
+    for word, counter in summary.counters.items():
+        assert counts[word] - summary.error <= counter <= counts[word]
+
+
+@pytest.mark.parametrize('k', [1, 10, 100])
+def test_misra_gries_bounds(stream, k):
+    summary = MisraGries(k)
+    for batch in stream:
+        summary.add(list(batch), list(batch.values()))
+    assert_misra_gries(summary, totals(stream))
+    assert len(summary.top()) <= k
+    assert [count for _, count in summary.top()] == sorted((count for _, count in summary.top()), reverse=True)
+
+
+def test_misra_gries_merge_keeps_bounds(stream):
+    parts = [MisraGries(20) for _ in range(4)]
+    for i, batch in enumerate(stream):
+        parts[i % 4].add(list(batch), list(batch.values()))
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    merged.top()
+    assert_misra_gries(merged, totals(stream))
+
+
+def test_count_min_never_underestimates(stream):
+    sketch = CountMinSketch.from_error(epsilon=1e-3, delta=0.01)
+    for batch in stream:
+        sketch.add(word_hashes(list(batch)), list(batch.values()))
+    counts = totals(stream)
+    words = list(counts)
+    estimates = sketch.query(word_hashes(words))
+    exact = np.array([counts[word] for word in words])
+    assert sketch.total == exact.sum()
+    assert np.all(estimates >= exact)
+    # Error mayor que epsilon · total con probabilidad como mucho delta por palabra
+    assert np.mean(estimates - exact > sketch.epsilon * sketch.total) <= 2 * sketch.delta
+    assert sketch.query(word_hashes(['missing'])) >= 0
+    assert len(sketch.query(np.zeros(0, dtype=np.uint64))) == 0
+
+
+def test_count_min_merge(stream):
+    whole = CountMinSketch(1 << 10, 4, seed=3)
+    parts = [CountMinSketch(1 << 10, 4, seed=3) for _ in range(3)]
+    for i, batch in enumerate(stream):
+        hashes, counts = word_hashes(list(batch)), list(batch.values())
+        whole.add(hashes, counts)
+        parts[i % 3].add(hashes, counts)
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+    assert np.array_equal(merged.table, whole.table)
+    assert merged.total == whole.total
+    with pytest.raises(ValueError):
+        merged.merge(CountMinSketch(1 << 10, 4, seed=4))
+    with pytest.raises(ValueError):
+        CountMinSketch(1000)
+
+
+def test_heavy_hitters_merge_save_load(stream, tmp_path):
+    counts = totals(stream)
+    heavy = HeavyHitters(50, epsilon=1e-3)
+    parts = [heavy.empty() for _ in range(4)]
+    assert all(part.params() == heavy.params() and part.total == 0 for part in parts)
+    for i, batch in enumerate(stream):
+        parts[i % 4].add_counts(batch)
+    for part in parts:
+        heavy.merge(part)
+    assert heavy.total == sum(counts.values())
+    assert_misra_gries(heavy.summary, counts)
+
+    top = heavy.top(20)
+    exact_top = counts.most_common(20)
+    assert [word for word, _ in top[:5]] == [word for word, _ in exact_top[:5]]
+    for word, estimate in top:
+        assert estimate >= counts[word]
+        assert estimate <= counts[word] + min(heavy.summary.error, heavy.bounds()['count_min_error'] * 2)
+
+    path = str(tmp_path / 'sketch.npz')
+    heavy.save(path)
+    loaded = HeavyHitters.load(path)
+    assert loaded.params() == heavy.params()
+    assert loaded.top(20) == top
+    assert loaded.bounds() == heavy.bounds()
+    assert loaded.estimate(['w1', 'missing']) == heavy.estimate(['w1', 'missing'])
+    with pytest.raises(ValueError):
+        loaded.merge(HeavyHitters(10))
+
+
+def test_approximate_aggregation_matches_exact(random_episodes):
+    from analysis.lexical_analysis import aggregate_encoded
+    names = [name for name, _ in random_episodes]
+    encoded = [episode for _, episode in random_episodes]
+    results, global_top, _, _ = aggregate_encoded(names, encoded, themes=False)
+    approx_results, approx_top, approx_evolution, _ = aggregate_encoded(names, encoded, themes=False, approximate=True)
+    assert approx_results == results
+    # Sin podar el resumen, los conteos del top son exactos (los empates, por orden alfabético)
+    assert sorted(approx_top, key=lambda item: (-item[1], item[0])) == approx_top
+    counts = totals(Counter(episode['words'][i] for i in episode['ids'].tolist()) for episode in encoded)
+    assert approx_top == sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:100]
+    assert [count for _, count in approx_top] == [count for _, count in global_top]
+    assert list(approx_evolution) == [word for word, _ in approx_top[:50]]
+    for word, series in approx_evolution.items():
+        assert series == [
+            (name, sum(episode['words'][i] == word for i in episode['ids'].tolist()))
+            for name, episode in random_episodes
+        ]
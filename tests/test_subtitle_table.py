@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from processing.subtitle_table import SubtitleTable
+
+
+@pytest.fixture(scope='module')
+def subtitles():
+    """Subtítulos sintéticos de tres episodios, desordenados, con inicios repetidos y muchos solapamientos"""
+    rng = np.random.default_rng(11)
+    episodes = []
+    for episode in ('01', '02', '03'):
+        starts = np.round(rng.uniform(0, 600, 250) * 2) / 2
+        durations = np.round(rng.uniform(0.5, 8, 250), 3)
+        cues = []
+        for i, (start, duration) in enumerate(zip(starts.tolist(), durations.tolist())):
+            words = int(rng.integers(1, 15))
+            cues.append({
+                'id': i + 1,
+                'start_sec': start,
+                'end_sec': start + duration,
+                'duration': duration,
+                'word_count': words,
+                'wpm': int(words * 60 / duration),
+                'text': f"{episode}-{i + 1} " + 'x' * words
+            })
+        episodes.append((episode, cues))
+    return episodes
+
+
+@pytest.fixture(scope='module')
+def table(subtitles):
+    return SubtitleTable.from_subtitles(subtitles)
+
+
+def rows_of(table, episode=None):
+    """(fila, episodio, inicio, fin) de todas las filas, recorridas una a una"""
+    names = table.episode_of(np.arange(len(table)))
+    return [
+        (row, name, table.start_sec[row], table.end_sec[row])
+        for row, name in enumerate(names) if episode is None or name == episode
+    ]
+
+
+def test_rows_keep_every_cue(subtitles, table):
+    assert len(table) == sum(len(cues) for _, cues in subtitles)
+    for episode, cues in subtitles:
+        rows = table.find_cues(episode, [cue['id'] for cue in cues])
+        for cue, found in zip(cues, table.to_dicts(rows)):
+            assert found['episode'] == episode
+            assert found['text'] == cue['text']
+            assert {key: found[key] for key in cue if key != 'text'} == pytest.approx(
+                {key: value for key, value in cue.items() if key != 'text'}
+            )
+        columns = table.episode_columns(episode, ('start_sec',))
+        assert np.all(np.diff(columns['start_sec']) >= 0)
+    assert table.find_cues('01', [0, 10_000]).tolist() == [-1, -1]
+
+
+@pytest.mark.parametrize('episode', [None, '02'])
+@pytest.mark.parametrize('start,end', [(0, 30), (100.5, 101), (250, 250), (299.25, 340.75), (590, 700), (-5, 0)])
+def test_time_queries_match_brute_force(table, episode, start, end):
+    rows = rows_of(table, episode)
+    assert sorted(table.between(start, end, episode).tolist()) == [r for r, _, s, _ in rows if start <= s < end]
+    assert sorted(table.overlapping(start, end, episode).tolist()) == [r for r, _, s, e in rows if s < end and e > start]
+
+
+@pytest.mark.parametrize('episode', [None, '03'])
+@pytest.mark.parametrize('min_overlap', [0.0, 0.5, 3.0])
+def test_overlapping_pairs_match_brute_force(table, episode, min_overlap):
+    rows = rows_of(table, episode)
+    expected = {
+        (a, b)
+        for i, (a, name_a, start_a, end_a) in enumerate(rows)
+        for b, name_b, start_b, end_b in rows[i + 1:]
+        if name_a == name_b and min(end_a, end_b) - max(start_a, start_b) > min_overlap
+    }
+    pairs = table.overlapping_pairs(episode, min_overlap)
+    assert len(pairs) == len(expected)
+    assert set(map(tuple, pairs.tolist())) == expected
@@ -0,0 +1,22 @@
+import pytest
+from processing import text_utils
+
+
+@pytest.mark.parametrize('version,tokenizer,tagger', [
+    ('3.8.1', 'punkt', 'averaged_perceptron_tagger'),
+    ('3.9', 'punkt_tab', 'averaged_perceptron_tagger_eng'),
+    ('3.10.3', 'punkt_tab', 'averaged_perceptron_tagger_eng'),
+])
+def test_resource_names_follow_nltk_version(monkeypatch, version, tokenizer, tagger):
+    monkeypatch.setattr(text_utils, '_nltk_version', version)
+    names = [name for name, _ in text_utils.nltk_resource_paths()]
+    assert tokenizer in names and tagger in names
+    assert len(names) == len(text_utils.NLTK_RESOURCES)
+
+
+def test_fast_mode_needs_no_tokenizer_or_tagger(monkeypatch):
+    monkeypatch.setattr(text_utils, '_nltk_version', '3.10.3')
+    names = {name for name, _ in text_utils.nltk_resource_paths(text_utils.nltk_resources_for('fast'))}
+    assert names == {'stopwords', 'wordnet', 'omw-1.4'}
+    with pytest.raises(ValueError):
+        text_utils.nltk_resources_for('slow')
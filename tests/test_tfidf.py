@@ -0,0 +1,76 @@
+import math
+from collections import Counter
+import pytest
+from analysis.term_matrix import TermMatrix
+from analysis.tfidf import TfidfModel
+
+
+def episode_counts(random_episodes):
+    return [
+        (name, Counter(episode['words'][i] for i in episode['ids'].tolist()))
+        for name, episode in random_episodes
+    ]
+
+
+def brute_weights(counts, sublinear, smooth, norm):
+    """{episodio: {lema: peso}} calculado término a término"""
+    n = len(counts)
+    df = Counter(word for _, word_count in counts for word in word_count)
+    weights = {}
+    for episode, word_count in counts:
+        row = {}
+        for word, count in word_count.items():
+            tf = 1 + math.log(count) if sublinear else count
+            idf = math.log((1 + n) / (1 + df[word])) + 1 if smooth else math.log(n / df[word]) + 1
+            row[word] = tf * idf
+        if norm == 'l2':
+            length = math.sqrt(sum(w * w for w in row.values()))
+            row = {word: w / length for word, w in row.items()}
+        weights[episode] = row
+    return weights
+
+
+def assert_top(result, expected, k):
+    """El top devuelto tiene los k mayores pesos y cada lema lleva su peso (los empates pueden ir en cualquier orden)"""
+    assert [w for _, w in result] == pytest.approx(sorted(expected.values(), reverse=True)[:k])
+    for word, w in result:
+        assert w == pytest.approx(expected[word])
+
+
+@pytest.mark.parametrize('sublinear,smooth,norm', [(True, True, 'l2'), (False, True, 'l2'), (True, False, None), (False, False, None)])
+def test_weights_match_brute_force(random_episodes, sublinear, smooth, norm):
+    counts = episode_counts(random_episodes)
+    model = TfidfModel.from_term_matrix(TermMatrix.from_counts(counts), sublinear, smooth, norm)
+    expected = brute_weights(counts, sublinear, smooth, norm)
+
+    episodes, indptr, indices, weights = model.weights()
+    words = model.vocabulary.words
+    for i, episode in enumerate(episodes):
+        row = {words[j]: w for j, w in zip(indices[indptr[i]:indptr[i + 1]].tolist(), weights[indptr[i]:indptr[i + 1]].tolist())}
+        assert row == pytest.approx(expected[episode])
+
+    terms = model.distinctive_terms(15)
+    for episode, _ in counts:
+        assert_top(model.top_k(15, episode), expected[episode], 15)
+        assert_top(terms[episode], expected[episode], 15)
+
+    season = Counter()
+    for row in expected.values():
+        season.update(row)
+    assert_top(model.top_k(15), {word: w / len(counts) for word, w in season.items()}, 15)
+
+
+def test_incremental_updates_match_rebuild(random_episodes):
+    counts = episode_counts(random_episodes)
+    model = TfidfModel.from_term_matrix(TermMatrix.from_counts(counts[:3]))
+    for episode, word_count in counts[3:]:
+        model.add_episode(episode, word_count)
+    model.remove_episode(counts[1][0])
+    # Reemplazar un episodio equivale a quitarlo y volver a añadirlo
+    model.add_episode(counts[0][0], counts[-1][1])
+
+    remaining = [(counts[0][0], counts[-1][1])] + counts[2:]
+    expected = brute_weights(remaining, True, True, 'l2')
+    assert model.episodes == sorted(episode for episode, _ in remaining)
+    for episode, row in model.distinctive_terms(1000).items():
+        assert dict(row) == pytest.approx(expected[episode])
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from analysis.cooccurrence import token_times
+from analysis.timeline import episode_timeline, mattr, mattr_series, previous_occurrence, rolling_counts, speech_rate
+
+
+def brute_mattr_series(ids, window):
+    """TTR de cada ventana contando sus tipos distintos uno a uno"""
+    ids = list(ids)
+    if len(ids) <= window:
+        return [len(set(ids)) / len(ids)] if ids else []
+    return [len(set(ids[j:j + window])) / window for j in range(len(ids) - window + 1)]
+
+
+def test_previous_occurrence():
+    assert previous_occurrence([3, 1, 3, 3, 2, 1]).tolist() == [-1, -1, 0, 2, -1, 1]
+
+
+@pytest.mark.parametrize('window', [1, 2, 7, 50, 100, 5000])
+def test_mattr_matches_brute_force(random_episodes, window):
+    for _, episode in random_episodes:
+        ids = episode['ids'].tolist()
+        expected = brute_mattr_series(ids, window)
+        series = mattr_series(ids, window)
+        assert series.tolist() == pytest.approx(expected)
+        assert mattr(ids, window) == pytest.approx(float(np.mean(expected)))
+    assert len(mattr_series([], window)) == 0
+    assert mattr([], window) == 0.0
+
+
+@pytest.mark.parametrize('window', [10, 60])
+def test_rolling_counts_match_brute_force(random_episodes, window):
+    for _, episode in random_episodes[:3]:
+        times = token_times(episode['cue_offsets'], episode['cue_start'], episode['cue_end'])
+        weights = (episode['ids'] % 3 == 0).astype(np.float64)
+        grid = np.arange(0.0, times.max() + 10, 7.5)
+        counts = rolling_counts(times, grid, window)
+        weighted = rolling_counts(times, grid, window, weights)
+        for t, count, total in zip(grid.tolist(), counts.tolist(), weighted.tolist()):
+            inside = [i for i, time in enumerate(times.tolist()) if t - window / 2 <= time < t + window / 2]
+            assert count == len(inside)
+            assert total == pytest.approx(weights[inside].sum())
+
+
+@pytest.mark.parametrize('window', [5, 60])
+def test_speech_rate_matches_brute_force(random_episodes, window):
+    _, episode = random_episodes[0]
+    start = episode['cue_start']
+    end = episode['cue_end'].copy()
+    # Un subtítulo sin duración cuenta como si durara 1 ms
+    end[3] = start[3]
+    word_count = np.diff(episode['cue_offsets'])
+    grid = np.arange(0.0, end.max() + 10, 4.0)
+    rate = speech_rate(start, end, word_count, grid, window)
+    for t, value in zip(grid.tolist(), rate.tolist()):
+        lo, hi = t - window / 2, t + window / 2
+        words = 0.0
+        for s, e, n in zip(start.tolist(), end.tolist(), word_count.tolist()):
+            e = max(e, s + 1e-3)
+            words += n * max(0.0, min(e, hi) - max(s, lo)) / (e - s)
+        assert value == pytest.approx(words * 60.0 / window, abs=1e-6)
+    assert speech_rate([], [], [], grid, window).tolist() == [0.0] * len(grid)
+
+
+def test_timeline_series(random_episodes):
+    _, episode = random_episodes[1]
+    keywords = ['w0', 'w1', 'missing']
+    timeline = episode_timeline(episode, keywords=keywords, window_seconds=30, step=5)
+    times = token_times(episode['cue_offsets'], episode['cue_start'], episode['cue_end'])
+    words = [episode['words'][i] for i in episode['ids'].tolist()]
+    for t, tokens, density, rate, value in zip(
+        timeline['time'].tolist(), timeline['tokens'].tolist(), timeline['keyword_density'].tolist(),
+        timeline['speech_rate'].tolist(), timeline['mattr'].tolist()
+    ):
+        inside = [i for i, time in enumerate(times.tolist()) if t - 15 <= time < t + 15]
+        assert tokens == len(inside)
+        assert rate == pytest.approx(len(inside) * 2.0)
+        if inside:
+            assert density == pytest.approx(sum(words[i] in keywords for i in inside) / len(inside))
+            assert 0.0 < value <= 1.0
+        else:
+            assert np.isnan(density) and np.isnan(value)